@@ -1,45 +1,33 @@
+import os
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import unicodedata
 
-# Importaciones que sabemos que funcionan
-from report_generator import generate_report, build_report_filename
-from excel_generator_ravago import create_ravago_report
-from preview_generator_html import generate_preview_html
-
-# ---------------- Funciones utilitarias integradas ----------------
-def format_currency(value, currency="USD"):
-    """Formatea un número como moneda."""
-    try:
-        return f"{currency} {float(value):,.2f}"
-    except (ValueError, TypeError):
-        return f"{currency} 0.00"
-
-def find_column(df, possible_names):
-    """
-    Busca una columna en el DataFrame usando una lista de posibles nombres.
-    Retorna el nombre de la primera columna encontrada o None.
-    """
-    for col_name in possible_names:
-        for actual_col in df.columns:
-            if col_name.upper() in actual_col.upper():
-                return actual_col
-    return None
-
-def get_document_count(df):
-    """
-    Obtiene el número de documentos únicos usando diferentes posibles nombres de columna.
-    """
-    possible_names = ['NO. CASO', 'NUMERO CASO', 'CASO', 'ID', 'NUMERO', 'DOCUMENTO']
-    col_name = find_column(df, possible_names)
-    
-    if col_name:
-        return df[col_name].nunique()
-    else:
-        # Si no encuentra ninguna columna específica, usa el número de filas
-        return len(df)
-
+# Importaciones livianas: no cargan pandas ni las librerías de documentos
+from utils.file_utils import build_report_filename
+from utils.lazy_imports import LazyModule, start_warmup
+from utils import perf_trace
+from data.download_spool import get_download_spool, current_session_id
+
+# Importaciones pesadas diferidas hasta su primer uso (o hasta el precalentamiento)
+pd = LazyModule("pandas")
+report_factory = LazyModule("reports.report_factory")
+preview_generator_html = LazyModule("preview_generator_html")
+partition_index = LazyModule("data.partition_index")
+summary_cube = LazyModule("data.summary_cube")
+data_validator = LazyModule("data.data_validator")
+dataset_registry = LazyModule("data.dataset_registry")
+render_pool = LazyModule("reports.render_pool")
+money_utils = LazyModule("utils.money_utils")
+admission = LazyModule("utils.admission")
+workbook_reader = LazyModule("utils.workbook_reader")
+column_schema = LazyModule("utils.column_schema")
+load_diagnostics = LazyModule("utils.load_diagnostics")
+currency_converter = LazyModule("data.currency_converter")
+data_grid = LazyModule("ui.data_grid")
+perf_panel = LazyModule("ui.perf_panel")
+
+@perf_trace.traced()
 def load_excel_files(uploaded_files):
     """
     Carga múltiples archivos Excel subidos a través de Streamlit,
@@ -48,27 +36,53 @@ def load_excel_files(uploaded_files):
     if not uploaded_files:
         return pd.DataFrame()
 
+    # Se reserva la memoria estimada de la lectura; si no hay lugar espera en la cola o se rechaza (AdmissionError)
+    estimate = admission.estimate_upload_bytes(uploaded_files)
+    with admission.get_memory_budget().reserve(estimate, admission.INTERACTIVE, "la carga de archivos"):
+        return read_excel_files(uploaded_files)
+
+def read_excel_files(uploaded_files):
+    """Lee y combina los archivos subidos (sin control de admisión; ver load_excel_files)."""
+    # Archivos sueltos y libros dentro de los .zip; con varios se leen en paralelo en los workers
+    frames, errors = workbook_reader.read_workbooks(uploaded_files)
+    diagnostics = load_diagnostics.LoadDiagnostics()
+    for name, error in errors:
+        st.error(f"Error al leer el archivo {name}: {error}")
+        diagnostics.add_file_error(name, error)
+
+    # Tipos declarados por archivo (años, fechas); lo que no se puede leer queda en los diagnósticos
     all_data = []
-    for file in uploaded_files:
-        try:
-            df = pd.read_excel(file, engine='openpyxl')
-            all_data.append(df)
-        except Exception as e:
-            st.error(f"Error al leer el archivo {file.name}: {e}")
-            continue
+    with perf_trace.span("input_schema", files=len(frames)):
+        for name, df in frames:
+            all_data.append(column_schema.apply_input_schema(df, name, diagnostics))
+            diagnostics.add_source(name, len(df))
 
     if not all_data:
         return pd.DataFrame()
 
-    combined_df = pd.concat(all_data, ignore_index=True)
-    
-    date_columns = ['FECHA ASIGNACION', 'FECHA ENTREGA']
-    for col in date_columns:
-        if col in combined_df.columns:
-            combined_df[col] = pd.to_datetime(combined_df[col], errors='coerce')
+    with perf_trace.span("pd.concat", files=len(all_data)):
+        combined_df = pd.concat(all_data, ignore_index=True)
+    load_diagnostics.attach_diagnostics(combined_df, diagnostics)
+
+    # Columnas reales de cada campo (valor, nombre, documento...), resueltas una vez y guardadas con los datos
+    column_schema.attach_schema(combined_df)
+
+    # Validación por columnas completas; las filas con problemas quedan en los diagnósticos
+    validator = data_validator.DataValidator()
+    missing = validator.missing_columns(combined_df)
+    if missing:
+        st.error(f"Faltan columnas obligatorias en los archivos: {', '.join(missing)}")
+        return pd.DataFrame()
+    validator.validate(combined_df, diagnostics)
+
+    # VALOR en centavos enteros: totales e IVA exactos en los reportes
+    money_utils.add_cents_column(combined_df)
+    # Conversión a USD con la TRM vigente en la fecha de asignación de cada fila
+    currency_converter.get_default_converter().convert(combined_df)
 
     return combined_df
 
+@perf_trace.traced()
 def filter_data(df, empresa, anio, mes):
     """
     Filtra el DataFrame principal según la empresa, año y mes de asignación.
@@ -76,7 +90,8 @@ def filter_data(df, empresa, anio, mes):
     if df.empty:
         return pd.DataFrame()
 
-    filtered = df.copy()
+    with perf_trace.span("df.copy", rows=len(df)):
+        filtered = df.copy()
 
     if empresa and empresa != "Todas":
         filtered = filtered[filtered['EMPRESA'] == empresa]
@@ -107,24 +122,233 @@ st.set_page_config(page_title="Generador de Reportes BIU", layout="wide")
 st.title("📄 Generador de Reportes de Facturación")
 st.markdown("Cargue sus archivos de Excel para comenzar a generar los reportes.")
 
+MESES_ORDENADOS = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+def get_facet_options(df, empresa_sel, anio_sel):
+    """Opciones de año y mes para la selección actual (memorizadas hasta la próxima carga)."""
+    cache_key = (empresa_sel, anio_sel)
+    if cache_key not in st.session_state.facet_cache:
+        df_empresa = df[df['EMPRESA'] == empresa_sel] if empresa_sel != "Todas" else df
+        anio_options = ["Todos"] + sorted(df_empresa['AÑO ASIGNACION'].dropna().unique().tolist(), reverse=True)
+
+        df_anio = df_empresa[df_empresa['AÑO ASIGNACION'] == anio_sel] if anio_sel != "Todos" else df_empresa
+        meses_disponibles = df_anio['MES ASIGNACION'].unique().tolist()
+        mes_options = ["Todos"] + [mes for mes in MESES_ORDENADOS if mes in meses_disponibles]
+
+        st.session_state.facet_cache[cache_key] = (anio_options, mes_options)
+    return st.session_state.facet_cache[cache_key]
+
+def get_funcionarios(empresa_sel):
+    """Funcionarios ingresados en la barra lateral (vacíos para Ravago)."""
+    if empresa_sel == "Ravago Americas LLC":
+        return {'reporta': "", 'revisor': ""}
+    return {
+        'reporta': st.session_state.get("func_reporta", ""),
+        'revisor': st.session_state.get("func_revisor", ""),
+    }
+
+# ---------------- Secciones independientes (fragmentos) ----------------
+# Los widgets dentro de un fragmento solo re-ejecutan ese fragmento:
+# escribir un funcionario o el nombre del archivo no vuelve a filtrar.
+
+@st.fragment
+def funcionarios_section(empresa_sel):
+    st.header("3. Información del Reporte")
+    if empresa_sel == "Ravago Americas LLC":
+        st.info("Para Ravago, los campos de funcionarios se llenarán manualmente en el Excel generado.")
+    else:
+        st.text_input("Funcionario que reporta", key="func_reporta")
+        st.text_input("Funcionario revisor", key="func_revisor")
+
+def warn_missing_rates(summary):
+    """Avisa si hay registros en otra moneda sin TRM en la tabla de tasas."""
+    sin_tasa = sum(s['sin_tasa'] for s in (summary or {}).get('subtotales_moneda', {}).values())
+    if sin_tasa:
+        st.warning(f"{sin_tasa} registro(s) en otra moneda no tienen TRM en la tabla de tasas "
+                   f"(assets/trm_rates.csv) y no se incluyen en el total en USD.")
+
+def load_diagnostics_section(df):
+    """Avisa de los problemas encontrados al cargar (lectura y validación), con la tabla de filas afectadas."""
+    diagnostics = load_diagnostics.get_diagnostics(df)
+    if not len(diagnostics):
+        return
+    st.warning(f"Se encontraron {len(diagnostics)} problema(s) en los datos cargados; "
+               f"revise el diagnóstico antes de generar los reportes.")
+    with st.expander("Ver diagnóstico de datos"):
+        st.dataframe(diagnostics.summary(), hide_index=True)
+        st.dataframe(diagnostics.table(), hide_index=True)
+
+@st.fragment
+def preview_section(df_filtered, empresa_sel, anio_sel, mes_sel):
+    st.header("Previsualización del Reporte")
+    if empresa_sel != "Todas" and anio_sel != "Todos" and mes_sel != "Todos":
+        # Vuelve a dibujar solo la previsualización con los funcionarios actuales
+        st.button("🔄 Actualizar previsualización", key="refresh_preview")
+        with st.spinner("Generando previsualización..."):
+            funcionarios = get_funcionarios(empresa_sel)
+            partition = (empresa_sel, anio_sel, mes_sel)
+            partition_hash = st.session_state.partition_hashes.get(partition)
+            params = (funcionarios['reporta'], funcionarios['revisor'])
+            cache = st.session_state.partition_cache
+
+            # El aviso de TRM faltante se muestra en cada render, también con la previsualización en caché
+            summary = st.session_state.summary_cube.get(empresa_sel, anio_sel, mes_sel)
+            warn_missing_rates(summary)
+
+            preview_html = cache.get('preview', partition, partition_hash, params)
+            if preview_html is None:
+                preview_html = preview_generator_html.generate_preview_html(df_filtered, empresa_sel, anio_sel, mes_sel, funcionarios, summary)
+                cache.put('preview', partition, partition_hash, preview_html, params)
+            st.components.v1.html(preview_html, height=650, scrolling=True)
+    else:
+        st.warning("Por favor, seleccione una Empresa, Año y Mes específicos para generar un reporte.")
+
+@st.fragment
+def report_controls_section(df_filtered, empresa_sel, anio_sel, mes_sel):
+    is_complete = empresa_sel != "Todas" and anio_sel != "Todos" and mes_sel != "Todos"
+
+    # ---------- Nombre de archivo editable ----------
+    if is_complete:
+        if empresa_sel == "Ravago Americas LLC":
+            suggested_name = build_report_filename(empresa_sel).replace(".docx", ".xlsx")
+            ext = ".xlsx"
+        else:
+            suggested_name = build_report_filename(empresa_sel)
+            ext = ".docx"
+
+        file_name_input = st.text_input(
+            "Nombre del archivo (puedes modificarlo antes de descargar)",
+            value=suggested_name,
+            key=f"nombre_archivo_{empresa_sel}_{anio_sel}_{mes_sel}"
+        )
+
+    # -------------- Generar archivo --------------
+    if st.button("✅ Generar Reporte"):
+        if is_complete:
+            with st.spinner("Creando documento..."):
+                funcionarios = get_funcionarios(empresa_sel)
+                partition = (empresa_sel, anio_sel, mes_sel)
+                partition_hash = st.session_state.partition_hashes.get(partition)
+                cache = st.session_state.partition_cache
+                # La fecha de corte va en el documento: forma parte de la clave de caché
+                params = (funcionarios['reporta'], funcionarios['revisor'], datetime.now().date())
+                spool = get_download_spool()
+                try:
+                    # La caché guarda el handle del archivo en disco, no sus bytes
+                    handle = cache.get('report', partition, partition_hash, params)
+                    if not spool.exists(handle):
+                        summary = st.session_state.summary_cube.get(empresa_sel, anio_sel, mes_sel)
+                        # Reserva de memoria y, en particiones grandes, generación en un proceso aparte
+                        buffer, mime = report_factory.ReportFactory().create_report(
+                            df_filtered, empresa_sel, anio_sel, mes_sel, funcionarios, summary
+                        )
+                        # Se copia del BytesIO al disco; en la sesión solo queda el handle
+                        handle = spool.store(current_session_id(), buffer, mime)
+                        cache.put('report', partition, partition_hash, handle, params)
+
+                    # Toma lo que el usuario escribió; si está vacío usa sugerido
+                    raw_name = (file_name_input or suggested_name).strip()
+                    final_name = ensure_extension(safe_filename(raw_name), ext)
+
+                    # Persistencia para el download_button
+                    st.session_state.download_handle = handle
+                    st.session_state.download_name = final_name
+
+                    st.success(f"¡Reporte generado! Nombre: **{final_name}**")
+                except admission.AdmissionError as e:
+                    # Sin memoria para el reporte: el mensaje ya dice qué hacer
+                    st.error(str(e))
+                except Exception as e:
+                    st.error(f"Ocurrió un error al generar el reporte: {e}")
+                    st.exception(e)  # Mostrar el error completo para debugging
+        else:
+            st.error("Debe seleccionar una Empresa, Año y Mes para generar el reporte.")
+
+    # -------------- Botón de descarga --------------
+    handle = st.session_state.get("download_handle")
+    if "download_name" in st.session_state and get_download_spool().exists(handle):
+        # Datos diferidos: el archivo se lee del disco solo al pulsar el botón
+        st.download_button(
+            label=f"📥 Descargar {st.session_state.download_name}",
+            data=get_download_spool().reader(handle),
+            file_name=st.session_state.download_name,
+            mime=handle['mime'],
+            key=f"download_{st.session_state.download_name}"
+        )
+
 def main():
     """Función principal de la aplicación."""
+    # Con PERF_TRACE=1 se miden las etapas del rerun (log JSON-lines + panel lateral)
+    perf_trace.begin_run("rerun")
+    try:
+        run_app()
+    finally:
+        run = perf_trace.end_run()
+    if run is not None:
+        perf_panel.render_perf_panel(run)
+
+def run_app():
+    """Dibuja la aplicación: carga de archivos, filtros, vista previa y reporte."""
     # ---------------- Carga de archivos ----------------
     with st.sidebar:
         st.header("1. Cargar Archivos")
         uploaded_files = st.file_uploader(
-            "Seleccione uno o más archivos Excel", type=["xlsx", "xls"], accept_multiple_files=True
+            "Seleccione uno o más archivos Excel (o un .zip con varios)", type=["xlsx", "xls", "zip"],
+            accept_multiple_files=True
         )
 
+    # El cargador ya está dibujado: precargar librerías y logo en segundo plano
+    if os.environ.get("WARMUP_IMPORTS", "1") != "0":
+        start_warmup()
+
+    # Sin archivos todavía no hace falta importar pandas
+    if not uploaded_files and 'df_combined' not in st.session_state:
+        st.info("Esperando la carga de archivos Excel...")
+        return
+
     if 'df_combined' not in st.session_state:
         st.session_state.df_combined = pd.DataFrame()
-
-    # Limpia datos de descarga si el usuario carga nuevos archivos
-    if uploaded_files:
-        st.session_state.df_combined = load_excel_files(uploaded_files)
-        st.session_state.pop("download_bytes", None)
+    if 'partition_cache' not in st.session_state:
+        st.session_state.partition_hashes = {}
+        st.session_state.partition_cache = partition_index.PartitionCache()
+        st.session_state.summary_cube = summary_cube.SummaryCube.from_dataframe(st.session_state.df_combined)
+    if 'facet_cache' not in st.session_state:
+        st.session_state.facet_cache = {}
+
+    # El uploader devuelve los mismos archivos en cada rerun: solo se
+    # vuelven a leer (y se limpia la descarga) si el conjunto cambió
+    signature = tuple((f.name, f.size, getattr(f, "file_id", None)) for f in uploaded_files or [])
+    if uploaded_files and signature != st.session_state.get("uploaded_signature"):
+        # Sesiones con los mismos archivos comparten un DataFrame y sus índices;
+        # la sesión guarda el handle y una vista (sin copiar los datos)
+        try:
+            handle = dataset_registry.get_dataset_registry().acquire(
+                dataset_registry.dataset_key(uploaded_files), lambda: load_excel_files(uploaded_files)
+            )
+        except admission.AdmissionError as e:
+            st.error(str(e))
+            return
+        if st.session_state.get("dataset_handle") is not None:
+            st.session_state.dataset_handle.release()
+        st.session_state.dataset_handle = handle
+        st.session_state.df_combined = handle.frame
+        st.session_state.uploaded_signature = signature
+        st.session_state.facet_cache = {}
+
+        # Solo se invalidan las particiones cuyo contenido cambió
+        hashes = handle.partition_hashes
+        diff = partition_index.PartitionHasher().diff(st.session_state.partition_hashes, hashes)
+        st.session_state.partition_cache.invalidate(diff['changed'] + diff['removed'])
+        st.session_state.partition_hashes = hashes
+
+        # Totales por partición calculados una vez por dataset (conteos, suma, moda, monedas)
+        st.session_state.summary_cube = handle.summary_cube
+
+        st.session_state.pop("download_handle", None)
         st.session_state.pop("download_name", None)
-        st.session_state.pop("download_mime", None)
+
+        # Con datos cargados se arrancan los workers de render en segundo plano
+        render_pool.get_render_pool().start()
 
     # ---------------- Interfaz principal ----------------
     if not st.session_state.df_combined.empty:
@@ -132,103 +356,29 @@ def main():
         
         with st.sidebar:
             st.header("2. Aplicar Filtros")
-            empresas_options = ["Todas"] + sorted(df['EMPRESA'].unique().tolist())
+            empresas_options = ["Todas"] + sorted(df['EMPRESA'].dropna().unique().tolist())
             empresa_sel = st.selectbox("Empresa", options=empresas_options)
-
             is_empresa_selected = empresa_sel != "Todas"
-            df_empresa = df[df['EMPRESA'] == empresa_sel] if is_empresa_selected else df
-            
-            anio_options = ["Todos"] + sorted(df_empresa['AÑO ASIGNACION'].unique().tolist(), reverse=True)
-            anio_sel = st.selectbox("Año de Asignación", options=anio_options, disabled=not is_empresa_selected)
 
+            anio_options, _ = get_facet_options(df, empresa_sel, "Todos")
+            anio_sel = st.selectbox("Año de Asignación", options=anio_options, disabled=not is_empresa_selected)
             is_anio_selected = anio_sel != "Todos"
-            df_anio = df_empresa[df_empresa['AÑO ASIGNACION'] == anio_sel] if is_anio_selected else df_empresa
-            
-            meses_ordenados = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
-            meses_disponibles = df_anio['MES ASIGNACION'].unique().tolist()
-            mes_options = ["Todos"] + [mes for mes in meses_ordenados if mes in meses_disponibles]
+
+            _, mes_options = get_facet_options(df, empresa_sel, anio_sel)
             mes_sel = st.selectbox("Mes de Asignación", options=mes_options, disabled=not is_anio_selected)
-            
-            st.header("3. Información del Reporte")
-            if empresa_sel == "Ravago Americas LLC":
-                st.info("Para Ravago, los campos de funcionarios se llenarán manualmente en el Excel generado.")
-                func_reporta = ""
-                func_revisor = ""
-            else:
-                func_reporta = st.text_input("Funcionario que reporta", "")
-                func_revisor = st.text_input("Funcionario revisor", "")
-            
+
+            funcionarios_section(empresa_sel)
+
+        load_diagnostics_section(df)
         df_filtered = filter_data(df, empresa_sel, anio_sel, mes_sel)
 
         st.header("Vista Previa de Datos Filtrados")
         if not df_filtered.empty:
-            st.dataframe(df_filtered)
-
-            st.header("Previsualización del Reporte")
-            if empresa_sel != "Todas" and anio_sel != "Todos" and mes_sel != "Todos":
-                with st.spinner("Generando previsualización..."):
-                    funcionarios = {'reporta': func_reporta, 'revisor': func_revisor}
-                    preview_html = generate_preview_html(df_filtered, empresa_sel, anio_sel, mes_sel, funcionarios)
-                    st.components.v1.html(preview_html, height=650, scrolling=True)
-            else:
-                st.warning("Por favor, seleccione una Empresa, Año y Mes específicos para generar un reporte.")
-
-            # ---------- Nombre de archivo editable ----------
-            if empresa_sel != "Todas" and anio_sel != "Todos" and mes_sel != "Todos":
-                if empresa_sel == "Ravago Americas LLC":
-                    suggested_name = build_report_filename(empresa_sel).replace(".docx", ".xlsx")
-                    ext = ".xlsx"
-                else:
-                    suggested_name = build_report_filename(empresa_sel)
-                    ext = ".docx"
-
-                file_name_input = st.text_input(
-                    "Nombre del archivo (puedes modificarlo antes de descargar)",
-                    value=suggested_name,
-                    key=f"nombre_archivo_{empresa_sel}_{anio_sel}_{mes_sel}"
-                )
-
-            # -------------- Generar archivo --------------
-            if st.button("✅ Generar Reporte"):
-                if empresa_sel != "Todas" and anio_sel != "Todos" and mes_sel != "Todos":
-                    with st.spinner("Creando documento..."):
-                        funcionarios = {'reporta': func_reporta, 'revisor': func_revisor}
-                        try:
-                            if empresa_sel == "Ravago Americas LLC":
-                                # Excel
-                                buffer = create_ravago_report(df_filtered, anio_sel, mes_sel, funcionarios)
-                                mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            else:
-                                # Word
-                                buffer = generate_report(df_filtered, empresa_sel, anio_sel, mes_sel, funcionarios)
-                                mime = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-
-                            # Toma lo que el usuario escribió; si está vacío usa sugerido
-                            raw_name = (file_name_input or suggested_name).strip()
-                            final_name = ensure_extension(safe_filename(raw_name), ext)
-
-                            # Persistencia para el download_button
-                            st.session_state.download_bytes = buffer.getvalue()
-                            st.session_state.download_name = final_name
-                            st.session_state.download_mime = mime
-
-                            st.success(f"¡Reporte generado! Nombre: **{final_name}**")
-                        except Exception as e:
-                            st.error(f"Ocurrió un error al generar el reporte: {e}")
-                            st.exception(e)  # Mostrar el error completo para debugging
-                else:
-                    st.error("Debe seleccionar una Empresa, Año y Mes para generar el reporte.")
-
-            # -------------- Botón de descarga --------------
-            if all(k in st.session_state for k in ("download_bytes", "download_name", "download_mime")):
-                st.download_button(
-                    label=f"📥 Descargar {st.session_state.download_name}",
-                    data=st.session_state.download_bytes,
-                    file_name=st.session_state.download_name,
-                    mime=st.session_state.download_mime,
-                    key=f"download_{st.session_state.download_name}"
-                )
+            cube_rows = st.session_state.summary_cube.select(empresa_sel, anio_sel, mes_sel)
+            data_grid.render_data_grid(df_filtered, cube_rows, (empresa_sel, anio_sel, mes_sel))
 
+            preview_section(df_filtered, empresa_sel, anio_sel, mes_sel)
+            report_controls_section(df_filtered, empresa_sel, anio_sel, mes_sel)
         else:
             st.warning("No se encontraron datos con los filtros seleccionados.")
     else:
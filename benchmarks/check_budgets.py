@@ -0,0 +1,117 @@
+"""
+Corre el benchmark y lo compara con los presupuestos de benchmarks/budgets.json.
+
+Uso:
+    python -m benchmarks.check_budgets                  # todos los tamaños del archivo
+    python -m benchmarks.check_budgets --sizes 1k,100k
+    python -m benchmarks.check_budgets --results bench.json   # sin volver a correr
+
+Termina con código 1 (y una tabla con lo que se pasó) si alguna etapa supera
+su tiempo o su pico de memoria, o si una etapa presupuestada no se midió.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .run_benchmarks import DEFAULT_CACHE_DIR, parse_size, run
+
+BUDGETS_PATH = Path(__file__).resolve().parent / "budgets.json"
+
+# Métrica del presupuesto -> (campo en el JSON del benchmark, factor, unidad)
+METRICS = {
+    'max_seconds': ('seconds', 1, "s"),
+    'max_peak_rss_mb': ('peak_rss_bytes', 1 / 2**20, "MB"),
+}
+
+def load_budgets(path: Path = BUDGETS_PATH) -> Dict:
+    """Lee el archivo de presupuestos."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def compare(budgets: Dict, report: Dict, sizes: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Compara los resultados del benchmark con los presupuestos.
+
+    Args:
+        budgets: Contenido de budgets.json
+        report: Resultado de run_benchmarks.run()
+        sizes: Tamaños a revisar (por defecto todos los del presupuesto)
+
+    Returns:
+        Lista de chequeos {'size', 'stage', 'metric', 'actual', 'budget', 'unit', 'ok'}
+    """
+    results = {r['rows']: r for r in report.get('results', [])}
+    checks = []
+    for size in sizes or list(budgets['sizes']):
+        stages = results.get(parse_size(size), {}).get('stages', {})
+        for stage, limits in budgets['sizes'][size].items():
+            measured = stages.get(stage)
+            for metric, budget in limits.items():
+                field, factor, unit = METRICS[metric]
+                actual = measured[field] * factor if measured and measured.get(field) is not None else None
+                checks.append({
+                    'size': size, 'stage': stage, 'metric': metric, 'unit': unit,
+                    'actual': actual, 'budget': budget,
+                    'ok': actual is not None and actual <= budget,
+                })
+    return checks
+
+def format_checks(checks: List[Dict], only_failures: bool = False) -> str:
+    """Tabla legible de los chequeos; las etapas excedidas muestran cuánto se pasaron."""
+    lines = [f"{'':4} {'tamaño':>6}  {'etapa':<24} {'métrica':<16} {'medido':>10} {'presupuesto':>12}"]
+    for check in checks:
+        if only_failures and check['ok']:
+            continue
+        if check['actual'] is None:
+            actual, delta = "sin dato", ""
+        else:
+            actual = f"{check['actual']:,.2f}"
+            excess = (check['actual'] / check['budget'] - 1) * 100 if check['budget'] else 0
+            delta = f"  (+{excess:.0f}%)" if not check['ok'] else ""
+        status = "OK" if check['ok'] else "FAIL"
+        lines.append(
+            f"{status:<4} {check['size']:>6}  {check['stage']:<24} {check['metric']:<16} "
+            f"{actual:>10} {check['budget']:>10,.2f} {check['unit']}{delta}"
+        )
+    return "\n".join(lines)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica los presupuestos de tiempo y memoria por etapa.")
+    parser.add_argument('--budgets', type=Path, default=BUDGETS_PATH, help="Archivo de presupuestos")
+    parser.add_argument('--sizes', help="Tamaños a verificar, separados por coma (por defecto todos)")
+    parser.add_argument('--results', type=Path, help="JSON de run_benchmarks ya generado (no corre el benchmark)")
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                        help="Carpeta donde se guardan los libros generados")
+    parser.add_argument('--output', type=Path, help="Guardar también los resultados del benchmark")
+    args = parser.parse_args(argv)
+
+    budgets = load_budgets(args.budgets)
+    sizes = [s.strip() for s in args.sizes.split(',')] if args.sizes else list(budgets['sizes'])
+    unknown = [s for s in sizes if s not in budgets['sizes']]
+    if unknown:
+        parser.error(f"sin presupuesto para: {', '.join(unknown)}")
+
+    if args.results:
+        report = json.loads(args.results.read_text(encoding='utf-8'))
+    else:
+        import streamlit.logger
+        streamlit.logger.set_log_level('error')
+        report = run([parse_size(s) for s in sizes], budgets.get('seed', 42), args.cache_dir)
+        if args.output:
+            args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+
+    checks = compare(budgets, report, sizes)
+    failures = [c for c in checks if not c['ok']]
+    if failures:
+        print(f"{len(failures)} de {len(checks)} presupuestos excedidos:\n")
+        print(format_checks(checks, only_failures=True))
+        return 1
+
+    print(format_checks(checks))
+    print(f"\nTodos los presupuestos se cumplen ({len(checks)} chequeos).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
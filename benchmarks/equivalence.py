@@ -0,0 +1,317 @@
+"""
+Compara la salida de un motor de generación con la del actual (golden output).
+
+Uso:
+    python -m benchmarks.equivalence                          # el motor actual contra sí mismo
+    python -m benchmarks.equivalence --candidate modular      # los generadores de reports/ y preview/
+    python -m benchmarks.equivalence --word mi_modulo:generate_report --datasets 50
+
+Los DOCX y XLSX se comparan parte por parte dentro del paquete ZIP: cada XML
+se canoniza (C14N, sin las fechas de docProps/core.xml) y los binarios
+(imágenes) se comparan por hash. En los XLSX además se comparan por hoja los
+valores, las combinaciones de celdas y los formatos numéricos, para que la
+diferencia se lea en términos de celdas. El HTML se compara con los espacios
+normalizados. Termina con código 1 si algún caso difiere.
+"""
+import argparse
+import difflib
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.etree.ElementTree import canonicalize
+
+import numpy as np
+
+from .synthetic_workbook import generate_dataframe, write_rates
+
+RAVAGO = 'Ravago Americas LLC'
+FUNCIONARIOS = {'reporta': "Funcionario Reporta", 'revisor': "Funcionario Revisor"}
+
+# Fechas de creación/modificación que cambian en cada guardado
+_VOLATILE = re.compile(rb'(<dcterms:(created|modified)\b[^>]*>)[^<]*(</dcterms:\2>)')
+
+MAX_DIFF_LINES = 12
+
+# ---------------- Normalización y comparación ----------------
+
+def normalize_package(payload: bytes) -> Dict[str, str]:
+    """
+    Normaliza un paquete OOXML (DOCX/XLSX) parte por parte.
+
+    Returns:
+        {nombre de la parte: XML canónico, o 'sha256:...' para partes binarias}
+    """
+    parts = {}
+    with zipfile.ZipFile(io.BytesIO(payload)) as package:
+        for name in package.namelist():
+            data = package.read(name)
+            if name.endswith(('.xml', '.rels')):
+                data = _VOLATILE.sub(rb'\1\3', data)
+                parts[name] = canonicalize(data.decode('utf-8'), strip_text=True)
+            else:
+                parts[name] = "sha256:" + hashlib.sha256(data).hexdigest()
+    return parts
+
+def _xml_diff(name: str, expected: str, actual: str) -> List[str]:
+    """Primeras líneas de la diferencia entre dos XML canónicos (un elemento por línea)."""
+    split = lambda xml: xml.replace('><', '>\n<').splitlines()
+    diff = difflib.unified_diff(split(expected), split(actual), f"referencia/{name}", f"candidato/{name}", lineterm="", n=1)
+    lines = list(diff)
+    return lines[:MAX_DIFF_LINES] + ([f"... ({len(lines) - MAX_DIFF_LINES} líneas más)"] if len(lines) > MAX_DIFF_LINES else [])
+
+def compare_packages(expected: bytes, actual: bytes) -> List[str]:
+    """
+    Compara dos paquetes DOCX/XLSX parte por parte.
+
+    Returns:
+        Lista de diferencias legibles (vacía si son equivalentes)
+    """
+    ref, cand = normalize_package(expected), normalize_package(actual)
+    diffs = [f"falta la parte {name}" for name in sorted(ref.keys() - cand.keys())]
+    diffs += [f"parte adicional {name}" for name in sorted(cand.keys() - ref.keys())]
+    for name in sorted(ref.keys() & cand.keys()):
+        if ref[name] == cand[name]:
+            continue
+        if ref[name].startswith("sha256:"):
+            diffs.append(f"la parte binaria {name} cambió")
+        else:
+            diffs.append(f"la parte {name} difiere:")
+            diffs.extend("    " + line for line in _xml_diff(name, ref[name], cand[name]))
+    return diffs
+
+def _sheet_semantics(payload: bytes) -> Dict[str, Dict]:
+    """Por hoja: valores, formatos numéricos, combinaciones, alto de filas y ancho de columnas."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(payload))
+    sheets = {}
+    for ws in wb.worksheets:
+        cells = [c for row in ws.iter_rows() for c in row if c.value is not None or c.number_format != 'General']
+        sheets[ws.title] = {
+            'valores': {c.coordinate: c.value for c in cells if c.value is not None},
+            'formatos': {c.coordinate: c.number_format for c in cells if c.number_format != 'General'},
+            'combinadas': sorted(str(r) for r in ws.merged_cells.ranges),
+            'alto filas': {k: d.height for k, d in ws.row_dimensions.items() if d.height is not None},
+            'ancho columnas': {k: d.width for k, d in ws.column_dimensions.items() if d.width},
+        }
+    return sheets
+
+def compare_workbooks(expected: bytes, actual: bytes) -> List[str]:
+    """
+    Compara dos XLSX por hoja (celdas, formatos, combinaciones) y luego parte por parte.
+
+    Returns:
+        Lista de diferencias legibles (vacía si son equivalentes)
+    """
+    ref, cand = _sheet_semantics(expected), _sheet_semantics(actual)
+    diffs = []
+    if list(ref) != list(cand):
+        diffs.append(f"hojas distintas: {list(ref)} != {list(cand)}")
+    for title in ref.keys() & cand.keys():
+        for aspect, expected_value in ref[title].items():
+            actual_value = cand[title][aspect]
+            if expected_value == actual_value:
+                continue
+            if isinstance(expected_value, dict):
+                keys = sorted(expected_value.keys() | actual_value.keys(), key=str)
+                changed = [k for k in keys if expected_value.get(k) != actual_value.get(k)]
+                sample = ", ".join(f"{k}: {expected_value.get(k)!r} -> {actual_value.get(k)!r}" for k in changed[:5])
+                diffs.append(f"[{title}] {aspect}: {len(changed)} diferencia(s); {sample}")
+            else:
+                removed = sorted(set(expected_value) - set(actual_value))[:5]
+                added = sorted(set(actual_value) - set(expected_value))[:5]
+                diffs.append(f"[{title}] {aspect}: faltan {removed}, sobran {added}")
+    return diffs + compare_packages(expected, actual)
+
+def normalize_html(html: str) -> str:
+    """Colapsa espacios entre etiquetas y dentro del texto."""
+    html = re.sub(r'>\s+<', '><', html.strip())
+    return re.sub(r'\s+', ' ', html)
+
+def compare_html(expected: str, actual: str) -> List[str]:
+    """Compara dos previsualizaciones HTML con los espacios normalizados."""
+    ref, cand = normalize_html(expected), normalize_html(actual)
+    if ref == cand:
+        return []
+    split = lambda html: html.replace('><', '>\n<').splitlines()
+    lines = list(difflib.unified_diff(split(ref), split(cand), "referencia", "candidato", lineterm="", n=1))
+    return ["el HTML difiere:"] + ["    " + line for line in lines[:MAX_DIFF_LINES]]
+
+# ---------------- Motores ----------------
+
+def _reference_engines() -> Dict[str, Callable]:
+    import report_generator
+    import excel_generator_ravago
+    import preview_generator_html
+    return {
+        'word': report_generator.generate_report,
+        'excel': lambda data, empresa, anio, mes, funcionarios, summary=None:
+            excel_generator_ravago.create_ravago_report(data, anio, mes, funcionarios, summary),
+        'preview': preview_generator_html.generate_preview_html,
+    }
+
+def _modular_engines() -> Dict[str, Callable]:
+    from reports.word_report_generator import WordReportGenerator
+    from reports.excel_report_generator import ExcelReportGenerator
+    from preview.preview_generator import PreviewGenerator
+    return {
+        'word': WordReportGenerator().generate_report,
+        'excel': lambda data, empresa, anio, mes, funcionarios, summary=None:
+            ExcelReportGenerator().create_ravago_report(data, anio, mes, funcionarios, summary),
+        'preview': PreviewGenerator().generate_preview_html,
+    }
+
+def load_engine(spec: str) -> Callable:
+    """
+    Carga una función 'modulo:funcion' con la firma (data, empresa, anio, mes, funcionarios, summary).
+    """
+    module_name, _, attr = spec.partition(':')
+    target = importlib.import_module(module_name)
+    for part in attr.split('.'):
+        target = getattr(target, part)
+    return target
+
+def candidate_engines(candidate: str, overrides: Dict[str, Optional[str]]) -> Dict[str, Callable]:
+    """Motores candidatos: 'reference', 'modular' y/o funciones sueltas por tipo de salida."""
+    engines = _modular_engines() if candidate == 'modular' else _reference_engines()
+    for kind, spec in overrides.items():
+        if spec:
+            engines[kind] = load_engine(spec)
+    return engines
+
+# ---------------- Datos ----------------
+
+def make_dataset(n_rows: int, seed: int):
+    """
+    Datos sintéticos con casos borde, preparados como los deja load_excel_files.
+
+    Agrega montos vacíos, negativos, con más de 2 decimales y nombres largos.
+    """
+    from utils.money_utils import add_cents_column
+    from data.currency_converter import get_default_converter
+
+    df = generate_dataframe(n_rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    df['VALOR'] = df['VALOR'].astype(object)
+    picks = rng.choice(n_rows, size=min(n_rows, 4), replace=False)
+    edge_values = [None, -15.0, 1234.005, 0.0]
+    for pos, value in zip(picks, edge_values):
+        df.iat[pos, df.columns.get_loc('VALOR')] = value
+    df['VALOR'] = df['VALOR'].astype(float)
+    long_names = rng.choice(n_rows, size=max(1, n_rows // 50), replace=False)
+    df.loc[long_names, 'NOMBRE'] = "Compañía de Servicios Profesionales y Consultoría Ñandú S.A.S. " * 2
+
+    add_cents_column(df)
+    get_default_converter().convert(df)
+    return df
+
+def _partitions(df, per_company: int) -> List[Tuple[str, int, str]]:
+    """Las `per_company` particiones con más filas de cada empresa."""
+    counts = df.groupby(['EMPRESA', 'AÑO ASIGNACION', 'MES ASIGNACION'], sort=True).size()
+    partitions = []
+    for empresa, group in counts.groupby(level=0):
+        top = group.sort_values(ascending=False, kind='stable').head(per_company)
+        partitions += [(e, int(a), m) for e, a, m in top.index]
+    return partitions
+
+# ---------------- Ejecución ----------------
+
+def _render(engine: Callable, *args):
+    """Ejecuta un motor y retorna (salida, error)."""
+    try:
+        output = engine(*args)
+    except Exception as exc:  # el error forma parte de la salida a comparar
+        return None, f"{type(exc).__name__}: {exc}"
+    return (output.getvalue() if hasattr(output, 'getvalue') else output), None
+
+def compare_case(kind: str, reference: Callable, candidate: Callable, args: tuple) -> List[str]:
+    """Genera un caso con ambos motores y retorna sus diferencias."""
+    expected, expected_error = _render(reference, *args)
+    actual, actual_error = _render(candidate, *args)
+    if expected_error or actual_error:
+        return [] if expected_error == actual_error else [f"error: {expected_error!r} -> {actual_error!r}"]
+    if kind == 'preview':
+        return compare_html(expected, actual)
+    if kind == 'excel':
+        return compare_workbooks(expected, actual)
+    return compare_packages(expected, actual)
+
+def run(datasets: int = 10, rows: Tuple[int, ...] = (40, 300, 2000), per_company: int = 2, seed: int = 7,
+        candidate: str = 'reference', overrides: Optional[Dict[str, Optional[str]]] = None,
+        with_summary: bool = True) -> Dict:
+    """
+    Compara referencia y candidato sobre `datasets` conjuntos sintéticos.
+
+    Returns:
+        {'cases': n, 'failures': [{'dataset', 'kind', 'partition', 'diffs'}]}
+    """
+    from data.summary_cube import SummaryCube
+
+    reference = _reference_engines()
+    engines = candidate_engines(candidate, overrides or {})
+    cases, failures = 0, []
+    for i in range(datasets):
+        n_rows = rows[i % len(rows)]
+        df = make_dataset(n_rows, seed + i)
+        cube = SummaryCube.from_dataframe(df) if with_summary else None
+        groups = df.groupby(['EMPRESA', 'AÑO ASIGNACION', 'MES ASIGNACION'], sort=False).indices
+        for empresa, anio, mes in _partitions(df, per_company):
+            data = df.iloc[groups[(empresa, anio, mes)]]
+            summary = cube.get(empresa, anio, mes) if cube else None
+            args = (data, empresa, anio, mes, FUNCIONARIOS, summary)
+            kinds = ['preview', 'excel' if empresa == RAVAGO else 'word']
+            for kind in kinds:
+                cases += 1
+                diffs = compare_case(kind, reference[kind], engines[kind], args)
+                if diffs:
+                    failures.append({
+                        'dataset': f"{n_rows} filas, semilla {seed + i}",
+                        'kind': kind, 'partition': f"{empresa} {mes} {anio}", 'diffs': diffs,
+                    })
+    return {'cases': cases, 'failures': failures}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Equivalencia de salida entre el motor actual y uno candidato.")
+    parser.add_argument('--candidate', choices=['reference', 'modular'], default='reference',
+                        help="Motores base del candidato")
+    parser.add_argument('--word', help="Motor Word candidato (modulo:funcion)")
+    parser.add_argument('--excel', help="Motor Excel candidato (modulo:funcion)")
+    parser.add_argument('--preview', help="Motor de previsualización candidato (modulo:funcion)")
+    parser.add_argument('--datasets', type=int, default=10, help="Conjuntos sintéticos a generar")
+    parser.add_argument('--rows', default="40,300,2000", help="Tamaños de los conjuntos, en rotación")
+    parser.add_argument('--partitions', type=int, default=2, help="Particiones por empresa en cada conjunto")
+    parser.add_argument('--seed', type=int, default=7, help="Semilla inicial")
+    parser.add_argument('--no-summary', action='store_true', help="No pasar la fila del SummaryCube a los motores")
+    parser.add_argument('--json', type=Path, help="Guardar el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('TRM_RATES_PATH', str(write_rates(Path(tempfile.gettempdir()) / "facturacion_bench")))
+    result = run(
+        datasets=args.datasets, rows=tuple(int(r) for r in args.rows.split(',')), per_company=args.partitions,
+        seed=args.seed, candidate=args.candidate,
+        overrides={'word': args.word, 'excel': args.excel, 'preview': args.preview},
+        with_summary=not args.no_summary,
+    )
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+
+    for failure in result['failures'][:10]:
+        print(f"DIFERENTE {failure['kind']} · {failure['partition']} · {failure['dataset']}")
+        for line in failure['diffs'][:MAX_DIFF_LINES * 2]:
+            print(f"  {line}")
+    if result['failures']:
+        print(f"\n{len(result['failures'])} de {result['cases']} casos difieren.")
+        return 1
+    print(f"Los {result['cases']} casos son equivalentes.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
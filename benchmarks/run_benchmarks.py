@@ -0,0 +1,281 @@
+"""
+Mide por etapa el flujo de la aplicación sobre libros sintéticos.
+
+Uso:
+    python -m benchmarks.run_benchmarks --sizes 1k,100k,1M --output bench.json
+
+Cada tamaño reporta, por etapa, el tiempo (wall), las filas por segundo y el
+pico de RSS del proceso durante la etapa, en un JSON que se puede comparar
+entre commits. Con --memory agrega por etapa (y sub-etapa: pd.concat,
+df.copy, docx.save...) el pico y la memoria retenida según tracemalloc; los
+tiempos de esa corrida no son comparables con los normales.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from utils import mem_profile, perf_trace
+from .synthetic_workbook import get_workbook, write_rates
+
+DEFAULT_SIZES = "1k,100k,1M"
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "facturacion_bench"
+
+# Empresas usadas en las etapas de generación (Word y Excel)
+WORD_EMPRESA = 'Gwealth'
+EXCEL_EMPRESA = 'Ravago Americas LLC'
+
+FUNCIONARIOS = {'reporta': "Benchmark", 'revisor': "Benchmark"}
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def parse_size(text: str) -> int:
+    """Convierte '1k', '100k' o '1M' en número de filas."""
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if factor > 1 else text
+    return int(float(number) * factor)
+
+def _current_rss() -> Optional[int]:
+    """RSS actual del proceso en bytes (None si la plataforma no lo expone)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _max_rss() -> int:
+    """Pico de RSS del proceso desde que arrancó, en bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class PeakRssSampler:
+    """
+    Muestrea el RSS en un hilo mientras dura el bloque `with`.
+
+    Donde no hay /proc usa ru_maxrss, que es el pico de todo el proceso.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss() or 0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> 'PeakRssSampler':
+        if _current_rss() is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, _current_rss() or 0)
+        else:
+            self.peak = _max_rss()
+        return False
+
+def measure(stages: Dict[str, Dict], name: str, rows: int, fn: Callable):
+    """
+    Ejecuta `fn`, guarda su medición en `stages[name]` y retorna su resultado.
+
+    Args:
+        stages: Diccionario de resultados del tamaño actual
+        name: Nombre de la etapa
+        rows: Filas que procesa la etapa (para filas/segundo)
+        fn: Función sin argumentos que ejecuta la etapa
+    """
+    run = perf_trace.begin_run(name) if mem_profile.is_active() else None
+    try:
+        with PeakRssSampler() as sampler:
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+    finally:
+        if run is not None:
+            perf_trace.end_run()
+    stages[name] = {
+        'seconds': round(elapsed, 6),
+        'rows': int(rows),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_bytes': sampler.peak,
+    }
+    if run is not None:
+        stages[name]['memory'] = mem_profile.stage_summary(run.breakdown())
+    return result
+
+def _largest_partition(df, empresa: str):
+    """(año, mes) con más filas para la empresa, o None si no tiene datos."""
+    rows = df[df['EMPRESA'] == empresa]
+    if rows.empty:
+        return None
+    counts = rows.groupby(['AÑO ASIGNACION', 'MES ASIGNACION'], sort=False).size()
+    anio, mes = counts.idxmax()
+    return anio.item() if hasattr(anio, 'item') else anio, mes
+
+# Filas del libro con el que se revisa la carga repetida de los mismos archivos
+RELOAD_CHECK_ROWS = 1_000
+
+def check_reload(seed: int, cache_dir: Path):
+    """
+    Carga dos veces los mismos archivos abiertos (un .xlsx y un .zip) y exige las mismas filas.
+
+    Cada carga lee los archivos para estimar la memoria y otra vez para leerlos;
+    un archivo que queda al final tras la primera lectura se cargaría vacío.
+
+    Raises:
+        RuntimeError: Si alguna carga no devuelve todas las filas del libro
+    """
+    import app
+
+    workbook = get_workbook(cache_dir, RELOAD_CHECK_ROWS, seed)
+    archive = workbook.with_suffix('.zip')
+    if not archive.exists():
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+            z.write(workbook, workbook.name)
+    for path in (workbook, archive):
+        with open(path, 'rb') as f:
+            for attempt in (1, 2):
+                rows = len(app.load_excel_files([f]))
+                if rows != RELOAD_CHECK_ROWS:
+                    raise RuntimeError(
+                        f"{path.name}: la carga {attempt} devolvió {rows} filas de {RELOAD_CHECK_ROWS}"
+                    )
+
+def run_size(n_rows: int, seed: int, cache_dir: Path) -> Dict:
+    """
+    Corre todas las etapas para un libro sintético de `n_rows` filas.
+
+    Returns:
+        {'rows', 'workbook_bytes', 'stages': {etapa: medición}}
+    """
+    import app
+    import excel_generator_ravago
+    import report_generator
+    from data.summary_cube import SummaryCube
+    from reports.report_factory import ReportFactory
+
+    workbook = get_workbook(cache_dir, n_rows, seed)
+    stages: Dict[str, Dict] = {}
+
+    def load():
+        with open(workbook, 'rb') as f:
+            return app.load_excel_files([f])
+
+    df = measure(stages, 'load_excel_files', n_rows, load)
+    cube = measure(stages, 'summary_cube', len(df), lambda: SummaryCube.from_dataframe(df))
+
+    word_partition = _largest_partition(df, WORD_EMPRESA)
+    if word_partition:
+        anio, mes = word_partition
+        data = measure(stages, 'filter_data', len(df), lambda: app.filter_data(df, WORD_EMPRESA, anio, mes))
+        summary = cube.get(WORD_EMPRESA, anio, mes)
+        measure(stages, 'generate_preview_html', len(data), lambda: app.preview_generator_html.generate_preview_html(
+            data, WORD_EMPRESA, anio, mes, FUNCIONARIOS, summary))
+        measure(stages, 'generate_report', len(data), lambda: report_generator.generate_report(
+            data, WORD_EMPRESA, anio, mes, FUNCIONARIOS, summary))
+
+    excel_partition = _largest_partition(df, EXCEL_EMPRESA)
+    if excel_partition:
+        anio, mes = excel_partition
+        data = app.filter_data(df, EXCEL_EMPRESA, anio, mes)
+        summary = cube.get(EXCEL_EMPRESA, anio, mes)
+        measure(stages, 'create_ravago_report', len(data), lambda: excel_generator_ravago.create_ravago_report(
+            data, anio, mes, {'reporta': "", 'revisor': ""}, summary))
+
+    # Lote: un reporte por empresa del mes con más registros
+    counts = df.groupby(['AÑO ASIGNACION', 'MES ASIGNACION'], sort=False).size()
+    if not counts.empty:
+        anio, mes = counts.idxmax()
+        partitions = [(empresa, anio, mes) for empresa in sorted(df['EMPRESA'].unique())]
+        batch_rows = int(counts.max())
+
+        def batch():
+            return [buffer.getbuffer().nbytes for _, buffer, _ in
+                    ReportFactory().create_batch_reports(df, partitions, FUNCIONARIOS, cube)]
+
+        measure(stages, 'create_batch_reports', batch_rows, batch)
+
+    return {'rows': n_rows, 'workbook_bytes': workbook.stat().st_size, 'stages': stages}
+
+def _git_commit() -> Optional[str]:
+    """Commit actual del repositorio (None fuera de git)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, check=True
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes: List[int], seed: int = 42, cache_dir: Path = DEFAULT_CACHE_DIR) -> Dict:
+    """
+    Corre el benchmark para cada tamaño.
+
+    Returns:
+        Diccionario con 'meta' (commit, versiones, fecha) y 'results' (uno por tamaño)
+    """
+    import pandas as pd
+
+    os.environ.setdefault('TRM_RATES_PATH', str(write_rates(cache_dir)))
+    check_reload(seed, cache_dir)
+    results = [run_size(n, seed, cache_dir) for n in sizes]
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+            'max_rss_bytes': _max_rss(),
+            'memory_profiling': mem_profile.is_active(),
+        },
+        'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapa sobre libros Excel sintéticos.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Tamaños separados por coma (ej. 1k,100k,1M)")
+    parser.add_argument('--seed', type=int, default=42, help="Semilla del generador")
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                        help="Carpeta donde se guardan los libros generados")
+    parser.add_argument('--output', type=Path, help="Archivo JSON de salida (por defecto, stdout)")
+    parser.add_argument('--memory', action='store_true', help="Perfilar memoria por etapa con tracemalloc")
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        mem_profile.enable()
+        perf_trace.set_enabled(True)
+
+    # app.py importa streamlit: fuera de `streamlit run` solo avisa que no hay sesión
+    import streamlit.logger
+    streamlit.logger.set_log_level('error')
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    report = run(sizes, args.seed, args.cache_dir)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text + "\n", encoding='utf-8')
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
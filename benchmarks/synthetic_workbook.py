@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from openpyxl import Workbook
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+         "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+# Empresas con su peso en el volumen y su tarifa habitual por caso (USD)
+EMPRESAS = {
+    'Altimetrik': (0.35, [18.0, 22.5, 25.0]),
+    'Gwealth': (0.40, [12.5, 15.0]),
+    'Ravago Americas LLC': (0.25, [20.25, 30.0]),
+}
+
+TIPOS_DOCUMENTO = ["NIT", "CC", "CE", "Pasaporte"]
+
+# Parte de los registros viene en pesos (tarifa en USD * una TRM aproximada)
+FOREIGN_SHARE = 0.03
+COP_PER_USD = 4000
+
+COLUMNS = [
+    'EMPRESA', 'AÑO ASIGNACION', 'MES ASIGNACION', 'NO. CASO', 'NOMBRE', 'TIPO DE DOCUMENTO',
+    'MONEDA', 'VALOR', 'FECHA ASIGNACION', 'FECHA ENTREGA',
+]
+
+def generate_dataframe(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Genera datos de facturación sintéticos y reproducibles.
+
+    Args:
+        n_rows: Número de filas
+        seed: Semilla del generador aleatorio
+
+    Returns:
+        DataFrame con las columnas de los archivos de entrada
+    """
+    rng = np.random.default_rng(seed)
+    nombres_empresa = list(EMPRESAS)
+    pesos = np.array([EMPRESAS[e][0] for e in nombres_empresa])
+    empresa_idx = rng.choice(len(nombres_empresa), n_rows, p=pesos / pesos.sum())
+
+    # Cada empresa repite casi siempre su tarifa principal (la moda de GWealth)
+    valores = np.empty(n_rows)
+    for i, nombre in enumerate(nombres_empresa):
+        mask = empresa_idx == i
+        tarifas = EMPRESAS[nombre][1]
+        probs = np.full(len(tarifas), 0.1 / max(len(tarifas) - 1, 1))
+        probs[0] = 0.9 if len(tarifas) > 1 else 1.0
+        valores[mask] = rng.choice(tarifas, mask.sum(), p=probs)
+
+    fechas = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 730, n_rows), unit="D")
+    entrega = fechas + pd.to_timedelta(rng.integers(1, 20, n_rows), unit="D")
+
+    monedas = np.where(rng.random(n_rows) < FOREIGN_SHARE, 'COP', 'USD')
+    valores = np.where(monedas == 'COP', valores * COP_PER_USD, valores)
+
+    return pd.DataFrame({
+        'EMPRESA': np.array(nombres_empresa, dtype=object)[empresa_idx],
+        'AÑO ASIGNACION': fechas.year.to_numpy(),
+        'MES ASIGNACION': np.array(MESES, dtype=object)[fechas.month.to_numpy() - 1],
+        'NO. CASO': np.arange(1, n_rows + 1) + 100000,
+        'NOMBRE': [f"Cliente {i:05d} S.A.S" for i in rng.integers(0, max(n_rows // 20, 1), n_rows)],
+        'TIPO DE DOCUMENTO': rng.choice(TIPOS_DOCUMENTO, n_rows),
+        'MONEDA': monedas,
+        'VALOR': valores,
+        'FECHA ASIGNACION': fechas,
+        'FECHA ENTREGA': entrega,
+    }, columns=COLUMNS)
+
+def write_workbook(path: Path, n_rows: int, seed: int = 42) -> Path:
+    """
+    Escribe un libro .xlsx sintético como los que se suben a la aplicación.
+
+    Usa el modo write_only de openpyxl para poder escribir 1M de filas
+    sin tener todas las celdas en memoria.
+
+    Args:
+        path: Ruta del archivo a crear
+        n_rows: Número de filas
+        seed: Semilla del generador aleatorio
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    df = generate_dataframe(n_rows, seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Datos")
+    ws.append(COLUMNS)
+    for fila in df.itertuples(index=False, name=None):
+        ws.append([
+            v.to_pydatetime() if isinstance(v, pd.Timestamp)
+            else v.item() if isinstance(v, np.generic)
+            else v
+            for v in fila
+        ])
+    wb.save(path)
+    return path
+
+def write_rates(cache_dir: Path) -> Path:
+    """Tabla de TRM para los registros en COP de los datos sintéticos."""
+    path = Path(cache_dir) / "trm_rates.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"MONEDA,FECHA,TASA\nCOP,2020-01-01,{COP_PER_USD}\n")
+    return path
+
+def get_workbook(cache_dir: Path, n_rows: int, seed: int = 42) -> Path:
+    """
+    Libro sintético para (n_rows, seed), generado solo si no está ya en `cache_dir`.
+
+    Args:
+        cache_dir: Carpeta donde se guardan los libros generados
+        n_rows: Número de filas
+        seed: Semilla del generador aleatorio
+
+    Returns:
+        Ruta del libro
+    """
+    path = Path(cache_dir) / f"facturacion_{n_rows}_s{seed}.xlsx"
+    if not path.exists():
+        write_workbook(path, n_rows, seed)
+    return path
@@ -0,0 +1,294 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from utils.money_utils import CENTAVOS_COLUMN, format_cents, valor_cents
+from utils.formatting_utils import format_cents_column
+
+# Tabla de tasas local; se puede apuntar a otro archivo con TRM_RATES_PATH
+RATES_PATH = Path(__file__).resolve().parent.parent / "assets" / "trm_rates.csv"
+
+BASE_CURRENCY = 'USD'
+
+# Columna con VALOR convertido a centavos de USD (Int64, <NA> si no hay tasa)
+USD_CENTAVOS_COLUMN = 'VALOR_USD_CENTAVOS'
+
+# Las tasas se guardan como enteros con 4 decimales para convertir sin float
+RATE_SCALE = 10_000
+
+CURRENCY_ALIASES = {
+    'US$': 'USD', 'USD$': 'USD', 'DOLAR': 'USD', 'DÓLAR': 'USD', 'DOLARES': 'USD', 'DÓLARES': 'USD',
+    'COP$': 'COP', 'PESO': 'COP', 'PESOS': 'COP',
+}
+
+def normalize_currency(values: pd.Series) -> pd.Series:
+    """Normaliza códigos de moneda (mayúsculas, alias); sin moneda se asume USD."""
+    codes = values.astype('string').str.strip().str.upper()
+    codes = codes.replace(CURRENCY_ALIASES)
+    return codes.fillna(BASE_CURRENCY).replace('', BASE_CURRENCY)
+
+def _divide_half_up(cents: np.ndarray, rate_ticks: np.ndarray) -> np.ndarray:
+    """cents * RATE_SCALE / rate_ticks redondeado al centavo (medios alejándose de cero), en int64."""
+    numerator = np.abs(cents) * RATE_SCALE * 2 + rate_ticks
+    converted = numerator // (rate_ticks * 2)
+    return np.where(cents < 0, -converted, converted)
+
+class RateTable:
+    """Tasas de cambio por moneda y fecha de vigencia (unidades de moneda por 1 USD)."""
+
+    def __init__(self, rates: pd.DataFrame):
+        self.rates = rates
+
+    @classmethod
+    def from_csv(cls, path: Path) -> 'RateTable':
+        """
+        Lee la tabla de tasas desde un CSV con columnas MONEDA, FECHA y TASA.
+
+        Args:
+            path: Ruta del archivo (las líneas con '#' son comentarios)
+
+        Returns:
+            RateTable (vacía si el archivo no existe)
+        """
+        if not Path(path).exists():
+            return cls.empty()
+
+        raw = pd.read_csv(path, comment='#', dtype=str, skipinitialspace=True)
+        tasa = pd.to_numeric(raw['TASA'], errors='coerce')
+        rates = pd.DataFrame({
+            'MONEDA': normalize_currency(raw['MONEDA']),
+            'FECHA': pd.to_datetime(raw['FECHA'], errors='coerce').astype('datetime64[ns]'),
+            '_tasa': np.rint(tasa * RATE_SCALE),
+        }).dropna()
+        rates = rates[rates['_tasa'] > 0]
+        rates['_tasa'] = rates['_tasa'].astype('int64')
+        return cls(rates.sort_values('FECHA', kind='stable').reset_index(drop=True))
+
+    @classmethod
+    def empty(cls) -> 'RateTable':
+        """Tabla sin tasas: solo se podrán convertir montos en USD."""
+        return cls(pd.DataFrame({
+            'MONEDA': pd.Series(dtype='string'),
+            'FECHA': pd.Series(dtype='datetime64[ns]'),
+            '_tasa': pd.Series(dtype='int64'),
+        }))
+
+class CurrencyConverter:
+    """Convierte VALOR a USD uniendo cada fila con la tasa vigente en su FECHA ASIGNACION."""
+
+    def __init__(self, rate_table: Optional[RateTable] = None):
+        self.rate_table = rate_table or RateTable.empty()
+
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Agrega (en el mismo DataFrame) la columna VALOR_USD_CENTAVOS.
+
+        Es una operación columnar: un merge_asof por moneda y fecha sobre las
+        filas en otra moneda, y una división entera vectorizada.
+
+        Args:
+            df: DataFrame combinado (con VALOR_CENTAVOS o VALOR)
+
+        Returns:
+            El mismo DataFrame
+        """
+        if 'VALOR' not in df.columns and CENTAVOS_COLUMN not in df.columns:
+            return df
+
+        cents = valor_cents(df)
+        if 'MONEDA' in df.columns:
+            monedas = normalize_currency(df['MONEDA'])
+        else:
+            monedas = pd.Series(BASE_CURRENCY, index=df.index)
+
+        usd = cents.copy()
+        foreign = (monedas != BASE_CURRENCY).to_numpy()
+        if foreign.any():
+            usd[foreign] = pd.NA
+            converted = self._convert_foreign(df, cents, monedas, foreign)
+            usd.iloc[converted.index] = converted.to_numpy()
+
+        df[USD_CENTAVOS_COLUMN] = usd
+        return df
+
+    def _convert_foreign(self, df: pd.DataFrame, cents: pd.Series, monedas: pd.Series,
+                         foreign: np.ndarray) -> pd.Series:
+        """Convierte las filas en otra moneda; retorna centavos USD indexados por posición."""
+        if 'FECHA ASIGNACION' in df.columns:
+            fechas = pd.to_datetime(df['FECHA ASIGNACION'], errors='coerce').astype('datetime64[ns]')
+        else:
+            fechas = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+
+        positions = np.flatnonzero(foreign)
+        rows = pd.DataFrame({
+            '_pos': positions,
+            'MONEDA': monedas.to_numpy()[positions],
+            'FECHA': fechas.to_numpy()[positions],
+            '_cents': cents.to_numpy(dtype='float64', na_value=np.nan)[positions],
+        }).dropna(subset=['FECHA', '_cents'])
+        if rows.empty or self.rate_table.rates.empty:
+            return pd.Series(dtype='int64')
+
+        rows['MONEDA'] = rows['MONEDA'].astype(self.rate_table.rates['MONEDA'].dtype)
+        merged = pd.merge_asof(
+            rows.sort_values('FECHA', kind='stable'), self.rate_table.rates,
+            on='FECHA', by='MONEDA', direction='backward'
+        ).dropna(subset=['_tasa'])
+
+        converted = _divide_half_up(
+            merged['_cents'].to_numpy().astype('int64'), merged['_tasa'].to_numpy().astype('int64')
+        )
+        return pd.Series(converted, index=merged['_pos'].to_numpy())
+
+    def subtotals(self, df: pd.DataFrame, by=None) -> pd.DataFrame:
+        """
+        Subtotales por moneda, en la moneda original y convertidos a USD.
+
+        Args:
+            df: DataFrame con VALOR_USD_CENTAVOS (o se convierte una copia)
+            by: Columnas adicionales de agrupación (por ejemplo las de partición)
+
+        Returns:
+            DataFrame con MONEDA, registros, cents, usd_cents, sin_tasa y
+            sin_tasa_cents (monto en la moneda original de las filas sin tasa)
+        """
+        if USD_CENTAVOS_COLUMN not in df.columns:
+            df = self.convert(df.copy())
+        by = list(by or [])
+        if USD_CENTAVOS_COLUMN not in df.columns:
+            return pd.DataFrame(columns=by + ['MONEDA', 'registros', 'cents', 'usd_cents', 'sin_tasa',
+                                              'sin_tasa_cents'])
+
+        cents = valor_cents(df)
+        usd = df[USD_CENTAVOS_COLUMN]
+        monedas = normalize_currency(df['MONEDA']) if 'MONEDA' in df.columns else BASE_CURRENCY
+        sin_tasa = usd.isna() & cents.notna()
+        frame = df[by].assign(
+            MONEDA=monedas, _cents=cents, _usd=usd, _sin_tasa=sin_tasa, _pendiente=cents.where(sin_tasa)
+        )
+        grouped = frame.groupby(by + ['MONEDA'], sort=False, dropna=False)
+        return pd.DataFrame({
+            'registros': grouped.size(),
+            'cents': grouped['_cents'].sum(),
+            'usd_cents': grouped['_usd'].sum(),
+            'sin_tasa': grouped['_sin_tasa'].sum(),
+            'sin_tasa_cents': grouped['_pendiente'].sum(),
+        }).reset_index()
+
+_converter_lock = threading.Lock()
+_converter: Optional[CurrencyConverter] = None
+_converter_key: Optional[Tuple] = None
+
+def get_default_converter() -> CurrencyConverter:
+    """Convertidor con la tabla local de tasas; se recarga si el archivo cambió."""
+    global _converter, _converter_key
+    path = Path(os.environ.get('TRM_RATES_PATH', RATES_PATH))
+    key = (str(path), path.stat().st_mtime if path.exists() else None)
+    with _converter_lock:
+        if _converter is None or key != _converter_key:
+            _converter = CurrencyConverter(RateTable.from_csv(path))
+            _converter_key = key
+        return _converter
+
+def usd_cents(data: pd.DataFrame) -> pd.Series:
+    """
+    Obtiene VALOR en centavos de USD, usando la columna precalculada si existe.
+
+    Args:
+        data: DataFrame con los datos
+
+    Returns:
+        Serie Int64 en centavos de USD (<NA> en filas sin tasa)
+    """
+    if USD_CENTAVOS_COLUMN in data.columns:
+        return data[USD_CENTAVOS_COLUMN]
+    if 'VALOR' not in data.columns and CENTAVOS_COLUMN not in data.columns:
+        return pd.Series(dtype='Int64')
+    return get_default_converter().convert(data.copy())[USD_CENTAVOS_COLUMN]
+
+def format_usd_column(data: pd.DataFrame) -> pd.Series:
+    """
+    Montos por fila convertidos a USD, como texto para el detalle de Ravago.
+
+    Args:
+        data: DataFrame con los datos
+
+    Returns:
+        Serie de texto alineada con `data` ('Sin TRM' si falta la tasa, 'USD 0.00' sin monto)
+    """
+    zero = f"{BASE_CURRENCY} 0.00"
+    if 'VALOR' not in data.columns and CENTAVOS_COLUMN not in data.columns:
+        return pd.Series(zero, index=data.index, dtype=object)
+    usd = usd_cents(data)
+    sin_tasa = usd.isna() & valor_cents(data).notna()
+    return format_cents_column(usd, currency=BASE_CURRENCY, na_rep=zero).mask(sin_tasa, "Sin TRM")
+
+def currency_subtotals(data: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    Subtotales por moneda de un conjunto de filas (por ejemplo una partición).
+
+    Returns:
+        {moneda: {'registros', 'cents', 'usd_cents', 'sin_tasa', 'sin_tasa_cents'}}
+    """
+    subtotals = get_default_converter().subtotals(data)
+    return {
+        row['MONEDA']: {
+            'registros': int(row['registros']),
+            'cents': int(row['cents']),
+            'usd_cents': int(row['usd_cents']),
+            'sin_tasa': int(row['sin_tasa']),
+            'sin_tasa_cents': int(row['sin_tasa_cents']),
+        }
+        for row in subtotals.to_dict('records')
+    }
+
+def has_foreign_currency(subtotals: Dict[str, Dict]) -> bool:
+    """Indica si hay montos en una moneda distinta de USD (y por tanto subtotales que mostrar)."""
+    return any(moneda != BASE_CURRENCY for moneda in subtotals)
+
+def subtotal_rows(subtotals: Dict[str, Dict]) -> Tuple[List[Tuple[str, str, str, str]], int]:
+    """
+    Filas listas para mostrar de la tabla de subtotales por moneda.
+
+    Args:
+        subtotals: Resultado de currency_subtotals() o 'subtotales_moneda' del SummaryCube
+
+    Returns:
+        (filas (moneda, registros, subtotal en la moneda, subtotal USD), total USD en centavos)
+    """
+    rows = []
+    total_usd = 0
+    for moneda in sorted(subtotals, key=lambda m: (m != BASE_CURRENCY, str(m))):
+        entry = subtotals[moneda]
+        total_usd += entry['usd_cents']
+        if entry['sin_tasa'] == entry['registros']:
+            usd_text = "Sin TRM"
+        elif entry['sin_tasa']:
+            usd_text = f"{format_cents(entry['usd_cents'])} ({entry['sin_tasa']} sin TRM)"
+        else:
+            usd_text = format_cents(entry['usd_cents'])
+        rows.append((str(moneda), str(entry['registros']), format_cents(entry['cents'], moneda), usd_text))
+    return rows, total_usd
+
+def unconverted_amounts(subtotals: Dict[str, Dict]) -> str:
+    """
+    Montos que no entran en los totales en USD por falta de TRM, en su moneda original.
+
+    Args:
+        subtotals: Resultado de currency_subtotals() o 'subtotales_moneda' del SummaryCube
+
+    Returns:
+        Texto como "COP 363,000.00" (varias monedas unidas con " + "), o "" si todo se convirtió
+    """
+    return " + ".join(
+        format_cents(entry.get('sin_tasa_cents', 0), moneda)
+        for moneda, entry in sorted(subtotals.items(), key=lambda item: str(item[0]))
+        if entry['sin_tasa']
+    )
+
+def with_unconverted(total_text: str, subtotals: Dict[str, Dict]) -> str:
+    """Agrega a un total en USD los montos sin convertir, marcados como tales."""
+    pending = unconverted_amounts(subtotals)
+    return f"{total_text} + {pending} sin convertir (sin TRM)" if pending else total_text
@@ -1,8 +1,10 @@
 import pandas as pd
+from utils.perf_trace import span, traced
 
 class DataFilter:
     """Maneja el filtrado de datos."""
     
+    @traced()
     def filter_data(self, df: pd.DataFrame, empresa: str, anio: str, mes: str) -> pd.DataFrame:
         """
         Filtra el DataFrame según los criterios especificados.
@@ -19,7 +21,8 @@ class DataFilter:
         if df.empty:
             return pd.DataFrame()
 
-        filtered = df.copy()
+        with span("df.copy", rows=len(df)):
+            filtered = df.copy()
 
         if empresa and empresa != "Todas":
             filtered = filtered[filtered['EMPRESA'] == empresa]
@@ -0,0 +1,194 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+from .partition_index import PARTITION_KEYS
+from utils.money_utils import CENTAVOS_COLUMN, valor_cents
+from .currency_converter import USD_CENTAVOS_COLUMN
+
+MESES_ORDENADOS = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+]
+
+class DataGrid:
+    """Operaciones del lado del servidor para la tabla de datos (resumen, búsqueda, orden y páginas)."""
+
+    def summarize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Resume los datos por empresa, año y mes de asignación.
+
+        Args:
+            df: DataFrame filtrado
+
+        Returns:
+            DataFrame con una fila por partición, su número de registros y el total de VALOR
+        """
+        if df.empty or not all(col in df.columns for col in PARTITION_KEYS):
+            return pd.DataFrame(columns=PARTITION_KEYS + ['REGISTROS', 'VALOR'])
+
+        grouped = df.groupby(PARTITION_KEYS, sort=False, dropna=False)
+        summary = grouped.size().rename('REGISTROS').to_frame()
+        if 'VALOR' in df.columns:
+            cents = df[PARTITION_KEYS].assign(_cents=valor_cents(df))
+            totals = cents.groupby(PARTITION_KEYS, sort=False, dropna=False)['_cents'].sum(min_count=1)
+            summary['VALOR'] = totals / 100
+        return self._sort_partitions(summary.reset_index())
+
+    def summarize_cube(self, cube_rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Da formato de resumen a filas ya agregadas del SummaryCube.
+
+        Args:
+            cube_rows: Resultado de SummaryCube.select()
+
+        Returns:
+            DataFrame con una fila por partición: registros, documentos, total de VALOR y monedas
+        """
+        columns = PARTITION_KEYS + ['REGISTROS', 'DOCUMENTOS', 'VALOR', 'MONEDAS']
+        if cube_rows.empty:
+            return pd.DataFrame(columns=columns)
+
+        summary = cube_rows.rename(columns={'num_rows': 'REGISTROS', 'num_docs': 'DOCUMENTOS'})
+        summary['VALOR'] = summary['total_cents'] / 100
+        summary['MONEDAS'] = [
+            ", ".join(str(moneda) for moneda in monedas) for monedas in summary['monedas']
+        ]
+        return self._sort_partitions(summary[columns])
+
+    def _sort_partitions(self, summary: pd.DataFrame) -> pd.DataFrame:
+        """Ordena por empresa, año descendente y mes en orden cronológico (no alfabético)."""
+        month_order = {mes: i for i, mes in enumerate(MESES_ORDENADOS)}
+        summary = summary.assign(_mes_idx=summary['MES ASIGNACION'].map(month_order))
+        summary = summary.sort_values(
+            ['EMPRESA', 'AÑO ASIGNACION', '_mes_idx'], ascending=[True, False, True]
+        )
+        return summary.drop(columns='_mes_idx').reset_index(drop=True)
+
+    def partition_mask(self, df: pd.DataFrame, partition: Optional[Tuple]) -> Optional[np.ndarray]:
+        """Filas de una partición (empresa, año, mes) como máscara booleana, o None si es 'Todas'."""
+        if partition is None:
+            return None
+
+        mask = np.ones(len(df), dtype=bool)
+        for col, value in zip(PARTITION_KEYS, partition):
+            mask &= (df[col] == value).to_numpy()
+        return mask
+
+    def select_partition(self, df: pd.DataFrame, partition: Optional[Tuple]) -> pd.DataFrame:
+        """Restringe los datos a una partición (empresa, año, mes) para el detalle."""
+        mask = self.partition_mask(df, partition)
+        return df if mask is None else df[mask]
+
+    def search_mask(self, df: pd.DataFrame, text: str) -> Optional[np.ndarray]:
+        """
+        Busca un texto (sin distinguir mayúsculas) en las columnas de texto.
+
+        Args:
+            df: DataFrame donde buscar
+            text: Texto a buscar
+
+        Returns:
+            Máscara booleana de las filas que contienen el texto en alguna columna
+            de texto, o None si no hay nada que buscar
+        """
+        text = (text or "").strip()
+        if not text or df.empty:
+            return None
+
+        mask = np.zeros(len(df), dtype=bool)
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            mask |= df[col].astype(str).str.contains(text, case=False, regex=False, na=False).to_numpy()
+        return mask
+
+    def search(self, df: pd.DataFrame, text: str) -> pd.DataFrame:
+        """Filas que contienen el texto en alguna columna de texto (ver search_mask)."""
+        mask = self.search_mask(df, text)
+        return df if mask is None else df[mask]
+
+    def sort_order(self, df: pd.DataFrame, column: Optional[str], ascending: bool = True) -> Optional[np.ndarray]:
+        """
+        Posiciones de las filas ordenadas por una columna (estable, con nulos al final).
+
+        Una columna de texto libre puede mezclar números y texto, que no se
+        comparan entre sí: en ese caso se ordena por el valor como texto.
+
+        Args:
+            df: DataFrame a ordenar
+            column: Columna de orden (None = orden original)
+            ascending: Ascendente o descendente
+
+        Returns:
+            Posiciones para df.iloc, o None si no hay que ordenar
+        """
+        if not column or column not in df.columns:
+            return None
+        values = df[column].reset_index(drop=True)
+        try:
+            ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+        except TypeError:
+            ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last',
+                                         key=lambda col: col.where(col.isna(), col.astype(str)))
+        return ordered.index.to_numpy()
+
+    def sort(self, df: pd.DataFrame, column: Optional[str], ascending: bool = True) -> pd.DataFrame:
+        """Ordena por una columna (ver sort_order)."""
+        order = self.sort_order(df, column, ascending)
+        return df if order is None else df.iloc[order]
+
+    def row_positions(self, df: pd.DataFrame, partition: Optional[Tuple], text: str,
+                      column: Optional[str], ascending: bool = True) -> np.ndarray:
+        """
+        Posiciones de las filas del detalle: partición, búsqueda y orden en un solo arreglo.
+
+        Args:
+            df: DataFrame filtrado
+            partition: Partición elegida en el resumen (None = todas)
+            text: Texto a buscar
+            column: Columna de orden (None = orden original)
+            ascending: Ascendente o descendente
+
+        Returns:
+            Posiciones para df.iloc, en el orden en que se muestran
+        """
+        positions = np.arange(len(df))
+        mask = self.partition_mask(df, partition)
+        if mask is not None:
+            positions = positions[mask]
+        rows = df.iloc[positions] if mask is not None else df
+
+        mask = self.search_mask(rows, text)
+        if mask is not None:
+            positions = positions[mask]
+            rows = rows[mask]
+
+        order = self.sort_order(rows, column, ascending)
+        return positions if order is None else positions[order]
+
+    def visible_columns(self, df: pd.DataFrame) -> list:
+        """Columnas que se muestran al usuario (sin las auxiliares en centavos)."""
+        return [col for col in df.columns if col not in (CENTAVOS_COLUMN, USD_CENTAVOS_COLUMN)]
+
+    def page_count(self, n_rows: int, page_size: int) -> int:
+        """Número de páginas (al menos una)."""
+        return max(1, math.ceil(n_rows / page_size))
+
+    def page(self, df: pd.DataFrame, page_number: int, page_size: int) -> pd.DataFrame:
+        """
+        Obtiene una página de filas.
+
+        Args:
+            df: DataFrame ya buscado y ordenado
+            page_number: Número de página (desde 1)
+            page_size: Filas por página
+
+        Returns:
+            Solo las filas de la página solicitada
+        """
+        return df.iloc[self.page_slice(len(df), page_number, page_size)]
+
+    def page_slice(self, n_rows: int, page_number: int, page_size: int) -> slice:
+        """Rango de posiciones de una página (el número se acota a las páginas que hay)."""
+        page_number = min(max(1, page_number), self.page_count(n_rows, page_size))
+        start = (page_number - 1) * page_size
+        return slice(start, start + page_size)
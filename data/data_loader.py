@@ -1,47 +1,77 @@
 import pandas as pd
 import streamlit as st
 from typing import List
+from utils.admission import INTERACTIVE, estimate_upload_bytes, get_memory_budget
+from utils.column_schema import apply_input_schema, attach_schema
+from utils.load_diagnostics import LoadDiagnostics, attach_diagnostics
+from utils.money_utils import add_cents_column
+from utils.perf_trace import span, traced
+from utils.workbook_reader import read_workbooks
+from .currency_converter import get_default_converter
+from .data_validator import DataValidator
 
 class DataLoader:
     """Maneja la carga de archivos Excel."""
     
+    @traced()
     def load_excel_files(self, uploaded_files: List) -> pd.DataFrame:
         """
         Carga múltiples archivos Excel y los combina en un DataFrame.
         
         Args:
-            uploaded_files: Lista de archivos subidos por Streamlit
+            uploaded_files: Lista de archivos subidos por Streamlit (.xlsx, .xls o .zip con varios)
             
         Returns:
             DataFrame combinado con todos los datos
+            
+        Raises:
+            AdmissionError: Si la lectura no entra en el presupuesto de memoria
         """
         if not uploaded_files:
             return pd.DataFrame()
 
+        # Se reserva la memoria estimada de la lectura; si no hay lugar espera o se rechaza
+        budget = get_memory_budget()
+        with budget.reserve(estimate_upload_bytes(uploaded_files), INTERACTIVE, "la carga de archivos"):
+            return self._read_excel_files(uploaded_files)
+    
+    def _read_excel_files(self, uploaded_files: List) -> pd.DataFrame:
+        """Lee y combina los archivos (sin control de admisión; ver load_excel_files)."""
+        # Archivos sueltos y libros dentro de los .zip; con varios se leen en paralelo en los workers
+        frames, errors = read_workbooks(uploaded_files)
+        diagnostics = LoadDiagnostics()
+        for name, error in errors:
+            st.error(f"Error al leer el archivo {name}: {error}")
+            diagnostics.add_file_error(name, error)
+
+        # Tipos declarados por archivo (años, fechas); lo que no se puede leer queda en los diagnósticos
         all_data = []
-        
-        for file in uploaded_files:
-            try:
-                df = pd.read_excel(file, engine='openpyxl')
-                all_data.append(df)
-            except Exception as e:
-                st.error(f"Error al leer el archivo {file.name}: {e}")
-                continue
+        with span("input_schema", files=len(frames)):
+            for name, df in frames:
+                all_data.append(apply_input_schema(df, name, diagnostics))
+                diagnostics.add_source(name, len(df))
 
         if not all_data:
             return pd.DataFrame()
 
-        combined_df = pd.concat(all_data, ignore_index=True)
+        with span("pd.concat", files=len(all_data)):
+            combined_df = pd.concat(all_data, ignore_index=True)
+        attach_diagnostics(combined_df, diagnostics)
         
-        # Convertir columnas de fecha
-        self._convert_date_columns(combined_df)
+        # Columnas reales de cada campo, resueltas una vez y guardadas con los datos
+        attach_schema(combined_df)
         
-        return combined_df
-    
-    def _convert_date_columns(self, df: pd.DataFrame):
-        """Convierte las columnas de fecha al tipo datetime."""
-        date_columns = ['FECHA ASIGNACION', 'FECHA ENTREGA']
+        # Validación por columnas completas; las filas con problemas quedan en los diagnósticos
+        validator = DataValidator()
+        missing = validator.missing_columns(combined_df)
+        if missing:
+            st.error(f"Faltan columnas obligatorias en los archivos: {', '.join(missing)}")
+            return pd.DataFrame()
+        validator.validate(combined_df, diagnostics)
+        
+        # VALOR en centavos enteros para totales exactos, y convertido a USD
+        add_cents_column(combined_df)
+        get_default_converter().convert(combined_df)
         
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+        return combined_df
+
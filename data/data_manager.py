@@ -1,8 +1,15 @@
 import pandas as pd
 import streamlit as st
-from typing import List, Optional
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple, Union
+from utils.admission import AdmissionError
+from utils.load_diagnostics import LoadDiagnostics, get_diagnostics
 from .data_loader import DataLoader
 from .data_filter import DataFilter
+from .partition_index import PartitionHasher, PartitionCache
+from .summary_cube import SummaryCube
+from .download_spool import get_download_spool, current_session_id
+from .dataset_registry import dataset_key, get_dataset_registry
 
 class DataManager:
     """Gestor centralizado de datos para la aplicación."""
@@ -10,30 +17,82 @@ class DataManager:
     def __init__(self):
         self.data_loader = DataLoader()
         self.data_filter = DataFilter()
+        self.partition_hasher = PartitionHasher()
+        self.download_spool = get_download_spool()
+        self.dataset_registry = get_dataset_registry()
         self._initialize_session_state()
     
     def _initialize_session_state(self):
         """Inicializa el estado de sesión si no existe."""
         if 'df_combined' not in st.session_state:
             st.session_state.df_combined = pd.DataFrame()
+        if 'partition_hashes' not in st.session_state:
+            st.session_state.partition_hashes = {}
+            st.session_state.partition_diff = self.partition_hasher.diff({}, {})
+        if 'partition_cache' not in st.session_state:
+            st.session_state.partition_cache = PartitionCache()
+        if 'filter_options_cache' not in st.session_state:
+            st.session_state.filter_options_cache = {}
+        if 'summary_cube' not in st.session_state:
+            st.session_state.summary_cube = SummaryCube.from_dataframe(pd.DataFrame())
     
     def load_files(self, uploaded_files: List) -> bool:
         """Carga archivos y actualiza el estado de sesión."""
         if not uploaded_files:
             return False
         
-        df_combined = self.data_loader.load_excel_files(uploaded_files)
+        # El file_uploader devuelve los mismos archivos en cada rerun:
+        # solo se vuelve a leer si el conjunto de archivos cambió
+        signature = self._files_signature(uploaded_files)
+        if st.session_state.get('uploaded_signature') == signature:
+            return self.is_data_loaded()
+        
+        # Las sesiones que suben los mismos archivos comparten un único DataFrame
+        # (y sus índices); la sesión guarda el handle y una vista del DataFrame
+        try:
+            handle = self.dataset_registry.acquire(
+                dataset_key(uploaded_files),
+                lambda: self.data_loader.load_excel_files(uploaded_files)
+            )
+        except AdmissionError as e:
+            st.error(str(e))
+            return False
+        previous = st.session_state.get('dataset_handle')
+        if previous is not None:
+            previous.release()
+        st.session_state.dataset_handle = handle
+        
+        df_combined = handle.frame
         st.session_state.df_combined = df_combined
+        st.session_state.uploaded_signature = signature
+        st.session_state.filter_options_cache = {}
+        
+        # Detectar particiones modificadas respecto a la carga anterior
+        self._update_partition_hashes(handle.partition_hashes)
+        
+        # Totales por partición, calculados una sola vez por dataset
+        st.session_state.summary_cube = handle.summary_cube
         
         # Limpiar datos de descarga previos
         self._clear_download_data()
         
         return not df_combined.empty
     
+    def _files_signature(self, uploaded_files: List) -> tuple:
+        """Identifica un conjunto de archivos subidos."""
+        return tuple(
+            (f.name, getattr(f, 'size', None), getattr(f, 'file_id', None))
+            for f in uploaded_files
+        )
+    
     def get_data(self) -> pd.DataFrame:
         """Obtiene los datos combinados."""
         return st.session_state.df_combined
     
+    def get_load_diagnostics(self) -> LoadDiagnostics:
+        """Obtiene los valores que no se pudieron leer en la última carga."""
+        return get_diagnostics(st.session_state.df_combined)
+    
     def is_data_loaded(self) -> bool:
         """Verifica si hay datos cargados."""
         return not st.session_state.df_combined.empty
@@ -45,7 +104,12 @@ class DataManager:
         )
     
     def get_filter_options(self, empresa: Optional[str] = None, anio: Optional[str] = None):
-        """Obtiene las opciones disponibles para los filtros."""
+        """Obtiene las opciones disponibles para los filtros (memorizadas por selección)."""
+        cache_key = (empresa, anio)
+        cached = st.session_state.filter_options_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         df = st.session_state.df_combined
         
         if df.empty:
@@ -56,14 +120,14 @@ class DataManager:
             }
         
         # Empresas
-        empresas = ["Todas"] + sorted(df['EMPRESA'].unique().tolist())
+        empresas = ["Todas"] + sorted(df['EMPRESA'].dropna().unique().tolist())
         
         # Filtrar por empresa si está seleccionada
         if empresa and empresa != "Todas":
             df = df[df['EMPRESA'] == empresa]
         
         # Años
-        anios = ["Todos"] + sorted(df['AÑO ASIGNACION'].unique().tolist(), reverse=True)
+        anios = ["Todos"] + sorted(df['AÑO ASIGNACION'].dropna().unique().tolist(), reverse=True)
         
         # Filtrar por año si está seleccionado
         if anio and anio != "Todos":
@@ -77,36 +141,104 @@ class DataManager:
         meses_disponibles = df['MES ASIGNACION'].unique().tolist()
         meses = ["Todos"] + [mes for mes in meses_ordenados if mes in meses_disponibles]
         
-        return {
+        options = {
             'empresas': empresas,
             'anios': anios,
             'meses': meses
         }
+        st.session_state.filter_options_cache[cache_key] = options
+        
+        return options
+    
+    def _update_partition_hashes(self, current: Dict[Tuple, str]):
+        """Compara los hashes por partición con la carga anterior e invalida los artefactos obsoletos."""
+        previous = st.session_state.partition_hashes
+        diff = self.partition_hasher.diff(previous, current)
+        
+        st.session_state.partition_cache.invalidate(diff['changed'] + diff['removed'])
+        st.session_state.partition_hashes = current
+        st.session_state.partition_diff = diff
+    
+    def get_partition_hash(self, empresa: str, anio, mes: str) -> Optional[str]:
+        """Obtiene el hash de contenido de una partición, o None si no existe."""
+        return st.session_state.partition_hashes.get((empresa, anio, mes))
+    
+    def get_partition_diff(self) -> Dict[str, List[Tuple]]:
+        """Obtiene las diferencias por partición respecto a la carga anterior."""
+        return st.session_state.partition_diff
+    
+    def get_partitions_to_rebuild(self) -> List[Tuple]:
+        """Particiones nuevas o modificadas cuyos artefactos deben regenerarse."""
+        diff = st.session_state.partition_diff
+        return diff['added'] + diff['changed']
+    
+    def get_summary_cube(self) -> SummaryCube:
+        """Obtiene el resumen materializado de los datos cargados."""
+        return st.session_state.summary_cube
+    
+    def get_partition_summary(self, empresa: str, anio, mes: str) -> Optional[Dict]:
+        """Obtiene los totales precalculados de una partición, o None si no existe."""
+        return st.session_state.summary_cube.get(empresa, anio, mes)
+    
+    def get_partition_cache(self) -> PartitionCache:
+        """Obtiene la caché de artefactos por partición."""
+        return st.session_state.partition_cache
     
     def _clear_download_data(self):
-        """Limpia los datos de descarga del estado de sesión."""
-        keys_to_remove = ["download_bytes", "download_name", "download_mime"]
+        """Limpia los datos de descarga del estado de sesión (el archivo expira por TTL)."""
+        keys_to_remove = ["download_handle", "download_name"]
         for key in keys_to_remove:
             st.session_state.pop(key, None)
     
-    def set_download_data(self, bytes_data: bytes, filename: str, mime_type: str):
-        """Establece los datos para descarga."""
-        st.session_state.download_bytes = bytes_data
+    def set_download_data(self, payload: Union[bytes, BytesIO], filename: str, mime_type: str) -> Dict:
+        """
+        Guarda el archivo generado en disco y deja solo su handle en la sesión.
+        
+        Args:
+            payload: Bytes o stream del archivo generado
+            filename: Nombre de descarga
+            mime_type: Tipo MIME
+            
+        Returns:
+            Handle del archivo en el spool
+        """
+        handle = self.spool_download(payload, mime_type)
+        self.set_download_handle(handle, filename)
+        return handle
+    
+    def spool_download(self, payload: Union[bytes, BytesIO], mime_type: str) -> Dict:
+        """Guarda un archivo generado en el spool de la sesión y retorna su handle."""
+        return self.download_spool.store(current_session_id(), payload, mime_type)
+    
+    def is_download_available(self, handle: Optional[Dict]) -> bool:
+        """Indica si el archivo de un handle sigue disponible en disco."""
+        return self.download_spool.exists(handle)
+    
+    def set_download_handle(self, handle: Dict, filename: str):
+        """Establece un archivo ya guardado en el spool como descarga actual."""
+        st.session_state.download_handle = handle
         st.session_state.download_name = filename
-        st.session_state.download_mime = mime_type
     
     def has_download_data(self) -> bool:
-        """Verifica si hay datos listos para descarga."""
-        required_keys = ["download_bytes", "download_name", "download_mime"]
-        return all(key in st.session_state for key in required_keys)
+        """Verifica si hay un archivo listo para descarga (y que no haya expirado)."""
+        required_keys = ["download_handle", "download_name"]
+        if not all(key in st.session_state for key in required_keys):
+            return False
+        return self.is_download_available(st.session_state.download_handle)
     
     def get_download_data(self) -> tuple:
-        """Obtiene los datos de descarga."""
+        """
+        Obtiene los datos de descarga.
+        
+        Returns:
+            Tupla (función que lee el archivo, nombre, tipo MIME)
+        """
         if not self.has_download_data():
             return None, None, None
         
+        handle = st.session_state.download_handle
         return (
-            st.session_state.download_bytes,
+            self.download_spool.reader(handle),
             st.session_state.download_name,
-            st.session_state.download_mime
+            handle['mime']
         )
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from typing import List
+from utils.column_schema import get_column
+from utils.load_diagnostics import LoadDiagnostics
+from utils.perf_trace import span
+from .data_grid import MESES_ORDENADOS
+from .partition_index import PARTITION_KEYS
+
+class DataValidator:
+    """
+    Validación de los datos combinados, una vez al cargar y por columnas completas.
+
+    Cada revisión es una operación vectorizada sobre la columna (sin recorrer
+    filas), así la validación cuesta poco aun con un millón de filas. Las filas
+    con problemas no se descartan: se registran en los diagnósticos de carga
+    para mostrarlas antes de generar los reportes.
+    """
+
+    def missing_columns(self, df: pd.DataFrame) -> List[str]:
+        """
+        Columnas obligatorias que no están en ningún archivo.
+
+        Sin ellas no hay filtros (empresa, año y mes) ni totales (valor).
+
+        Args:
+            df: DataFrame combinado con el esquema resuelto
+
+        Returns:
+            Nombres de las columnas que faltan (vacía si están todas)
+        """
+        missing = [col for col in PARTITION_KEYS if col not in df.columns]
+        if get_column(df, 'valor') is None:
+            missing.append('VALOR')
+        return missing
+
+    def validate(self, df: pd.DataFrame, diagnostics: LoadDiagnostics) -> pd.DataFrame:
+        """
+        Revisa los datos combinados y deja la columna de valor como número (en el mismo DataFrame).
+
+        Revisa: valores no numéricos, vacíos en las columnas de partición y en el
+        valor, valores negativos, meses no reconocidos y números de caso repetidos.
+
+        Args:
+            df: DataFrame combinado con el esquema resuelto (ver missing_columns)
+            diagnostics: Tabla donde se registran las filas con problemas
+
+        Returns:
+            El mismo DataFrame
+        """
+        with span("validate", rows=len(df)):
+            valor_col = get_column(df, 'valor')
+            valor = df[valor_col]
+            failed = np.zeros(len(df), dtype=bool)
+            if not pd.api.types.is_numeric_dtype(valor):
+                # Texto en la columna de valor: queda vacío en lugar de romper los reportes
+                numeric = pd.to_numeric(valor, errors='coerce')
+                failed = (valor.notna() & numeric.isna()).to_numpy()
+                self._report(diagnostics, failed, valor, "no es un número")
+                df[valor_col] = valor = numeric
+
+            # Sin empresa, año o mes la fila no entra en ningún filtro ni reporte
+            for col in PARTITION_KEYS:
+                self._report(diagnostics, df[col].isna().to_numpy(), df[col], "vacío (fuera de todos los reportes)")
+            self._report(diagnostics, valor.isna().to_numpy() & ~failed, valor, "vacío")
+            self._report(diagnostics, (valor < 0).to_numpy(), valor, "valor negativo")
+
+            mes = df['MES ASIGNACION']
+            self._report(diagnostics, (mes.notna() & ~mes.isin(MESES_ORDENADOS)).to_numpy(), mes, "mes no reconocido")
+
+            documento_col = get_column(df, 'documento')
+            if documento_col is not None:
+                documento = df[documento_col]
+                repeated = (documento.notna() & documento.duplicated(keep='first')).to_numpy()
+                self._report(diagnostics, repeated, documento, "número de caso repetido")
+        return df
+
+    def _report(self, diagnostics: LoadDiagnostics, mask: np.ndarray, values: pd.Series, problema: str):
+        """Registra las filas marcadas en `mask` con su valor original."""
+        if not mask.any():
+            return
+        positions = np.flatnonzero(mask)
+        diagnostics.add_rows(positions, values.name, values.to_numpy()[positions], problema)
@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import weakref
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.admission import Reservation, get_memory_budget
+from utils.load_diagnostics import get_diagnostics
+from utils.perf_trace import span
+from .partition_index import PartitionHasher
+from .summary_cube import SummaryCube
+
+def dataset_key(uploaded_files: List) -> str:
+    """
+    Huella de contenido de un conjunto de archivos subidos.
+
+    Depende solo de los bytes y del orden de los archivos (no del nombre ni del
+    file_id de Streamlit), así dos sesiones que suben el mismo cierre de mes
+    obtienen la misma clave.
+
+    Args:
+        uploaded_files: Archivos subidos (UploadedFile o cualquier stream)
+
+    Returns:
+        Hash SHA-256 en hexadecimal
+    """
+    digest = hashlib.sha256()
+    for file in uploaded_files:
+        if hasattr(file, 'getvalue'):
+            payload = file.getvalue()
+        else:
+            file.seek(0)
+            payload = file.read()
+            file.seek(0)
+        digest.update(len(payload).to_bytes(8, 'little'))
+        digest.update(hashlib.sha256(payload).digest())
+    return digest.hexdigest()
+
+class _Entry:
+    """Un dataset cargado: el DataFrame y sus índices, compartidos por todas las sesiones."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.refs = 0
+        self.load_lock = threading.Lock()
+        self.frame: Optional[pd.DataFrame] = None
+        self.partition_hashes: Dict[Tuple, str] = {}
+        self.summary_cube: Optional[SummaryCube] = None
+        self.reservation: Optional[Reservation] = None
+
+class DatasetHandle:
+    """
+    Referencia de una sesión a un dataset del registro.
+
+    La sesión guarda el handle en su estado; cuando lo suelta (carga otros
+    archivos con release() o la sesión termina y el handle se recolecta)
+    el registro descuenta la referencia.
+    """
+
+    def __init__(self, registry: 'DatasetRegistry', entry: _Entry):
+        self.key = entry.key
+        self._entry = entry
+        self._finalizer = weakref.finalize(self, registry._release, entry)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """
+        Vista del DataFrame compartido.
+
+        Es una copia superficial: comparte los arreglos con el registro y, con
+        Copy-on-Write (siempre activo desde pandas 3, por eso requirements.txt
+        pide pandas>=3), cualquier modificación de la sesión copia solo lo que
+        cambia sin tocar los datos de las demás sesiones.
+        """
+        return self._entry.frame.copy(deep=False)
+
+    @property
+    def partition_hashes(self) -> Dict[Tuple, str]:
+        """Hashes de contenido por partición (solo lectura)."""
+        return self._entry.partition_hashes
+
+    @property
+    def summary_cube(self) -> SummaryCube:
+        """Resumen materializado por partición (solo lectura)."""
+        return self._entry.summary_cube
+
+    def release(self):
+        """Suelta la referencia (idempotente)."""
+        self._finalizer()
+
+class DatasetRegistry:
+    """
+    Datasets cargados, compartidos entre sesiones y con conteo de referencias.
+
+    Varias personas suelen subir los mismos archivos de cierre de mes; en lugar
+    de que cada sesión guarde su propio DataFrame combinado, las sesiones con
+    el mismo contenido comparten uno solo (con sus hashes por partición y su
+    SummaryCube). El dataset se libera cuando la última sesión que lo usa lo
+    suelta.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, loader: Callable[[], pd.DataFrame]) -> DatasetHandle:
+        """
+        Obtiene el dataset de una clave, cargándolo si ninguna sesión lo tiene.
+
+        Si dos sesiones piden la misma clave a la vez, solo una ejecuta `loader`
+        y la otra espera el resultado. Una carga vacía o con archivos que no se
+        pudieron leer no queda registrada: la sesión recibe su handle, pero la
+        próxima que suba los mismos archivos los vuelve a leer.
+
+        Args:
+            key: Huella de contenido (ver dataset_key)
+            loader: Función que lee y prepara el DataFrame combinado
+
+        Returns:
+            Handle de la sesión sobre el dataset
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(key)
+            entry.refs += 1
+
+        try:
+            with entry.load_lock:
+                if entry.frame is None:
+                    frame = loader()
+                    with span("dataset.index", rows=len(frame)):
+                        entry.partition_hashes = PartitionHasher().compute_hashes(frame)
+                        entry.summary_cube = SummaryCube.from_dataframe(frame)
+                    entry.frame = frame
+                    # El dataset ocupa memoria mientras alguna sesión lo use: cuenta en el presupuesto
+                    entry.reservation = get_memory_budget().hold(
+                        int(frame.memory_usage(deep=True).sum()), f"el dataset {key[:8]}"
+                    )
+                    if frame.empty or get_diagnostics(frame).file_errors:
+                        self._unregister(entry)
+        except BaseException:
+            self._release(entry)
+            raise
+
+        return DatasetHandle(self, entry)
+
+    def _unregister(self, entry: _Entry):
+        """Quita el dataset del registro sin soltar las referencias de las sesiones que ya lo tienen."""
+        with self._lock:
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+
+    def _release(self, entry: _Entry):
+        """Descuenta una referencia y elimina el dataset si ya nadie lo usa."""
+        with self._lock:
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+        if entry.reservation is not None:
+            entry.reservation.release()
+
+    def stats(self) -> List[Dict]:
+        """Datasets en memoria: clave, sesiones que lo usan, filas y bytes."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return [
+            {
+                'key': entry.key,
+                'refs': entry.refs,
+                'rows': len(entry.frame) if entry.frame is not None else 0,
+                'bytes': entry.reservation.nbytes if entry.reservation is not None else 0,
+            }
+            for entry in entries
+        ]
+
+_registry: Optional[DatasetRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_dataset_registry() -> DatasetRegistry:
+    """Obtiene el registro de datasets compartido por el proceso."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DatasetRegistry()
+        return _registry
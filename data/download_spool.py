@@ -0,0 +1,188 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+from io import BytesIO
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Directorio compartido por todas las sesiones del proceso
+SPOOL_ROOT = Path(tempfile.gettempdir()) / "facturacion_descargas"
+
+DEFAULT_TTL_SECONDS = 30 * 60               # archivos sin uso por 30 min se eliminan
+DEFAULT_SESSION_QUOTA = 200 * 1024 * 1024   # 200 MB por sesión
+# Tope por archivo: al descargar, Streamlit guarda el archivo completo en memoria (ver reader)
+DEFAULT_MAX_FILE_BYTES = 100 * 1024 * 1024  # 100 MB
+CLEANUP_INTERVAL_SECONDS = 60
+
+def current_session_id() -> str:
+    """Identificador de la sesión de Streamlit actual ('local' fuera de Streamlit)."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+class DownloadSpool:
+    """
+    Guarda en disco los archivos generados para descarga.
+
+    En el estado de sesión solo se conserva un handle (ruta, tipo MIME, tamaño);
+    los bytes se leen del disco cuando el usuario pulsa el botón de descarga.
+    Cada sesión tiene una cuota, cada archivo un tamaño máximo y los archivos
+    sin uso expiran por TTL.
+    """
+
+    def __init__(self, root: Path = SPOOL_ROOT, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 session_quota: int = DEFAULT_SESSION_QUOTA, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.session_quota = session_quota
+        self.max_file_bytes = max_file_bytes
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def store(self, session_id: str, payload: Union[bytes, BytesIO], mime_type: str) -> Dict:
+        """
+        Escribe un archivo generado en el directorio de la sesión.
+
+        Args:
+            session_id: Sesión dueña del archivo
+            payload: Bytes o stream (por ejemplo el BytesIO del generador)
+            mime_type: Tipo MIME del archivo
+
+        Returns:
+            Handle con 'path', 'mime', 'size' y 'created'
+
+        Raises:
+            ValueError: Si el archivo supera el tamaño máximo o, por sí solo, la cuota de la sesión
+        """
+        self.maybe_cleanup()
+
+        session_dir = self.root / session_id
+        session_dir.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(dir=session_dir, delete=False, suffix=".bin") as f:
+            if isinstance(payload, (bytes, bytearray, memoryview)):
+                f.write(payload)
+            else:
+                # Copia por bloques desde el stream, sin materializar otra copia en memoria
+                payload.seek(0)
+                shutil.copyfileobj(payload, f)
+            path = Path(f.name)
+
+        size = path.stat().st_size
+        if size > self.max_file_bytes:
+            path.unlink(missing_ok=True)
+            raise ValueError(
+                f"El archivo generado ({size / 1e6:.1f} MB) supera el tamaño máximo de descarga "
+                f"({self.max_file_bytes / 1e6:.0f} MB)."
+            )
+        if size > self.session_quota:
+            path.unlink(missing_ok=True)
+            raise ValueError(
+                f"El archivo generado ({size / 1e6:.1f} MB) supera la cuota de descargas "
+                f"por sesión ({self.session_quota / 1e6:.0f} MB)."
+            )
+        self._enforce_quota(session_dir, keep=path)
+
+        return {'path': str(path), 'mime': mime_type, 'size': size, 'created': time.time()}
+
+    def exists(self, handle: Optional[Dict]) -> bool:
+        """Indica si el archivo del handle sigue en disco; si existe, renueva su TTL."""
+        if not handle:
+            return False
+        try:
+            os.utime(handle['path'])
+            return True
+        except OSError:
+            return False
+
+    def reader(self, handle: Dict) -> Callable[[], bytes]:
+        """
+        Retorna una función que lee el archivo (para st.download_button con datos diferidos).
+
+        La lectura ocurre solo al pulsar el botón, pero en cada clic: Streamlit
+        convierte a bytes lo que reciba (también un archivo abierto, que además
+        quedaría sin cerrar) y lo guarda en su almacenamiento en memoria hasta
+        que la sesión deja de usarlo. Por eso se entregan los bytes directamente
+        y store() limita cada archivo a max_file_bytes: cada clic cuesta como
+        máximo una copia de ese tamaño.
+        """
+        def _read() -> bytes:
+            with open(handle['path'], 'rb') as f:
+                return f.read()
+        return _read
+
+    def discard(self, handle: Optional[Dict]):
+        """Elimina el archivo de un handle."""
+        if handle:
+            Path(handle['path']).unlink(missing_ok=True)
+
+    def maybe_cleanup(self):
+        """Ejecuta cleanup() como máximo una vez por CLEANUP_INTERVAL_SECONDS."""
+        now = time.time()
+        if now - self._last_cleanup < CLEANUP_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            if now - self._last_cleanup < CLEANUP_INTERVAL_SECONDS:
+                return
+            self._last_cleanup = now
+        self.cleanup(now)
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        """
+        Elimina los archivos sin uso durante más del TTL y los directorios vacíos.
+
+        Returns:
+            Número de archivos eliminados
+        """
+        if not self.root.exists():
+            return 0
+
+        now = now or time.time()
+        removed = 0
+        for session_dir in self.root.iterdir():
+            if not session_dir.is_dir():
+                continue
+            for path in session_dir.iterdir():
+                try:
+                    if now - path.stat().st_mtime > self.ttl_seconds:
+                        path.unlink()
+                        removed += 1
+                except OSError:
+                    continue
+            try:
+                session_dir.rmdir()  # solo si quedó vacío
+            except OSError:
+                pass
+        return removed
+
+    def _enforce_quota(self, session_dir: Path, keep: Path):
+        """Elimina los archivos más antiguos de la sesión hasta respetar la cuota."""
+        files = []
+        for path in session_dir.iterdir():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.session_quota:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+_spool: Optional[DownloadSpool] = None
+_spool_lock = threading.Lock()
+
+def get_download_spool() -> DownloadSpool:
+    """Obtiene el spool de descargas compartido por el proceso."""
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = DownloadSpool()
+        return _spool
@@ -0,0 +1,103 @@
+import hashlib
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+# Columnas que definen una partición (un reporte por empresa/año/mes)
+PARTITION_KEYS = ['EMPRESA', 'AÑO ASIGNACION', 'MES ASIGNACION']
+
+# Artefactos que guarda la caché de cada sesión; al pasar el límite se descarta el menos usado
+MAX_CACHE_ENTRIES = 32
+
+def to_native_scalar(value):
+    """Convierte escalares de NumPy a tipos nativos para que coincidan con los selectbox."""
+    return value.item() if hasattr(value, 'item') else value
+
+class PartitionHasher:
+    """Calcula huellas por partición para detectar qué datos cambiaron entre cargas."""
+
+    def compute_hashes(self, df: pd.DataFrame) -> Dict[Tuple, str]:
+        """
+        Calcula un hash de contenido por cada (EMPRESA, AÑO ASIGNACION, MES ASIGNACION).
+
+        Args:
+            df: DataFrame combinado
+
+        Returns:
+            Diccionario {partición: hash hexadecimal}
+        """
+        if df.empty or not all(col in df.columns for col in PARTITION_KEYS):
+            return {}
+
+        # Un hash uint64 por fila, calculado de forma vectorizada
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+        hashes = {}
+        groups = df.groupby(PARTITION_KEYS, sort=False, dropna=False).indices
+        for key, positions in groups.items():
+            partition = tuple(to_native_scalar(k) for k in key)
+            digest = hashlib.blake2b(row_hashes[positions].tobytes(), digest_size=16)
+            hashes[partition] = digest.hexdigest()
+
+        return hashes
+
+    def diff(self, previous: Dict[Tuple, str], current: Dict[Tuple, str]) -> Dict[str, List[Tuple]]:
+        """
+        Compara dos versiones de hashes por partición.
+
+        Args:
+            previous: Hashes de la carga anterior
+            current: Hashes de la carga actual
+
+        Returns:
+            Diccionario con las particiones 'added', 'removed', 'changed' y 'unchanged'
+        """
+        previous = previous or {}
+        current = current or {}
+
+        return {
+            'added': [p for p in current if p not in previous],
+            'removed': [p for p in previous if p not in current],
+            'changed': [p for p in current if p in previous and previous[p] != current[p]],
+            'unchanged': [p for p in current if p in previous and previous[p] == current[p]],
+        }
+
+class PartitionCache:
+    """
+    Caché de artefactos generados (previsualizaciones, documentos) por partición.
+
+    Guarda un artefacto por (tipo, partición): el generado con los últimos
+    parámetros. Editar los funcionarios reemplaza la previsualización en lugar
+    de acumular una por cada texto escrito. El total de artefactos está acotado
+    (LRU) para que la sesión no crezca mientras recorre particiones.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, kind: str, partition: Tuple, partition_hash: str, params: Tuple = ()):
+        """Retorna el artefacto si fue generado con el mismo hash y parámetros, o None."""
+        key = (kind, partition)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != partition_hash or entry[1] != params:
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, kind: str, partition: Tuple, partition_hash: str, value, params: Tuple = ()):
+        """Guarda un artefacto generado para la partición (reemplaza el de otros parámetros)."""
+        key = (kind, partition)
+        self._entries[key] = (partition_hash, params, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self, partitions: List[Tuple]):
+        """Elimina los artefactos de las particiones indicadas."""
+        targets = set(partitions)
+        for key in [k for k in self._entries if k[1] in targets]:
+            del self._entries[key]
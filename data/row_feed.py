@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+# Filas que se convierten a objetos de Python a la vez
+CHUNK_ROWS = 50_000
+
+# Marca para "no reemplazar los nulos"
+_KEEP = object()
+
+class RowFeed:
+    """
+    Filas de un DataFrame como tuplas, para los renderers (Word, Excel y HTML).
+
+    Reemplaza a `iterrows()`: las columnas se resuelven una sola vez y se leen
+    por bloques como arreglos de NumPy, en lugar de armar una Series por fila
+    y buscar cada valor con `row.get(...)`. Los valores son los mismos objetos
+    de Python que entregaba `iterrows()` (int, float, str, Timestamp...), así que
+    el texto de cada celda no cambia.
+    """
+
+    def __init__(self, data: pd.DataFrame, columns: Sequence, default='', index: bool = False,
+                 na_value=_KEEP, chunk_rows: int = CHUNK_ROWS):
+        """
+        Args:
+            data: DataFrame de origen
+            columns: Por cada posición de la tupla, un nombre de columna (si no existe, o es None,
+                se entrega `default`) o valores ya calculados alineados por posición con `data`
+                (por ejemplo una columna ya formateada)
+            default: Valor para columnas que no existen
+            index: Si se antepone la etiqueta del índice a cada tupla
+            na_value: Si se pasa, reemplaza los nulos (NaN, None, NaT) de las columnas
+            chunk_rows: Filas por bloque
+        """
+        self.data = data
+        self.default = default
+        self.index = index
+        self.na_value = na_value
+        self.chunk_rows = chunk_rows
+        self._sources = [self._resolve(spec) for spec in columns]
+
+    def _resolve(self, spec):
+        """Columna del DataFrame, valores ya calculados o None (valor por defecto)."""
+        if spec is None:
+            return None
+        if isinstance(spec, str):
+            return self.data[spec] if spec in self.data.columns else None
+        if isinstance(spec, pd.Series):
+            return spec.reset_index(drop=True)
+        return pd.Series(np.asarray(spec), copy=False)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def column_chunks(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, List[list]]]:
+        """
+        Columnas por bloques, para quien necesite trabajar por columna (por ejemplo altos de fila).
+
+        Args:
+            start: Primera fila (posición)
+            stop: Fin exclusivo (por defecto todas las filas)
+
+        Yields:
+            (posición inicial del bloque, [lista de valores por columna])
+        """
+        stop = len(self.data) if stop is None else stop
+        for lo in range(start, stop, self.chunk_rows):
+            hi = min(lo + self.chunk_rows, stop)
+            columns = [self.data.index[lo:hi].tolist()] if self.index else []
+            for source in self._sources:
+                if source is None:
+                    columns.append([self.default] * (hi - lo))
+                    continue
+                values = source.iloc[lo:hi].to_numpy(dtype=object)
+                if self.na_value is not _KEEP:
+                    values[pd.isna(values)] = self.na_value
+                columns.append(values.tolist())
+            yield lo, columns
+
+    def __iter__(self) -> Iterator[tuple]:
+        for _, columns in self.column_chunks():
+            yield from zip(*columns)
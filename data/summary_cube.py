@@ -0,0 +1,130 @@
+import pandas as pd
+from typing import Dict, Optional, Tuple
+from utils.column_schema import get_column
+from .partition_index import PARTITION_KEYS, to_native_scalar
+from .currency_converter import get_default_converter, usd_cents
+
+class SummaryCube:
+    """
+    Resumen materializado por (EMPRESA, AÑO ASIGNACION, MES ASIGNACION).
+
+    Se construye una sola vez al cargar los datos. Cada partición guarda:
+    'num_rows', 'num_docs', 'total_cents', 'precio_unico_cents' (moda de VALOR),
+    ambos en centavos enteros de USD, 'monedas' ({moneda: filas}) y
+    'subtotales_moneda' ({moneda: {'registros', 'cents', 'usd_cents', 'sin_tasa', 'sin_tasa_cents'}}). Los generadores lo consultan en O(1)
+    en lugar de recalcular sobre el slice filtrado.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self._frame = frame
+        self._index: Dict[Tuple, Dict] = {
+            tuple(to_native_scalar(v) for v in key): {
+                'num_rows': int(row['num_rows']),
+                'num_docs': int(row['num_docs']),
+                'total_cents': int(row['total_cents']),
+                'precio_unico_cents': int(row['precio_unico_cents']),
+                'monedas': row['monedas'],
+                'subtotales_moneda': row['subtotales_moneda'],
+            }
+            for key, row in zip(frame.index, frame.to_dict('records'))
+        }
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'SummaryCube':
+        """
+        Construye el cubo con agregaciones vectorizadas.
+
+        Args:
+            df: DataFrame combinado
+
+        Returns:
+            SummaryCube (vacío si faltan las columnas de partición)
+        """
+        columns = ['num_rows', 'num_docs', 'total_cents', 'precio_unico_cents', 'monedas', 'subtotales_moneda']
+        if df.empty or not all(col in df.columns for col in PARTITION_KEYS):
+            return cls(pd.DataFrame(columns=columns))
+
+        grouped = df.groupby(PARTITION_KEYS, sort=False, dropna=False)
+        cube = grouped.size().rename('num_rows').to_frame()
+        # Número de partición de cada fila, en el orden de cube.index. Las agregaciones
+        # se asignan por posición: las claves con NaN, como una fila sin empresa, no se
+        # encuentran con reindex ni en un dict
+        grupos = grouped.ngroup().rename('_grupo')
+        posiciones = range(len(cube))
+
+        # Misma columna que get_document_count
+        doc_col = get_column(df, 'documento')
+        cube['num_docs'] = grouped[doc_col].nunique() if doc_col else cube['num_rows']
+
+        if 'VALOR' in df.columns:
+            # Sumas y moda sobre centavos enteros de USD: exactas, sin error de float
+            values = pd.DataFrame({'_grupo': grupos, '_valor': usd_cents(df)})
+            cube['total_cents'] = values.groupby('_grupo')['_valor'].sum().reindex(posiciones).to_numpy()
+
+            # Moda por partición: mayor frecuencia y, en empate, el menor valor
+            # (el mismo criterio que Series.mode().iloc[0])
+            counts = (
+                values.dropna(subset=['_valor'])
+                .groupby(['_grupo', '_valor'], sort=False).size()
+                .rename('_n').reset_index()
+                .sort_values(['_n', '_valor'], ascending=[False, True], kind='stable')
+                .drop_duplicates('_grupo')
+                .set_index('_grupo')['_valor']
+            )
+            cube['precio_unico_cents'] = counts.reindex(posiciones).fillna(0).to_numpy()
+        else:
+            cube['total_cents'] = 0
+            cube['precio_unico_cents'] = 0
+
+        monedas = [{} for _ in posiciones]
+        if 'MONEDA' in df.columns:
+            mix = df.groupby([grupos, df['MONEDA']], sort=False, dropna=False).size()
+            for (grupo, moneda), n in mix.items():
+                monedas[grupo][moneda] = int(n)
+        cube['monedas'] = monedas
+
+        subtotales = [{} for _ in posiciones]
+        if 'VALOR' in df.columns:
+            by_currency = get_default_converter().subtotals(df.assign(_grupo=grupos), ['_grupo'])
+            for row in by_currency.to_dict('records'):
+                subtotales[row['_grupo']][row['MONEDA']] = {
+                    'registros': int(row['registros']),
+                    'cents': int(row['cents']),
+                    'usd_cents': int(row['usd_cents']),
+                    'sin_tasa': int(row['sin_tasa']),
+                    'sin_tasa_cents': int(row['sin_tasa_cents']),
+                }
+        cube['subtotales_moneda'] = subtotales
+
+        return cls(cube[columns])
+
+    def get(self, empresa: str, anio, mes: str) -> Optional[Dict]:
+        """Resumen de una partición, o None si no existe."""
+        return self._index.get((empresa, anio, mes))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Cubo completo como DataFrame, con las columnas de partición."""
+        return self._frame.reset_index()
+
+    def select(self, empresa: str = "Todas", anio="Todos", mes: str = "Todos") -> pd.DataFrame:
+        """
+        Filas del cubo para la selección de la barra lateral (vista general entre clientes).
+
+        Args:
+            empresa: Empresa seleccionada o "Todas"
+            anio: Año seleccionado o "Todos"
+            mes: Mes seleccionado o "Todos"
+
+        Returns:
+            DataFrame con una fila por partición seleccionada
+        """
+        frame = self.to_frame()
+        if frame.empty:
+            return frame
+        if empresa and empresa != "Todas":
+            frame = frame[frame['EMPRESA'] == empresa]
+        if anio and anio != "Todos":
+            frame = frame[frame['AÑO ASIGNACION'] == anio]
+        if mes and mes != "Todos":
+            frame = frame[frame['MES ASIGNACION'] == mes]
+        return frame
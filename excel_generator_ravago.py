@@ -6,21 +6,21 @@ from io import BytesIO
 from datetime import datetime
 from openpyxl.utils import column_index_from_string as colidx
 from openpyxl.worksheet.page import PageMargins
+from utils.column_schema import get_schema
+from utils.data_utils import get_document_count
+from utils.file_utils import get_logo_stream
+from utils.formatting_utils import wrapped_row_heights
+from utils.money_utils import cents_to_float, sum_cents, to_cents
+from utils.perf_trace import span, traced
+from data.currency_converter import currency_subtotals, usd_cents
+from data.row_feed import RowFeed
+from reports.excel_stream_writer import ExcelStreamWriter, resolve_shard_rows
+from reports.ravago_layout import RavagoLayout, write_row
 
 # =============================
 # Utilidades de formato
 # =============================
 
-# Meses en español para la fecha
-MESES_ES = [
-    "enero", "febrero", "marzo", "abril", "mayo", "junio",
-    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
-]
-
-def fecha_es(dt: datetime) -> str:
-    """Devuelve 'dd de <mes> de yyyy' en español."""
-    return f"{dt.day:02d} de {MESES_ES[dt.month-1]} de {dt.year}"
-
 def style_cell(cell, text, font, alignment, fill=None, border=None):
     """Aplica estilos completos a una celda."""
     cell.value = text
@@ -82,33 +82,35 @@ def draw_outer_frame(ws, tl: str, br: str):
             left=prev.left, right=side, top=prev.top, bottom=prev.bottom
         )
 
+def set_wrapped_row_heights(ws, first_row: int, last_row: int):
+    """
+    Alto explícito para las filas first..last según sus celdas con texto ajustado,
+    para que Excel no tenga que autoajustarlas al abrir o imprimir.
+    Las celdas combinadas no cuentan (Excel tampoco las autoajusta).
+    """
+    for r in range(first_row, last_row + 1):
+        columns = [
+            ([cell.value], ws.column_dimensions[cell.column_letter].width)
+            for cell in ws[r]
+            if cell.alignment.wrap_text and cell.value not in (None, '') and cell.coordinate not in ws.merged_cells
+        ]
+        if columns:
+            ws.row_dimensions[r].height = float(wrapped_row_heights(columns)[0])
+
 # =============================
 # Generador del reporte
 # =============================
 
-def find_column(df, possible_names):
-    """Busca una columna en el DataFrame usando una lista de posibles nombres."""
-    for col_name in possible_names:
-        for actual_col in df.columns:
-            if col_name.upper() in actual_col.upper():
-                return actual_col
-    return None
-
-def get_document_count(df):
-    """Obtiene el número de documentos únicos."""
-    possible_names = ['NO. CASO', 'NUMERO CASO', 'CASO', 'ID', 'NUMERO', 'DOCUMENTO']
-    col_name = find_column(df, possible_names)
-    
-    if col_name:
-        return df[col_name].nunique()
-    else:
-        return len(df)
-
-def create_ravago_report(data: pd.DataFrame, anio: int, mes: str, funcionarios: dict | None = None):
+@traced()
+def create_ravago_report(data: pd.DataFrame, anio: int, mes: str, funcionarios: dict | None = None,
+                         summary: dict | None = None, shard_rows: int | None = None):
     """
     Genera un Excel con dos hojas:
       - 'Facturación' con el layout exacto solicitado
       - 'Anexo 1' con el layout exacto solicitado
+    Si se pasa `summary` (fila del SummaryCube) el conteo y el total se toman de ahí.
+    Si el detalle no cabe en una hoja, o se pide `shard_rows` (o ANEXO_SHARD_ROWS),
+    el Anexo 1 se parte en 'Anexo 1 (1)', 'Anexo 1 (2)'... escritas en streaming.
     """
     wb = Workbook()
 
@@ -144,20 +146,46 @@ def create_ravago_report(data: pd.DataFrame, anio: int, mes: str, funcionarios:
     fecha_dt = (funcionarios or {}).get("fecha", datetime.now())
 
     # Contadores/columnas
-    try:
-        num_docs = get_document_count(data)
-    except Exception:
-        num_docs = len(data)
-
-    if 'VALOR' in data.columns:
-        total_valor = float(data['VALOR'].fillna(0).sum())
-        valor_col = 'VALOR'
+    if summary:
+        num_docs = summary['num_docs']
     else:
-        valor_col = find_column(data, ['VALOR', 'TOTAL', 'IMPORTE', 'MONTO'])
-        total_valor = float(data.get(valor_col, pd.Series(dtype=float)).fillna(0).sum()) if valor_col else 0.0
+        try:
+            num_docs = get_document_count(data)
+        except Exception:
+            num_docs = len(data)
+
+    # Columnas resueltas al cargar (valor, nombre, tipo de documento)
+    schema = get_schema(data)
+
+    # Total sumado en centavos enteros; a float solo para la celda de Excel
+    valor_col = schema['valor']
+    if valor_col == 'VALOR':
+        total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+    else:
+        total_cents = sum_cents(to_cents(data[valor_col])) if valor_col else 0
+    total_valor = cents_to_float(total_cents)
+
+    # Montos por fila en USD (convertidos con la TRM) y subtotales por moneda
+    usd_values = usd_cents(data).to_numpy(dtype='float64', na_value=float('nan')) if valor_col == 'VALOR' else None
+    subtotales = summary['subtotales_moneda'] if summary else (currency_subtotals(data) if valor_col == 'VALOR' else {})
 
-    nombre_col = find_column(data, ['NOMBRE', 'NOMBRE CONTRAPARTE', 'CLIENTE'])
-    tipo_doc_col = find_column(data, ['TIPO DE DOCUMENTO', 'TIPO DOCUMENTO', 'DOCUMENTO'])
+    nombre_col = schema['nombre']
+    tipo_doc_col = schema['tipo_documento']
+
+    report_data = {
+        'anio': anio, 'mes': mes, 'num_docs': num_docs, 'total_valor': total_valor,
+        'usd_values': usd_values, 'subtotales_moneda': subtotales, 'valor_col': valor_col,
+        'nombre_col': nombre_col, 'tipo_doc_col': tipo_doc_col,
+        'rep_name': rep_name, 'rev_name': rev_name, 'fecha_dt': fecha_dt,
+    }
+
+    # Detalle que no cabe en una hoja: Anexo 1 partido, en modo write_only
+    shard_size = resolve_shard_rows(len(data), shard_rows)
+    if shard_size is not None:
+        return ExcelStreamWriter().write(report_data, data, shard_size)
+
+    # Encabezado, SUBTOTAL y subtotales por moneda (comunes con reports/)
+    layout = RavagoLayout()
 
     # =========================
     # Hoja 1: Facturación
@@ -180,16 +208,15 @@ def create_ravago_report(data: pd.DataFrame, anio: int, mes: str, funcionarios:
 
     # Logo
     try:
-        img = Image('assets/biu_logo.png')
+        img = Image(get_logo_stream())
         img.width, img.height = 100, 58
         ws1.add_image(img, 'F3')
     except Exception:
         style_cell(ws1['F3'], "BIU", title_font, center)
 
     # Cabecera exacta (C3, C4, C5)
-    style_cell(ws1['C3'], f"Fecha de corte del reporte: {fecha_es(fecha_dt)}", info_font, left)
-    style_cell(ws1['C4'], f"Funcionario que reporta: {rep_name}", info_font, left)
-    style_cell(ws1['C5'], f"Funcionario revisor: {rev_name}", info_font, left)
+    for row, cells in layout.header_info(report_data).items():
+        write_row(ws1, row, cells)
 
     # Tabla superior (fila 8: headers; 9: valores; 10: total por facturar)
     style_cell(ws1['C8'], 'Año', header_font, center, header_fill, thin_border)
@@ -227,6 +254,8 @@ def create_ravago_report(data: pd.DataFrame, anio: int, mes: str, funcionarios:
     c = ws1['E14']
     style_cell(c, total_valor, total_font, right, total_fill, thin_border)
     c.number_format = '"USD" #,##0'
+    # Fila 15: montos sin TRM que el SUBTOTAL no incluye
+    write_row(ws1, 15, layout.unconverted_note(subtotales))
 
     # Notas
     ws1.merge_cells('C16:D16')
@@ -242,6 +271,7 @@ def create_ravago_report(data: pd.DataFrame, anio: int, mes: str, funcionarios:
 
     # Marco exterior (con G como margen derecho)
     draw_outer_frame(ws1, "B2", "G21")
+    set_wrapped_row_heights(ws1, 8, 14)
 
     # =========================
     # Hoja 2: Anexo 1
@@ -261,69 +291,76 @@ def create_ravago_report(data: pd.DataFrame, anio: int, mes: str, funcionarios:
     ws2.print_options.horizontalCentered = True
 
     try:
-        img2 = Image('assets/biu_logo.png')
+        img2 = Image(get_logo_stream())
         img2.width, img2.height = 100, 58
         ws2.add_image(img2, 'F3')
     except Exception:
         style_cell(ws2['F3'], "BIU", title_font, center)
 
-    style_cell(ws2['C3'], f"Fecha de corte del reporte: {fecha_es(fecha_dt)}", info_font, left)
-    style_cell(ws2['C4'], f"Funcionario que reporta: {rep_name}", info_font, left)
-    style_cell(ws2['C5'], f"Funcionario revisor: {rev_name}", info_font, left)
+    for row, cells in layout.header_info(report_data).items():
+        write_row(ws2, row, cells)
 
     ws2.merge_cells('C6:F6')
     style_cell(ws2['C6'], "HONORARIOS", title_font, center)
 
-    style_cell(ws2['C8'], 'FECHA', header_font, center, header_fill, thin_border)
-    style_cell(ws2['D8'], 'NOMBRE CONTRAPARTE', header_font, center, header_fill, thin_border)
-    style_cell(ws2['E8'], 'TIPO DE DOCUMENTO', header_font, center, header_fill, thin_border)
-    style_cell(ws2['F8'], 'TOTAL', header_font, center, header_fill, thin_border)
+    write_row(ws2, 8, layout.anexo_headers())
 
     start_row = 9
     r = start_row
     # Filas de detalle
-    for idx, row_data in data.iterrows():
+    feed = RowFeed(data, [nombre_col, tipo_doc_col, usd_values if usd_values is not None else valor_col])
+    for nombre_value, tipo_doc_value, valor in feed:
         # FECHA: consecutivo 1,2,3,...
         style_cell(ws2.cell(row=r, column=3), r - start_row + 1, data_font, center, white_fill, thin_border)
 
-        nombre_value = row_data.get(nombre_col, '') if nombre_col else ''
         style_cell(ws2.cell(row=r, column=4), nombre_value, data_font,
                    Alignment(horizontal='left', vertical='center', wrap_text=True),
                    white_fill, thin_border)
 
-        tipo_doc_value = row_data.get(tipo_doc_col, '') if tipo_doc_col else ''
         style_cell(ws2.cell(row=r, column=5), tipo_doc_value, data_font,
                    Alignment(horizontal='left', vertical='center', wrap_text=True),
                    white_fill, thin_border)
 
-        valor_value = float(row_data.get(valor_col, 0)) if valor_col else 0.0
+        if usd_values is not None:
+            # Filas sin TRM quedan en blanco
+            valor_value = valor / 100 if valor == valor else None
+        else:
+            valor_value = float(valor) if valor_col else 0.0
         c_val = ws2.cell(row=r, column=6)
         style_cell(c_val, valor_value, data_font, right, white_fill, thin_border)
         c_val.number_format = '"USD" #,##0'
         r += 1
 
+    # Alto de las filas de detalle, estimado de una vez con los anchos de D y E
+    set_wrapped_row_heights(ws2, 3, 8)
+    heights = wrapped_row_heights([
+        (data[nombre_col] if nombre_col else [''] * len(data), ws2.column_dimensions['D'].width),
+        (data[tipo_doc_col] if tipo_doc_col else [''] * len(data), ws2.column_dimensions['E'].width),
+    ])
+    for row_idx, height in enumerate(heights.tolist(), start_row):
+        ws2.row_dimensions[row_idx].height = height
+
     # Fila de SUBTOTAL
     subtotal_row = r
 
-    # C11 y D11 BLANCAS y SIN BORDES (tal como pediste)
-    # OJO: es la fila 'subtotal_row' para cualquier cantidad de filas
-    style_cell(ws2.cell(row=subtotal_row, column=3), '', data_font, left, white_fill, None)  # C#
-    style_cell(ws2.cell(row=subtotal_row, column=4), '', data_font, left, white_fill, None)  # D#
+    # C# y D# BLANCAS y SIN BORDES; SUBTOTAL en E# y total en F# con gris y bordes finos
+    write_row(ws2, subtotal_row, layout.subtotal_row('SUBTOTAL', total_valor))
 
-    # SUBTOTAL en E# y total en F# con gris y bordes finos
-    style_cell(ws2.cell(row=subtotal_row, column=5), 'SUBTOTAL', total_font, right, total_fill, thin_border)
-    c_sub = ws2.cell(row=subtotal_row, column=6)
-    style_cell(c_sub, total_valor, total_font, right, total_fill, thin_border)
-    c_sub.number_format = '"USD" #,##0'
+    # Subtotales por moneda (solo si hay montos en otra moneda)
+    last_row = subtotal_row
+    for cells in layout.currency_rows(subtotales):
+        last_row += 1
+        write_row(ws2, last_row, cells)
 
     # Marco exterior (hasta G y dejando una fila extra bajo el subtotal)
-    bottom_row_for_frame = subtotal_row + 1
+    bottom_row_for_frame = last_row + 1
     draw_outer_frame(ws2, "B2", f"G{bottom_row_for_frame}")
 
     # =========================
     # Guardar en memoria
     # =========================
     buffer = BytesIO()
-    wb.save(buffer)
+    with span("xlsx.save", rows=len(data)):
+        wb.save(buffer)
     buffer.seek(0)
     return buffer
@@ -1,11 +1,21 @@
 import pandas as pd
-from utils.formatting_utils import format_currency
-from utils.data_utils import get_document_count, get_representative_price
+from utils.formatting_utils import format_valor_column
+from utils.perf_trace import traced
+from utils.data_utils import get_document_count
+from utils.money_utils import (
+    IVA_BASIS_POINTS, apply_rate, format_amount, format_cents, mode_cents, sum_cents
+)
+from data.currency_converter import (
+    currency_subtotals, format_usd_column, has_foreign_currency, subtotal_rows, usd_cents, with_unconverted
+)
+from data.row_feed import RowFeed
 
 class PreviewGenerator:
     """Generador de previsualizaciones HTML para reportes."""
     
-    def generate_preview_html(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict) -> str:
+    @traced()
+    def generate_preview_html(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict,
+                              summary: dict = None) -> str:
         """
         Genera una previsualización HTML del reporte.
         
@@ -15,6 +25,7 @@ class PreviewGenerator:
             anio: Año del reporte
             mes: Mes del reporte
             funcionarios: Información de funcionarios
+            summary: Resumen de la partición en el SummaryCube (opcional)
             
         Returns:
             HTML de la previsualización
@@ -22,9 +33,9 @@ class PreviewGenerator:
         css_styles = self._get_css_styles()
         
         if empresa == "Ravago Americas LLC":
-            html_body = self._generate_ravago_preview(data, anio, mes)
+            html_body = self._generate_ravago_preview(data, anio, mes, summary)
         else:
-            html_body = self._generate_word_preview(data, empresa, anio, mes, funcionarios)
+            html_body = self._generate_word_preview(data, empresa, anio, mes, funcionarios, summary)
         
         return f"<div class='preview-container'>{css_styles}{html_body}</div>"
     
@@ -52,10 +63,13 @@ class PreviewGenerator:
         </style>
         """
     
-    def _generate_ravago_preview(self, data: pd.DataFrame, anio: int, mes: str) -> str:
+    def _generate_ravago_preview(self, data: pd.DataFrame, anio: int, mes: str, summary: dict = None) -> str:
         """Genera la previsualización para Ravago (estilo Excel)."""
-        num_docs = get_document_count(data)
-        total_valor = data['VALOR'].sum() if 'VALOR' in data.columns else 0.0
+        num_docs = summary['num_docs'] if summary else get_document_count(data)
+        total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+        # Los montos sin TRM no entran en la suma en USD; se muestran aparte en su moneda
+        total_text = with_unconverted(format_cents(total_cents), subtotals)
         
         html_body = f"""
         <h4>Hoja: Resumen</h4>
@@ -66,9 +80,10 @@ class PreviewGenerator:
         </table>
         <table>
             <tr><th>Concepto</th><th>Total (antes de I.V.A)</th></tr>
-            <tr><td>Revisión de {num_docs} documentos durante el mes de {mes} de {anio}</td><td class='right-align'>{format_currency(total_valor)}</td></tr>
-            <tr class='total-row'><td class='right-align'>SUBTOTAL</td><td class='right-align'>{format_currency(total_valor)}</td></tr>
+            <tr><td>Revisión de {num_docs} documentos durante el mes de {mes} de {anio}</td><td class='right-align'>{total_text}</td></tr>
+            <tr class='total-row'><td class='right-align'>SUBTOTAL</td><td class='right-align'>{total_text}</td></tr>
         </table>
+        {self._generate_currency_subtotals_html(data, summary)}
         <div class='footer-note'>TRM Aplicable: Según la propuesta, es aquella de emisión de la factura.</div>
         <div class='footer-note'>biu usually issues monthly invoices...</div>
         <hr>
@@ -77,20 +92,24 @@ class PreviewGenerator:
             <tr><th>FECHA</th><th>NOMBRE CONTRAPARTE</th><th>TIPO DE DOCUMENTO</th><th>TOTAL</th></tr>
         """
         
-        for idx, row in data.iterrows():
-            nombre = row.get('NOMBRE', '')
-            tipo_doc = row.get('TIPO DE DOCUMENTO', '')
-            valor = row.get('VALOR', 0)
-            html_body += f"<tr><td class='center-align'>{idx+1}</td><td>{nombre}</td><td>{tipo_doc}</td><td class='right-align'>{format_currency(valor)}</td></tr>"
+        # Monto de cada fila ya convertido a USD, como en el Anexo 1 del Excel
+        valores = format_usd_column(data)
+        feed = RowFeed(data, ['NOMBRE', 'TIPO DE DOCUMENTO', valores], index=True)
+        html_body += "".join(
+            f"<tr><td class='center-align'>{idx+1}</td><td>{nombre}</td><td>{tipo_doc}</td><td class='right-align'>{valor}</td></tr>"
+            for idx, nombre, tipo_doc, valor in feed
+        )
         
-        html_body += f"<tr class='total-row'><td colspan='3' class='right-align'>SUBTOTAL</td><td class='right-align'>{format_currency(total_valor)}</td></tr></table>"
+        html_body += f"<tr class='total-row'><td colspan='3' class='right-align'>SUBTOTAL</td><td class='right-align'>{total_text}</td></tr></table>"
         
         return html_body
     
-    def _generate_word_preview(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict) -> str:
+    def _generate_word_preview(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict,
+                               summary: dict = None) -> str:
         """Genera la previsualización para empresas con formato Word."""
-        main_table_html = self._generate_main_table_html(data, empresa)
-        summary_tables_html = self._generate_summary_tables_html(data, empresa, anio, mes)
+        main_table_html = self._generate_main_table_html(data, empresa, summary)
+        currency_html = self._generate_currency_subtotals_html(data, summary)
+        summary_tables_html = self._generate_summary_tables_html(data, empresa, anio, mes, summary)
         
         return f"""
         <div class="header-info">
@@ -108,6 +127,7 @@ class PreviewGenerator:
         
         <div class="word">
             {main_table_html}
+            {currency_html}
             {summary_tables_html}
         </div>
         
@@ -118,10 +138,15 @@ class PreviewGenerator:
         </div>
         """
     
-    def _generate_main_table_html(self, data: pd.DataFrame, empresa: str) -> str:
+    def _generate_main_table_html(self, data: pd.DataFrame, empresa: str, summary: dict = None) -> str:
         """Genera la tabla principal de datos."""
-        total_valor_sum = data['VALOR'].sum() if 'VALOR' in data.columns else 0.0
-        total_gw = get_representative_price(data) if empresa == "Gwealth" else total_valor_sum
+        if empresa == "Gwealth":
+            total_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+            total_text = format_amount(total_cents)
+        else:
+            total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+            subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+            total_text = with_unconverted(format_amount(total_cents), subtotals)
         etiqueta = "Total (precio único)" if empresa == "Gwealth" else "Total"
         
         html = """
@@ -138,23 +163,27 @@ class PreviewGenerator:
             <tbody>
         """
         
-        # Filas de datos
-        for _, row in data.iterrows():
-            html += f"""
+        # Filas de datos (VALOR formateado por columna)
+        valores = format_valor_column(data)
+        feed = RowFeed(data, ['MES ASIGNACION', 'AÑO ASIGNACION', 'NOMBRE', 'MONEDA', valores])
+        html += "".join(
+            f"""
                 <tr class="body-row">
-                    <td>{row.get('MES ASIGNACION', '')}</td>
-                    <td>{row.get('AÑO ASIGNACION', '')}</td>
-                    <td>{row.get('NOMBRE', '')}</td>
-                    <td>{row.get('MONEDA', '')}</td>
-                    <td>{row.get('VALOR', 0):,.2f}</td>
+                    <td>{mes_asig}</td>
+                    <td>{anio_asig}</td>
+                    <td>{nombre}</td>
+                    <td>{moneda}</td>
+                    <td>{valor}</td>
                 </tr>
             """
+            for mes_asig, anio_asig, nombre, moneda, valor in feed
+        )
         
         # Fila de total
         html += f"""
                 <tr class="total-row">
                     <td colspan="4" class="center-align">{etiqueta}</td>
-                    <td>{total_gw:,.2f}</td>
+                    <td>{total_text}</td>
                 </tr>
             </tbody>
         </table>
@@ -162,11 +191,41 @@ class PreviewGenerator:
         
         return html
     
-    def _generate_summary_tables_html(self, data: pd.DataFrame, empresa: str, anio: int, mes: str) -> str:
+    def _generate_currency_subtotals_html(self, data: pd.DataFrame, summary: dict = None) -> str:
+        """Genera los subtotales por moneda y el total convertido a USD (vacío si todo está en USD)."""
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+        if not has_foreign_currency(subtotals):
+            return ""
+
+        rows, total_usd = subtotal_rows(subtotals)
+        html = """
+        <table>
+            <thead>
+                <tr><th>Moneda</th><th>Registros</th><th>Subtotal</th><th>Subtotal USD (TRM)</th></tr>
+            </thead>
+            <tbody>
+        """
+        for moneda, registros, subtotal, subtotal_usd in rows:
+            html += f"""
+                <tr class="body-row"><td>{moneda}</td><td>{registros}</td><td class="right-align">{subtotal}</td><td class="right-align">{subtotal_usd}</td></tr>
+            """
+        html += f"""
+                <tr class="total-row">
+                    <td colspan="3" class="center-align">Total convertido a USD</td>
+                    <td class="right-align">{with_unconverted(format_cents(total_usd), subtotals)}</td>
+                </tr>
+            </tbody>
+        </table>
+        """
+        return html
+
+    def _generate_summary_tables_html(self, data: pd.DataFrame, empresa: str, anio: int, mes: str,
+                                      summary: dict = None) -> str:
         """Genera las tablas de resumen específicas por empresa."""
-        total_valor_sum = data['VALOR'].sum() if 'VALOR' in data.columns else 0.0
+        total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
         
         if empresa == "Altimetrik":
+            subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
             return f"""
             <table class="summary-table">
                 <thead>
@@ -180,16 +239,15 @@ class PreviewGenerator:
                     <tr class="body-row">
                         <td>{mes}</td>
                         <td>Consultas en listas recibidas en {mes} de {anio}</td>
-                        <td>USD {total_valor_sum:,.2f}</td>
+                        <td>{with_unconverted(format_cents(total_cents), subtotals)}</td>
                     </tr>
                 </tbody>
             </table>
             """
         
         elif empresa == "Gwealth":
-            precio_unico = get_representative_price(data)
-            iva = precio_unico * 0.19
-            total_con_iva = precio_unico + iva
+            precio_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+            total_con_iva_cents = precio_cents + apply_rate(precio_cents, IVA_BASIS_POINTS)
             
             return f"""
             <table class="summary-table">
@@ -204,15 +262,15 @@ class PreviewGenerator:
                     <tr class="body-row">
                         <td>{mes}</td>
                         <td>Consultas en listas recibidas en {mes} de {anio}</td>
-                        <td>USD {precio_unico:,.2f}</td>
+                        <td>{format_cents(precio_cents)}</td>
                     </tr>
                     <tr class="total-row">
                         <td colspan="2" class="center-align">TOTAL</td>
-                        <td>USD {precio_unico:,.2f}</td>
+                        <td>{format_cents(precio_cents)}</td>
                     </tr>
                     <tr class="total-row">
                         <td colspan="2" class="center-align">TOTAL CON IVA</td>
-                        <td>USD {total_con_iva:,.2f}</td>
+                        <td>{format_cents(total_con_iva_cents)}</td>
                     </tr>
                 </tbody>
             </table>
@@ -1,54 +1,24 @@
 import pandas as pd
-
-# Remover esta línea:
-# from utils import format_currency, get_document_count
-
-# Agregar estas funciones directamente:
-def format_currency(value, currency="USD"):
-    """Formatea un número como moneda."""
-    try:
-        return f"{currency} {float(value):,.2f}"
-    except (ValueError, TypeError):
-        return f"{currency} 0.00"
-
-def find_column(df, possible_names):
-    """Busca una columna en el DataFrame usando una lista de posibles nombres."""
-    for col_name in possible_names:
-        for actual_col in df.columns:
-            if col_name.upper() in actual_col.upper():
-                return actual_col
-    return None
-
-def get_document_count(df):
-    """Obtiene el número de documentos únicos."""
-    possible_names = ['NO. CASO', 'NUMERO CASO', 'CASO', 'ID', 'NUMERO', 'DOCUMENTO']
-    col_name = find_column(df, possible_names)
-    
-    if col_name:
-        return df[col_name].nunique()
-    else:
-        return len(df)
-
-# ------------------------
-# Utilidades
-# ------------------------
-def get_representative_price(data: pd.DataFrame) -> float:
-    """Precio único para GWealth (moda de VALOR; si no, primer no nulo)."""
-    if 'VALOR' not in data.columns:
-        return 0.0
-    serie = pd.to_numeric(data['VALOR'], errors='coerce').dropna()
-    if serie.empty:
-        return 0.0
-    moda = serie.mode()
-    if not moda.empty:
-        return float(moda.iloc[0])
-    return float(serie.iloc[0])
+from utils.data_utils import get_document_count
+from utils.formatting_utils import format_valor_column
+from utils.perf_trace import traced
+from utils.money_utils import (
+    IVA_BASIS_POINTS, apply_rate, format_amount, format_cents, mode_cents, sum_cents
+)
+from data.currency_converter import (
+    currency_subtotals, format_usd_column, has_foreign_currency, subtotal_rows, usd_cents, with_unconverted
+)
+from data.row_feed import RowFeed
 
 # ------------------------
 # HTML
 # ------------------------
-def generate_preview_html(data, empresa, anio, mes, funcionarios):
-    """Genera una previsualización HTML del reporte."""
+@traced()
+def generate_preview_html(data, empresa, anio, mes, funcionarios, summary=None):
+    """
+    Genera una previsualización HTML del reporte.
+    `summary` es la fila de la partición en el SummaryCube (opcional).
+    """
 
     css_styles = """
     <style>
@@ -77,8 +47,11 @@ def generate_preview_html(data, empresa, anio, mes, funcionarios):
     html_body = ""
     if empresa == "Ravago Americas LLC":
         # --- Vista tipo Excel (se mantiene como estaba) ---
-        num_docs = get_document_count(data)
-        total_valor = data['VALOR'].sum()
+        num_docs = summary['num_docs'] if summary else get_document_count(data)
+        total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+        # Los montos sin TRM no entran en la suma en USD; se muestran aparte en su moneda
+        total_text = with_unconverted(format_cents(total_cents), subtotals)
 
         html_body = f"""
         <h4>Hoja: Resumen</h4>
@@ -89,9 +62,10 @@ def generate_preview_html(data, empresa, anio, mes, funcionarios):
         </table>
         <table>
             <tr><th>Concepto</th><th>Total (antes de I.V.A)</th></tr>
-            <tr><td>Revisión de {num_docs} documentos durante el mes de {mes} de {anio}</td><td class='right-align'>{format_currency(total_valor)}</td></tr>
-            <tr class='total-row'><td class='right-align'>SUBTOTAL</td><td class='right-align'>{format_currency(total_valor)}</td></tr>
+            <tr><td>Revisión de {num_docs} documentos durante el mes de {mes} de {anio}</td><td class='right-align'>{total_text}</td></tr>
+            <tr class='total-row'><td class='right-align'>SUBTOTAL</td><td class='right-align'>{total_text}</td></tr>
         </table>
+        {generate_currency_subtotals_html(data, summary)}
         <div class='footer-note'>TRM Aplicable: Según la propuesta, es aquella de emisión de la factura.</div>
         <div class='footer-note'>biu usually issues monthly invoices...</div>
         <hr>
@@ -99,14 +73,20 @@ def generate_preview_html(data, empresa, anio, mes, funcionarios):
         <table>
             <tr><th>FECHA</th><th>NOMBRE CONTRAPARTE</th><th>TIPO DE DOCUMENTO</th><th>TOTAL</th></tr>
         """
-        for idx, row in data.iterrows():
-            html_body += f"<tr><td class='center-align'>{idx+1}</td><td>{row.get('NOMBRE', '')}</td><td>{row.get('TIPO DE DOCUMENTO', '')}</td><td class='right-align'>{format_currency(row.get('VALOR', 0))}</td></tr>"
-        html_body += f"<tr class='total-row'><td colspan='3' class='right-align'>SUBTOTAL</td><td class='right-align'>{format_currency(total_valor)}</td></tr></table>"
+        # Monto de cada fila ya convertido a USD, como en el Anexo 1 del Excel
+        valores = format_usd_column(data)
+        feed = RowFeed(data, ['NOMBRE', 'TIPO DE DOCUMENTO', valores], index=True)
+        html_body += "".join(
+            f"<tr><td class='center-align'>{idx+1}</td><td>{nombre}</td><td>{tipo_doc}</td><td class='right-align'>{valor}</td></tr>"
+            for idx, nombre, tipo_doc, valor in feed
+        )
+        html_body += f"<tr class='total-row'><td colspan='3' class='right-align'>SUBTOTAL</td><td class='right-align'>{total_text}</td></tr></table>"
 
     else:
         # --- Vista estilo Word (Altimetrik y GWealth) ---
-        main_table_html = generate_main_table_html(data, empresa)
-        summary_tables_html = generate_summary_tables_html(data, empresa, anio, mes)
+        main_table_html = generate_main_table_html(data, empresa, summary)
+        currency_html = generate_currency_subtotals_html(data, summary)
+        summary_tables_html = generate_summary_tables_html(data, empresa, anio, mes, summary)
 
         html_body = f"""
         <div class="header-info">
@@ -124,6 +104,7 @@ def generate_preview_html(data, empresa, anio, mes, funcionarios):
 
         <div class="word">
             {main_table_html}
+            {currency_html}
             {summary_tables_html}
         </div>
 
@@ -136,10 +117,15 @@ def generate_preview_html(data, empresa, anio, mes, funcionarios):
 
     return f"<div class='preview-container'>{css_styles}{html_body}</div>"
 
-def generate_main_table_html(data, empresa: str):
+def generate_main_table_html(data, empresa: str, summary=None):
     """Genera la tabla principal de datos (la fila Total respeta la regla de GWealth)."""
-    total_valor_sum = data['VALOR'].sum() if 'VALOR' in data.columns else 0.0
-    total_gw = get_representative_price(data) if empresa == "Gwealth" else total_valor_sum
+    if empresa == "Gwealth":
+        total_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+        total_text = format_amount(total_cents)
+    else:
+        total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+        total_text = with_unconverted(format_amount(total_cents), subtotals)
     etiqueta = "Total (precio único)" if empresa == "Gwealth" else "Total"
 
     html = """
@@ -156,33 +142,66 @@ def generate_main_table_html(data, empresa: str):
         <tbody>
     """
     # Filas de datos con sombreado estilo Word
-    for _, row in data.iterrows():
-        html += f"""
+    valores = format_valor_column(data)
+    feed = RowFeed(data, ['MES ASIGNACION', 'AÑO ASIGNACION', 'NOMBRE', 'MONEDA', valores])
+    html += "".join(
+        f"""
             <tr class="body-row">
-                <td>{row.get('MES ASIGNACION', '')}</td>
-                <td>{row.get('AÑO ASIGNACION', '')}</td>
-                <td>{row.get('NOMBRE', '')}</td>
-                <td>{row.get('MONEDA', '')}</td>
-                <td>{row.get('VALOR', 0):,.2f}</td>
+                <td>{mes_asig}</td>
+                <td>{anio_asig}</td>
+                <td>{nombre}</td>
+                <td>{moneda}</td>
+                <td>{valor}</td>
             </tr>
         """
+        for mes_asig, anio_asig, nombre, moneda, valor in feed
+    )
 
     # Fila de total: combinamos las 4 primeras columnas y dejamos VALOR para el importe
     html += f"""
             <tr class="total-row">
                 <td colspan="4" class="center-align">{etiqueta}</td>
-                <td>{total_gw:,.2f}</td>
+                <td>{total_text}</td>
+            </tr>
+        </tbody>
+    </table>
+    """
+    return html
+
+def generate_currency_subtotals_html(data, summary=None):
+    """Subtotales por moneda y total convertido a USD (vacío si todo está en USD)."""
+    subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+    if not has_foreign_currency(subtotals):
+        return ""
+
+    rows, total_usd = subtotal_rows(subtotals)
+    html = """
+    <table>
+        <thead>
+            <tr><th>Moneda</th><th>Registros</th><th>Subtotal</th><th>Subtotal USD (TRM)</th></tr>
+        </thead>
+        <tbody>
+    """
+    for moneda, registros, subtotal, subtotal_usd in rows:
+        html += f"""
+            <tr class="body-row"><td>{moneda}</td><td>{registros}</td><td class="right-align">{subtotal}</td><td class="right-align">{subtotal_usd}</td></tr>
+        """
+    html += f"""
+            <tr class="total-row">
+                <td colspan="3" class="center-align">Total convertido a USD</td>
+                <td class="right-align">{with_unconverted(format_cents(total_usd), subtotals)}</td>
             </tr>
         </tbody>
     </table>
     """
     return html
 
-def generate_summary_tables_html(data, empresa, anio, mes):
+def generate_summary_tables_html(data, empresa, anio, mes, summary=None):
     """Genera las tablas de resumen específicas por empresa."""
-    total_valor_sum = data['VALOR'].sum() if 'VALOR' in data.columns else 0.0
+    total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
 
     if empresa == "Altimetrik":
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
         return f"""
         <table class="summary-table">
             <thead>
@@ -196,16 +215,15 @@ def generate_summary_tables_html(data, empresa, anio, mes):
                 <tr class="body-row">
                     <td>{mes}</td>
                     <td>Consultas en listas recibidas en {mes} de {anio}</td>
-                    <td>USD {total_valor_sum:,.2f}</td>
+                    <td>{with_unconverted(format_cents(total_cents), subtotals)}</td>
                 </tr>
             </tbody>
         </table>
         """
 
     elif empresa == "Gwealth":
-        precio_unico = get_representative_price(data)
-        iva = precio_unico * 0.19
-        total_con_iva = precio_unico + iva
+        precio_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+        total_con_iva_cents = precio_cents + apply_rate(precio_cents, IVA_BASIS_POINTS)
         return f"""
         <table class="summary-table">
             <thead>
@@ -219,15 +237,15 @@ def generate_summary_tables_html(data, empresa, anio, mes):
                 <tr class="body-row">
                     <td>{mes}</td>
                     <td>Consultas en listas recibidas en {mes} de {anio}</td>
-                    <td>USD {precio_unico:,.2f}</td>
+                    <td>{format_cents(precio_cents)}</td>
                 </tr>
                 <tr class="total-row">
                     <td colspan="2" class="center-align">TOTAL</td>
-                    <td>USD {precio_unico:,.2f}</td>
+                    <td>{format_cents(precio_cents)}</td>
                 </tr>
                 <tr class="total-row">
                     <td colspan="2" class="center-align">TOTAL CON IVA</td>
-                    <td>USD {total_con_iva:,.2f}</td>
+                    <td>{format_cents(total_con_iva_cents)}</td>
                 </tr>
             </tbody>
         </table>
@@ -4,22 +4,18 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_ALIGN_VERTICAL, WD_ROW_HEIGHT_RULE
 from io import BytesIO
 import pandas as pd
-from datetime import datetime
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-import unicodedata
-
-# ---------------- Nombre de archivo ----------------
-def _slug_empresa(nombre: str) -> str:
-    nfkd = unicodedata.normalize("NFKD", nombre)
-    ascii_only = nfkd.encode("ascii", "ignore").decode("ascii")
-    return "".join(ch for ch in ascii_only if ch.isalnum())
-
-def build_report_filename(empresa: str, date: datetime | None = None) -> str:
-    date = date or datetime.now()
-    date_tag = date.strftime("%y%m%d")  # YYMMDD
-    empresa_tag = _slug_empresa(empresa)
-    return f"{date_tag}-LV-{empresa_tag}-Facturación honorarios.docx"
+from utils.file_utils import build_report_filename, get_logo_stream
+from utils.formatting_utils import column_widths, format_valor_column, use_fixed_layout
+from utils.perf_trace import span, traced
+from utils.money_utils import (
+    IVA_BASIS_POINTS, apply_rate, format_amount, format_cents, mode_cents, sum_cents
+)
+from data.currency_converter import (
+    currency_subtotals, has_foreign_currency, subtotal_rows, usd_cents, with_unconverted
+)
+from data.row_feed import RowFeed
 
 # --- Colores y Fuentes del Diseño ---
 FONT_FAMILY = 'Calibri Light'
@@ -29,32 +25,6 @@ COLOR_LIGHT_GRAY = RGBColor(240, 240, 240)
 COLOR_BLACK = RGBColor(0, 0, 0)
 COLOR_WHITE = RGBColor(255, 255, 255)
 
-# Agregar estas funciones directamente en el archivo:
-def format_currency(value, currency="USD"):
-    """Formatea un número como moneda."""
-    try:
-        return f"{currency} {float(value):,.2f}"
-    except (ValueError, TypeError):
-        return f"{currency} 0.00"
-
-def find_column(df, possible_names):
-    """Busca una columna en el DataFrame usando una lista de posibles nombres."""
-    for col_name in possible_names:
-        for actual_col in df.columns:
-            if col_name.upper() in actual_col.upper():
-                return actual_col
-    return None
-
-def get_document_count(df):
-    """Obtiene el número de documentos únicos."""
-    possible_names = ['NO. CASO', 'NUMERO CASO', 'CASO', 'ID', 'NUMERO', 'DOCUMENTO']
-    col_name = find_column(df, possible_names)
-    
-    if col_name:
-        return df[col_name].nunique()
-    else:
-        return len(df)
-
 # -------------------------------------------------
 # Utilidades de XML / Bordes
 # -------------------------------------------------
@@ -164,13 +134,6 @@ def set_row_text_color(row, color_rgb=COLOR_WHITE, bold=True):
                 if bold is not None:
                     run.bold = bold
 
-def get_representative_price(data: pd.DataFrame) -> float:
-    if 'VALOR' not in data.columns: return 0.0
-    serie = pd.to_numeric(data['VALOR'], errors='coerce').dropna()
-    if serie.empty: return 0.0
-    moda = serie.mode()
-    return float(moda.iloc[0]) if not moda.empty else float(serie.iloc[0])
-
 def merge_row_cells(table, row_idx: int, start_col: int, end_col: int):
     top_left = table.cell(row_idx, start_col)
     bottom_right = table.cell(row_idx, end_col)
@@ -187,6 +150,26 @@ def _fix_table_layout_3cols(table, widths=(Inches(1.2), Inches(4.2), Inches(1.4)
                 p.paragraph_format.space_after = Pt(0)
                 p.paragraph_format.line_spacing = 1
 
+def set_fixed_layout(table, widths):
+    """
+    Layout fijo con anchos explícitos en tblGrid: Word no re-mide las celdas al abrir.
+    Se llama antes de agregar filas, que toman su ancho de la grilla.
+    """
+    table.autofit = False
+    tblW = table._tbl.tblPr.find(qn('w:tblW'))
+    tblW.set(qn('w:type'), 'dxa')
+    tblW.set(qn('w:w'), str(sum(widths) // 635))  # EMU -> twips
+    for grid_col, width in zip(table._tbl.tblGrid.gridCol_lst, widths):
+        grid_col.w = width
+    for cell, width in zip(table.rows[0].cells, widths):
+        cell.width = width
+
+def repeat_header_row(row):
+    """Marca la fila como encabezado: Word la repite en cada página."""
+    tblHeader = OxmlElement('w:tblHeader')
+    tblHeader.set(qn('w:val'), 'true')
+    row._tr.get_or_add_trPr().append(tblHeader)
+
 def _set_row_height(row, height_in_inches=0.28):
     row.height = Inches(height_in_inches)
     row.height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
@@ -219,8 +202,11 @@ def apply_3col_grid_borders(table, skip_mid_rows=()):
 # -------------------------------------------------
 # Tablas del documento
 # -------------------------------------------------
-def add_main_table(doc, data, empresa: str):
-    """Añade la tabla principal de datos al documento (con merge en fila Total)."""
+def add_main_table(doc, data, empresa: str, summary=None):
+    """
+    Añade la tabla principal de datos al documento (con merge en fila Total).
+    Si se pasa `summary` (fila del SummaryCube) los totales se toman de ahí.
+    """
     doc.add_paragraph()
 
     required_cols = ['MES ASIGNACION', 'AÑO ASIGNACION', 'NOMBRE', 'MONEDA', 'VALOR']
@@ -230,23 +216,28 @@ def add_main_table(doc, data, empresa: str):
         return
 
     df_main = data[available_cols].copy()
+    if 'VALOR' in available_cols:
+        # Toda la columna se formatea en una sola pasada
+        df_main['VALOR'] = format_valor_column(data).to_numpy()
     table = doc.add_table(rows=1, cols=len(available_cols))
-    table.autofit = True
+    if use_fixed_layout(len(df_main)):
+        # Tablas grandes: anchos calculados de los datos y encabezado repetido por página
+        section = doc.sections[-1]
+        set_fixed_layout(table, column_widths(
+            df_main, section.page_width - section.left_margin - section.right_margin))
+        repeat_header_row(table.rows[0])
+    else:
+        table.autofit = True
 
     # Encabezados
     for i, name in enumerate(available_cols):
         table.cell(0, i).text = name
 
     # Filas
-    for _, row in df_main.iterrows():
+    for row in RowFeed(df_main, available_cols):
         cells = table.add_row().cells
-        for i, col_name in enumerate(available_cols):
-            value = row[col_name]
-            if col_name == 'VALOR':
-                try: cells[i].text = f"{float(value):,.2f}"
-                except Exception: cells[i].text = str(value)
-            else:
-                cells[i].text = str(value)
+        for i, value in enumerate(row):
+            cells[i].text = str(value)
 
     # Fila Total con merge horizontal (todo excepto 'VALOR')
     if 'VALOR' in available_cols:
@@ -262,29 +253,62 @@ def add_main_table(doc, data, empresa: str):
             p.paragraph_format.space_before = Pt(0)
             p.paragraph_format.space_after = Pt(0)
 
-        # Valor en la columna 'VALOR'
+        # Valor en la columna 'VALOR' (centavos enteros, se formatea al final)
         if empresa == "Gwealth":
-            total_unique = get_representative_price(data)
-            table.cell(total_row_idx, val_idx).text = f"{total_unique:,.2f}"
+            total_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+            total_text = format_amount(total_cents)
         else:
-            table.cell(total_row_idx, val_idx).text = f"{data['VALOR'].sum():,.2f}"
+            total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+            subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+            total_text = with_unconverted(format_amount(total_cents), subtotals)
+        table.cell(total_row_idx, val_idx).text = total_text
 
     style_table(table)
     set_table_borders(table)  # aquí sí queremos interiores
 
-def add_summary_tables(doc, data, empresa, anio, mes):
+def add_currency_subtotals_table(doc, data, summary=None):
+    """
+    Añade los subtotales por moneda y el total convertido a USD.
+    Solo se agrega si hay montos en una moneda distinta de USD.
+    """
+    subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+    if not has_foreign_currency(subtotals):
+        return
+
+    rows, total_usd = subtotal_rows(subtotals)
+    doc.add_paragraph()
+    table = doc.add_table(rows=1, cols=4)
+    for i, name in enumerate(["Moneda", "Registros", "Subtotal", "Subtotal USD (TRM)"]):
+        table.cell(0, i).text = name
+    for values in rows:
+        cells = table.add_row().cells
+        for i, value in enumerate(values):
+            cells[i].text = value
+
+    table.add_row()
+    total_row_idx = len(table.rows) - 1
+    merged = merge_row_cells(table, total_row_idx, 0, 2)
+    merged.text = "Total convertido a USD"
+    merged.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+    table.cell(total_row_idx, 3).text = with_unconverted(format_cents(total_usd), subtotals)
+
+    style_table(table)
+    set_table_borders(table)
+
+def add_summary_tables(doc, data, empresa, anio, mes, summary=None):
     """Añade las tablas de resumen específicas por empresa (excluyendo Ravago)."""
-    total_valor_sum = data['VALOR'].sum() if 'VALOR' in data.columns else 0.0
+    total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
     doc.add_paragraph()
 
     if empresa == "Altimetrik":
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
         table = doc.add_table(rows=2, cols=3)
         table.cell(0,0).text = "Mes"
         table.cell(0,1).text = "Concepto"
         table.cell(0,2).text = "Total"
         table.cell(1,0).text = mes
         table.cell(1,1).text = f"Consultas en listas recibidas en {mes} de {anio}"
-        table.cell(1,2).text = format_currency(total_valor_sum)
+        table.cell(1,2).text = with_unconverted(format_cents(total_cents), subtotals)
 
         style_table(table, has_total_row=False)
         _fix_table_layout_3cols(table)
@@ -292,9 +316,9 @@ def add_summary_tables(doc, data, empresa, anio, mes):
         set_table_borders(table)
 
     elif empresa == "Gwealth":
-        precio_unico = get_representative_price(data)
-        iva = precio_unico * 0.19
-        total_con_iva = precio_unico + iva
+        # IVA calculado en centavos enteros con redondeo half-up
+        precio_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+        total_con_iva_cents = precio_cents + apply_rate(precio_cents, IVA_BASIS_POINTS)
 
         table = doc.add_table(rows=4, cols=3)
         # Encabezados
@@ -305,7 +329,7 @@ def add_summary_tables(doc, data, empresa, anio, mes):
         # Fila de contenido
         table.cell(1,0).text = mes
         table.cell(1,1).text = f"Consultas en listas recibidas en {mes} de {anio}"
-        table.cell(1,2).text = format_currency(precio_unico)
+        table.cell(1,2).text = format_cents(precio_cents)
 
         # Fila TOTAL (combinar col 0 y 1) -> escribir texto DESPUÉS de fusionar
         table.cell(2,0).text = ""
@@ -316,7 +340,7 @@ def add_summary_tables(doc, data, empresa, anio, mes):
             p.alignment = WD_ALIGN_PARAGRAPH.CENTER
             p.paragraph_format.space_before = Pt(0)
             p.paragraph_format.space_after = Pt(0)
-        table.cell(2,2).text = format_currency(precio_unico)
+        table.cell(2,2).text = format_cents(precio_cents)
 
         # Fila TOTAL CON IVA (igual)
         table.cell(3,0).text = ""
@@ -327,7 +351,7 @@ def add_summary_tables(doc, data, empresa, anio, mes):
             p.alignment = WD_ALIGN_PARAGRAPH.CENTER
             p.paragraph_format.space_before = Pt(0)
             p.paragraph_format.space_after = Pt(0)
-        table.cell(3,2).text = format_currency(total_con_iva)
+        table.cell(3,2).text = format_cents(total_con_iva_cents)
 
         # Estilos + colores (las filas 2 y 3 en acento)
         style_table(table, has_total_row=False)
@@ -347,8 +371,12 @@ def add_summary_tables(doc, data, empresa, anio, mes):
 # -------------------------------------------------
 # Generación del documento
 # -------------------------------------------------
-def generate_report(data, empresa, anio, mes, funcionarios):
-    """Genera el documento Word desde cero para Altimetrik y GWealth."""
+@traced()
+def generate_report(data, empresa, anio, mes, funcionarios, summary=None):
+    """
+    Genera el documento Word desde cero para Altimetrik y GWealth.
+    `summary` es la fila de la partición en el SummaryCube (opcional).
+    """
     doc = Document()
 
     normal_style = doc.styles['Normal']
@@ -364,7 +392,7 @@ def generate_report(data, empresa, anio, mes, funcionarios):
     # Logo en cuerpo
     p_logo = doc.add_paragraph(); p_logo.alignment = WD_ALIGN_PARAGRAPH.RIGHT
     try:
-        p_logo.add_run().add_picture('assets/biu_logo.png', width=Inches(1.5))
+        p_logo.add_run().add_picture(get_logo_stream(), width=Inches(1.5))
     except FileNotFoundError:
         p_logo.add_run("[Logo BIU]").bold = True
 
@@ -384,8 +412,9 @@ def generate_report(data, empresa, anio, mes, funcionarios):
     doc.add_paragraph(f"Funcionario revisor: \t\t {funcionarios['revisor']}")
 
     # Tablas
-    add_main_table(doc, data, empresa)
-    add_summary_tables(doc, data, empresa, anio, mes)
+    add_main_table(doc, data, empresa, summary)
+    add_currency_subtotals_table(doc, data, summary)
+    add_summary_tables(doc, data, empresa, anio, mes, summary)
 
     # Footer
     footer = doc.sections[0].footer
@@ -396,5 +425,7 @@ def generate_report(data, empresa, anio, mes, funcionarios):
         r.font.name = FONT_FAMILY; r.font.size = Pt(9)
 
     buffer = BytesIO()
-    doc.save(buffer); buffer.seek(0)
+    with span("docx.save", rows=len(data)):
+        doc.save(buffer)
+    buffer.seek(0)
     return buffer
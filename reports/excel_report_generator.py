@@ -4,9 +4,14 @@ from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from openpyxl.drawing.image import Image
 from io import BytesIO
 from datetime import datetime
-from utils import get_document_count, find_column
+from utils.column_schema import get_schema
+from utils.data_utils import get_document_count
+from utils.money_utils import cents_to_float, sum_cents, to_cents
+from utils.perf_trace import span
+from data.currency_converter import currency_subtotals, has_foreign_currency, subtotal_rows, usd_cents
 from .excel_styles import ExcelStyleManager
 from .excel_sheet_builder import ExcelSheetBuilder
+from .excel_stream_writer import ExcelStreamWriter, resolve_shard_rows
 
 class ExcelReportGenerator:
     """Generador de reportes en formato Excel para Ravago."""
@@ -15,14 +20,22 @@ class ExcelReportGenerator:
         self.style_manager = ExcelStyleManager()
         self.sheet_builder = ExcelSheetBuilder()
     
-    def create_ravago_report(self, data: pd.DataFrame, anio: int, mes: str, funcionarios: dict = None) -> BytesIO:
+    def create_ravago_report(self, data: pd.DataFrame, anio: int, mes: str, funcionarios: dict = None,
+                             summary: dict = None, shard_rows: int = None) -> BytesIO:
         """
         Genera un Excel con dos hojas para Ravago.
+        Si se pasa `summary` (fila del SummaryCube) el conteo y el total se toman de ahí.
+        Si el detalle no cabe en una hoja, o se pide `shard_rows` (o ANEXO_SHARD_ROWS),
+        el Anexo 1 se parte en varias hojas y el libro se escribe en modo streaming.
         """
-        wb = Workbook()
-        
         # Preparar datos auxiliares
-        report_data = self._prepare_report_data(data, anio, mes, funcionarios)
+        report_data = self._prepare_report_data(data, anio, mes, funcionarios, summary)
+        
+        shard_size = resolve_shard_rows(len(data), shard_rows)
+        if shard_size is not None:
+            return ExcelStreamWriter().write(report_data, data, shard_size)
+        
+        wb = Workbook()
         
         # Crear hoja de Facturación
         ws1 = wb.active
@@ -35,37 +48,53 @@ class ExcelReportGenerator:
         
         # Guardar en memoria
         buffer = BytesIO()
-        wb.save(buffer)
+        with span("xlsx.save", rows=len(data)):
+            wb.save(buffer)
         buffer.seek(0)
         
         return buffer
     
-    def _prepare_report_data(self, data: pd.DataFrame, anio: int, mes: str, funcionarios: dict = None) -> dict:
+    def _prepare_report_data(self, data: pd.DataFrame, anio: int, mes: str, funcionarios: dict = None,
+                             summary: dict = None) -> dict:
         """Prepara los datos auxiliares para el reporte."""
         funcionarios = funcionarios or {}
         
-        try:
-            num_docs = get_document_count(data)
-        except Exception:
-            num_docs = len(data)
+        if summary:
+            num_docs = summary['num_docs']
+        else:
+            try:
+                num_docs = get_document_count(data)
+            except Exception:
+                num_docs = len(data)
+        
+        # Columnas resueltas al cargar (valor, nombre, tipo de documento)
+        schema = get_schema(data)
+        
+        # Calcular valor total en centavos enteros; a float solo para la celda de Excel
+        valor_col = schema['valor']
+        if valor_col == 'VALOR':
+            total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+        else:
+            total_cents = sum_cents(to_cents(data[valor_col])) if valor_col else 0
+        total_valor = cents_to_float(total_cents)
         
-        # Calcular valor total
-        if 'VALOR' in data.columns:
-            total_valor = float(data['VALOR'].fillna(0).sum())
-            valor_col = 'VALOR'
+        # Montos por fila en USD (convertidos con la TRM) y subtotales por moneda
+        if valor_col == 'VALOR':
+            usd_values = usd_cents(data).to_numpy(dtype='float64', na_value=float('nan'))
+            subtotales = summary['subtotales_moneda'] if summary else currency_subtotals(data)
         else:
-            valor_col = find_column(data, ['VALOR', 'TOTAL', 'IMPORTE', 'MONTO'])
-            total_valor = float(data.get(valor_col, pd.Series(dtype=float)).fillna(0).sum()) if valor_col else 0.0
+            usd_values, subtotales = None, {}
         
-        # Encontrar columnas relevantes
-        nombre_col = find_column(data, ['NOMBRE', 'NOMBRE CONTRAPARTE', 'CLIENTE'])
-        tipo_doc_col = find_column(data, ['TIPO DE DOCUMENTO', 'TIPO DOCUMENTO', 'DOCUMENTO'])
+        nombre_col = schema['nombre']
+        tipo_doc_col = schema['tipo_documento']
         
         return {
             'anio': anio,
             'mes': mes,
             'num_docs': num_docs,
             'total_valor': total_valor,
+            'usd_values': usd_values,
+            'subtotales_moneda': subtotales,
             'valor_col': valor_col,
             'nombre_col': nombre_col,
             'tipo_doc_col': tipo_doc_col,
@@ -2,23 +2,19 @@ from openpyxl.drawing.image import Image
 from openpyxl.worksheet.page import PageMargins
 from openpyxl.utils import column_index_from_string as colidx
 from openpyxl.styles import Side, Border
+import numpy as np
+from utils.file_utils import get_logo_stream
+from utils.formatting_utils import wrapped_row_heights
+from data.row_feed import RowFeed
 from .excel_styles import ExcelStyleManager
-
-# Meses en español
-MESES_ES = [
-    "enero", "febrero", "marzo", "abril", "mayo", "junio",
-    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
-]
-
-def fecha_es(dt) -> str:
-    """Devuelve 'dd de <mes> de yyyy' en español."""
-    return f"{dt.day:02d} de {MESES_ES[dt.month-1]} de {dt.year}"
+from .ravago_layout import RavagoLayout, write_row
 
 class ExcelSheetBuilder:
     """Construye las hojas de Excel para reportes de Ravago."""
     
     def __init__(self):
         self.style_manager = ExcelStyleManager()
+        self.layout = RavagoLayout(self.style_manager)
     
     def build_facturacion_sheet(self, ws, report_data):
         """Construye la hoja de Facturación."""
@@ -28,6 +24,7 @@ class ExcelSheetBuilder:
         self._add_summary_tables(ws, report_data)
         self._add_notes(ws, report_data)
         self._add_outer_frame(ws, "B2", "G21")
+        self._set_wrapped_row_heights(ws, 8, 14)
     
     def build_anexo_sheet(self, ws, report_data, data):
         """Construye la hoja de Anexo 1."""
@@ -74,7 +71,7 @@ class ExcelSheetBuilder:
     def _add_logo(self, ws, cell_position):
         """Agrega el logo BIU a la hoja."""
         try:
-            img = Image('assets/biu_logo.png')
+            img = Image(get_logo_stream())
             img.width, img.height = 100, 58
             ws.add_image(img, cell_position)
         except Exception:
@@ -86,20 +83,8 @@ class ExcelSheetBuilder:
     
     def _add_header_info(self, ws, report_data):
         """Agrega la información del encabezado."""
-        fecha_str = fecha_es(report_data['fecha_dt'])
-        
-        self.style_manager.style_cell(
-            ws['C3'], f"Fecha de corte del reporte: {fecha_str}", 
-            self.style_manager.info_font, self.style_manager.left
-        )
-        self.style_manager.style_cell(
-            ws['C4'], f"Funcionario que reporta: {report_data['rep_name']}", 
-            self.style_manager.info_font, self.style_manager.left
-        )
-        self.style_manager.style_cell(
-            ws['C5'], f"Funcionario revisor: {report_data['rev_name']}", 
-            self.style_manager.info_font, self.style_manager.left
-        )
+        for row, cells in self.layout.header_info(report_data).items():
+            write_row(ws, row, cells)
     
     def _add_summary_tables(self, ws, report_data):
         """Agrega las tablas de resumen a la hoja de Facturación."""
@@ -214,6 +199,8 @@ class ExcelSheetBuilder:
     
     def _add_notes(self, ws, report_data):
         """Agrega las notas al pie de la hoja."""
+        # Fila 15: montos sin TRM que el SUBTOTAL no incluye
+        write_row(ws, 15, self.layout.unconverted_note(report_data.get('subtotales_moneda') or {}))
         ws.merge_cells('C16:D16')
         self.style_manager.style_cell(
             ws['C16'], "TRM Aplicable: Según la propuesta, es aquella de emisión de la factura.",
@@ -240,31 +227,16 @@ class ExcelSheetBuilder:
     def _add_detail_table(self, ws, report_data, data):
         """Agrega la tabla de detalle en la hoja Anexo."""
         # Headers
-        self.style_manager.style_cell(
-            ws['C8'], 'FECHA', self.style_manager.header_font, 
-            self.style_manager.center, self.style_manager.header_fill, 
-            self.style_manager.thin_border
-        )
-        self.style_manager.style_cell(
-            ws['D8'], 'NOMBRE CONTRAPARTE', self.style_manager.header_font, 
-            self.style_manager.center, self.style_manager.header_fill, 
-            self.style_manager.thin_border
-        )
-        self.style_manager.style_cell(
-            ws['E8'], 'TIPO DE DOCUMENTO', self.style_manager.header_font, 
-            self.style_manager.center, self.style_manager.header_fill, 
-            self.style_manager.thin_border
-        )
-        self.style_manager.style_cell(
-            ws['F8'], 'TOTAL', self.style_manager.header_font, 
-            self.style_manager.center, self.style_manager.header_fill, 
-            self.style_manager.thin_border
-        )
+        write_row(ws, 8, self.layout.anexo_headers())
         
         # Filas de detalle
         start_row = 9
         r = start_row
-        for idx, row_data in data.iterrows():
+        usd_values = report_data.get('usd_values')
+        valor_col = report_data['valor_col']
+        feed = RowFeed(data, [report_data['nombre_col'], report_data['tipo_doc_col'],
+                              usd_values if usd_values is not None else valor_col])
+        for nombre_value, tipo_doc_value, valor in feed:
             # FECHA: consecutivo 1,2,3,...
             self.style_manager.style_cell(
                 ws.cell(row=r, column=3), r - start_row + 1, 
@@ -272,21 +244,23 @@ class ExcelSheetBuilder:
                 self.style_manager.white_fill, self.style_manager.thin_border
             )
             
-            nombre_value = row_data.get(report_data['nombre_col'], '') if report_data['nombre_col'] else ''
             self.style_manager.style_cell(
                 ws.cell(row=r, column=4), nombre_value, 
                 self.style_manager.data_font, self.style_manager.left, 
                 self.style_manager.white_fill, self.style_manager.thin_border
             )
             
-            tipo_doc_value = row_data.get(report_data['tipo_doc_col'], '') if report_data['tipo_doc_col'] else ''
             self.style_manager.style_cell(
                 ws.cell(row=r, column=5), tipo_doc_value, 
                 self.style_manager.data_font, self.style_manager.left, 
                 self.style_manager.white_fill, self.style_manager.thin_border
             )
             
-            valor_value = float(row_data.get(report_data['valor_col'], 0)) if report_data['valor_col'] else 0.0
+            if usd_values is not None:
+                # Filas sin TRM quedan en blanco
+                valor_value = valor / 100 if valor == valor else None
+            else:
+                valor_value = float(valor) if valor_col else 0.0
             c_val = ws.cell(row=r, column=6)
             self.style_manager.style_cell(
                 c_val, valor_value, self.style_manager.data_font, 
@@ -296,40 +270,46 @@ class ExcelSheetBuilder:
             c_val.number_format = '"USD" #,##0'
             r += 1
         
-        # Fila de SUBTOTAL
-        subtotal_row = r
-        
-        # Celdas blancas sin bordes
-        self.style_manager.style_cell(
-            ws.cell(row=subtotal_row, column=3), '', 
-            self.style_manager.data_font, self.style_manager.left, 
-            self.style_manager.white_fill, None
-        )
-        self.style_manager.style_cell(
-            ws.cell(row=subtotal_row, column=4), '', 
-            self.style_manager.data_font, self.style_manager.left, 
-            self.style_manager.white_fill, None
-        )
+        # Alto de las filas de detalle, estimado de una vez; aquí solo FECHA ajusta texto
+        self._set_wrapped_row_heights(ws, 3, 8)
+        heights = wrapped_row_heights([(np.arange(1, len(data) + 1), ws.column_dimensions['C'].width)])
+        for row_idx, height in enumerate(heights.tolist(), start_row):
+            ws.row_dimensions[row_idx].height = height
         
-        # SUBTOTAL
-        self.style_manager.style_cell(
-            ws.cell(row=subtotal_row, column=5), 'SUBTOTAL', 
-            self.style_manager.total_font, self.style_manager.right, 
-            self.style_manager.total_fill, self.style_manager.thin_border
-        )
+        # Fila de SUBTOTAL (C y D blancas y sin bordes)
+        subtotal_row = r
+        write_row(ws, subtotal_row, self.layout.subtotal_row('SUBTOTAL', report_data['total_valor']))
         
-        c_sub = ws.cell(row=subtotal_row, column=6)
-        self.style_manager.style_cell(
-            c_sub, report_data['total_valor'], 
-            self.style_manager.total_font, self.style_manager.right, 
-            self.style_manager.total_fill, self.style_manager.thin_border
-        )
-        c_sub.number_format = '"USD" #,##0'
+        # Subtotales por moneda (solo si hay montos en otra moneda)
+        last_row = self._add_currency_subtotals(ws, subtotal_row, report_data.get('subtotales_moneda') or {})
         
         # Marco exterior
-        bottom_row_for_frame = subtotal_row + 1
+        bottom_row_for_frame = last_row + 1
         self._add_outer_frame(ws, "B2", f"G{bottom_row_for_frame}")
     
+    def _add_currency_subtotals(self, ws, subtotal_row: int, subtotales: dict) -> int:
+        """Agrega una fila por moneda bajo el SUBTOTAL; retorna la última fila usada."""
+        last_row = subtotal_row
+        for cells in self.layout.currency_rows(subtotales):
+            last_row += 1
+            write_row(ws, last_row, cells)
+        return last_row
+    
+    def _set_wrapped_row_heights(self, ws, first_row: int, last_row: int):
+        """
+        Alto explícito para las filas first..last según sus celdas con texto ajustado,
+        para que Excel no tenga que autoajustarlas al abrir o imprimir.
+        Las celdas combinadas no cuentan (Excel tampoco las autoajusta).
+        """
+        for r in range(first_row, last_row + 1):
+            columns = [
+                ([cell.value], ws.column_dimensions[cell.column_letter].width)
+                for cell in ws[r]
+                if cell.alignment.wrap_text and cell.value not in (None, '') and cell.coordinate not in ws.merged_cells
+            ]
+            if columns:
+                ws.row_dimensions[r].height = float(wrapped_row_heights(columns)[0])
+    
     def _add_outer_frame(self, ws, tl: str, br: str):
         """Dibuja un marco exterior alrededor del área especificada."""
         def _letters(s: str) -> str:
@@ -0,0 +1,380 @@
+import os
+from io import BytesIO
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.image import Image
+from openpyxl.styles import Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.dimensions import RowDimension
+from openpyxl.worksheet.page import PageMargins
+from utils.file_utils import get_logo_stream
+from utils.formatting_utils import wrapped_row_heights
+from utils.money_utils import cents_to_float, sum_cents, to_cents
+from utils.perf_trace import span
+from data.row_feed import RowFeed
+from .excel_styles import ExcelStyleManager
+from .ravago_layout import USD_FORMAT, RavagoLayout, RowSpec
+
+# Límite de filas de una hoja de Excel
+EXCEL_MAX_ROWS = 1_048_576
+# Filas de detalle por hoja cuando se parte automáticamente; deja espacio de
+# sobra para el encabezado (8 filas) y el pie (subtotales, monedas y marco)
+MAX_SHARD_ROWS = 1_000_000
+# Tamaño de partición fijo, p. ej. ANEXO_SHARD_ROWS=50000
+SHARD_ROWS_ENV = 'ANEXO_SHARD_ROWS'
+
+ANEXO_TITLE = "Anexo 1"
+DETAIL_START_ROW = 9
+# Filas de datos que se leen de las columnas a la vez
+CHUNK_ROWS = 50_000
+
+FACTURACION_WIDTHS = {'A': 2, 'B': 4, 'C': 38, 'D': 20, 'E': 30, 'F': 16, 'G': 8}
+ANEXO_WIDTHS = {'A': 2, 'B': 4, 'C': 12, 'D': 36, 'E': 44, 'F': 16, 'G': 8}
+
+# Marco exterior: columnas B..G
+FRAME_LEFT, FRAME_RIGHT = 2, 7
+
+def resolve_shard_rows(n_rows: int, shard_rows: Optional[int] = None) -> Optional[int]:
+    """
+    Filas de detalle por hoja del Anexo 1, o None si cabe en una sola hoja normal.
+
+    Args:
+        n_rows: Filas de detalle del reporte
+        shard_rows: Tamaño pedido; si no se pasa se usa ANEXO_SHARD_ROWS
+            (un valor que no es un entero cuenta como MAX_SHARD_ROWS)
+
+    Returns:
+        Tamaño de cada partición (nunca mayor que MAX_SHARD_ROWS) o None
+    """
+    if shard_rows is None:
+        configured = os.environ.get(SHARD_ROWS_ENV, "").strip()
+        try:
+            shard_rows = int(configured) if configured else None
+        except ValueError:
+            shard_rows = MAX_SHARD_ROWS
+    if shard_rows is not None and shard_rows > 0:
+        return min(shard_rows, MAX_SHARD_ROWS)
+    return MAX_SHARD_ROWS if n_rows > MAX_SHARD_ROWS else None
+
+def shard_titles(n_rows: int, shard_rows: int) -> list:
+    """Nombres de las hojas del Anexo: 'Anexo 1' si es una sola, 'Anexo 1 (1)', 'Anexo 1 (2)'... si no."""
+    n_shards = max(-(-n_rows // shard_rows), 1)
+    if n_shards == 1:
+        return [ANEXO_TITLE]
+    return [f"{ANEXO_TITLE} ({i})" for i in range(1, n_shards + 1)]
+
+class ExcelStreamWriter:
+    """
+    Escribe el reporte de Ravago en modo write_only de openpyxl.
+
+    Se usa cuando el detalle no cabe en una hoja (o se pide un tamaño de
+    partición): el Anexo 1 se reparte en varias hojas, cada una con su
+    encabezado, su marco y su subtotal de hoja, y el SUBTOTAL general con los
+    subtotales por moneda va en la última. Las filas se escriben en orden y
+    no quedan en memoria, así que el costo no crece con el tamaño del libro.
+    """
+
+    def __init__(self):
+        self.style_manager = ExcelStyleManager()
+        self.layout = RavagoLayout(self.style_manager)
+        sm = self.style_manager
+        self.wrap_left = Alignment(horizontal='left', vertical='center', wrap_text=True)
+        self.frame_side = Side(style="medium", color="000000")
+        # Estilos de las celdas de detalle: (fuente, alineación, relleno, borde, formato)
+        self.detail_styles = {
+            3: (sm.data_font, sm.center, sm.white_fill, sm.thin_border, None),
+            4: (sm.data_font, self.wrap_left, sm.white_fill, sm.thin_border, None),
+            5: (sm.data_font, self.wrap_left, sm.white_fill, sm.thin_border, None),
+            6: (sm.data_font, sm.right, sm.white_fill, sm.thin_border, USD_FORMAT),
+        }
+
+    def write(self, report_data: dict, data: pd.DataFrame, shard_rows: int) -> BytesIO:
+        """
+        Genera el libro completo (Facturación + Anexo 1 partido).
+
+        Args:
+            report_data: Datos auxiliares del reporte (como ExcelReportGenerator._prepare_report_data)
+            data: Filas de detalle
+            shard_rows: Filas de detalle por hoja del Anexo
+
+        Returns:
+            Buffer con el .xlsx
+        """
+        wb = Workbook(write_only=True)
+        self._write_facturacion(wb.create_sheet("Facturación"), report_data)
+
+        titles = shard_titles(len(data), shard_rows)
+        n_rows = len(data)
+        for i, title in enumerate(titles):
+            start, stop = i * shard_rows, min((i + 1) * shard_rows, n_rows)
+            with span("xlsx.shard", rows=stop - start):
+                self._write_anexo_shard(
+                    wb.create_sheet(title), report_data, data, start, stop,
+                    multiple=len(titles) > 1, last=i == len(titles) - 1,
+                )
+
+        buffer = BytesIO()
+        with span("xlsx.save", rows=n_rows):
+            wb.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+    # -----------------
+    # Celdas y filas
+    # -----------------
+
+    def _cell(self, ws, value=None, font=None, alignment=None, fill=None, border=None, number_format=None):
+        """Celda de solo escritura con estilos completos."""
+        cell = WriteOnlyCell(ws, value)
+        if font is not None:
+            cell.font = font
+        if alignment is not None:
+            cell.alignment = alignment
+        if fill is not None:
+            cell.fill = fill
+        if border is not None:
+            cell.border = border
+        if number_format is not None:
+            cell.number_format = number_format
+        return cell
+
+    def _framed_row(self, ws, cells: Dict[int, WriteOnlyCell], row: int, top: int, bottom: int) -> list:
+        """
+        Fila lista para `append`, con el marco B..G combinado con los bordes que ya tenga cada celda.
+
+        Args:
+            ws: Hoja de solo escritura
+            cells: {columna: celda} de la fila
+            row: Número de fila
+            top: Primera fila del marco
+            bottom: Última fila del marco
+        """
+        if top <= row <= bottom:
+            side = self.frame_side
+            columns = range(FRAME_LEFT, FRAME_RIGHT + 1) if row in (top, bottom) else (FRAME_LEFT, FRAME_RIGHT)
+            for col in columns:
+                cell = cells.get(col) or self._cell(ws)
+                prev = cell.border
+                cell.border = Border(
+                    left=side if col == FRAME_LEFT else prev.left,
+                    right=side if col == FRAME_RIGHT else prev.right,
+                    top=side if row == top else prev.top,
+                    bottom=side if row == bottom else prev.bottom,
+                )
+                cells[col] = cell
+        width = max(cells, default=0)
+        return [cells.get(col) for col in range(1, width + 1)]
+
+    def _write_block(self, ws, rows: Dict[int, Dict[int, WriteOnlyCell]], first: int, last: int,
+                     top: int, bottom: int, widths: Dict[str, float]):
+        """
+        Escribe las filas first..last de un bloque fijo {fila: {columna: celda}}.
+
+        Las filas con texto ajustado (fuera de celdas combinadas) llevan su alto
+        explícito, igual que en el libro normal.
+        """
+        for row in range(first, last + 1):
+            cells = dict(rows.get(row, {}))
+            columns = [
+                ([cell.value], widths[get_column_letter(col)]) for col, cell in cells.items()
+                if cell.alignment.wrap_text and cell.value not in (None, '')
+                and f"{get_column_letter(col)}{row}" not in ws.merged_cells
+            ]
+            if columns:
+                ws.row_dimensions[row].height = float(wrapped_row_heights(columns)[0])
+            ws.append(self._framed_row(ws, cells, row, top, bottom))
+
+    def _setup_sheet(self, ws, widths: Dict[str, float]):
+        """Anchos, márgenes, vista y logo; en write_only todo esto va antes de la primera fila."""
+        ws.sheet_view.showGridLines = False
+        for letter, width in widths.items():
+            ws.column_dimensions[letter].width = width
+        ws.page_margins = PageMargins(left=0.6, right=0.6, top=0.6, bottom=0.6, header=0.3, footer=0.3)
+        ws.print_options.horizontalCentered = True
+        try:
+            img = Image(get_logo_stream())
+            img.width, img.height = 100, 58
+            ws.add_image(img, 'F3')
+            return None
+        except Exception:
+            sm = self.style_manager
+            return self._cell(ws, "BIU", sm.title_font, sm.center)
+
+    def _spec_row(self, ws, cells: RowSpec) -> Dict[int, WriteOnlyCell]:
+        """Celdas de solo escritura para una fila de RavagoLayout."""
+        return {col: self._cell(ws, *spec) for col, spec in cells.items()}
+
+    def _header_info(self, ws, report_data: dict) -> Dict[int, Dict[int, WriteOnlyCell]]:
+        """Filas 3-5: fecha de corte y funcionarios."""
+        return {row: self._spec_row(ws, cells) for row, cells in self.layout.header_info(report_data).items()}
+
+    # -----------------
+    # Hojas
+    # -----------------
+
+    def _write_facturacion(self, ws, report_data: dict):
+        """Hoja de Facturación, igual a la del libro normal."""
+        sm = self.style_manager
+        logo_fallback = self._setup_sheet(ws, FACTURACION_WIDTHS)
+        for merged in ('C12:D12', 'C13:D13', 'C16:D16', 'C18:E20'):
+            ws.merged_cells.add(merged)
+
+        anio, mes, num_docs = report_data['anio'], report_data['mes'], report_data['num_docs']
+        total_valor = report_data['total_valor']
+        rows = self._header_info(ws, report_data)
+        if logo_fallback is not None:
+            rows[3][6] = logo_fallback
+
+        rows[8] = {
+            3: self._cell(ws, 'Año', sm.header_font, sm.center, sm.header_fill, sm.thin_border),
+            4: self._cell(ws, 'Mes', sm.header_font, sm.center, sm.header_fill, sm.thin_border),
+            5: self._cell(ws, 'Documentos Revisados (Ver Anexo 1)', sm.header_font, sm.center,
+                          sm.header_fill, sm.thin_border),
+        }
+        rows[9] = {
+            3: self._cell(ws, anio, sm.data_font, sm.center, sm.white_fill, sm.thin_border),
+            4: self._cell(ws, mes, sm.data_font, sm.center, sm.white_fill, sm.thin_border),
+            5: self._cell(ws, num_docs, sm.data_font, sm.center, sm.white_fill, sm.thin_border),
+        }
+        rows[10] = {
+            3: self._cell(ws, '', sm.data_font, sm.left, sm.white_fill),
+            4: self._cell(ws, 'Total Por Facturar', sm.total_font, sm.center, sm.total_fill, sm.thin_border),
+            5: self._cell(ws, num_docs, sm.total_font, sm.center, sm.total_fill, sm.thin_border),
+        }
+        rows[12] = {
+            3: self._cell(ws, 'Concepto', sm.header_font, sm.center, sm.header_fill, sm.thin_border),
+            5: self._cell(ws, 'Total (antes de I.V.A)', sm.header_font, sm.center, sm.header_fill, sm.thin_border),
+        }
+        rows[13] = {
+            3: self._cell(ws, f"Revisión de {num_docs} documentos durante el mes de {mes} de {anio}",
+                          sm.data_font, self.wrap_left, sm.white_fill, sm.thin_border),
+            5: self._cell(ws, total_valor, sm.data_font, sm.right, sm.white_fill, sm.thin_border, USD_FORMAT),
+        }
+        rows[14] = {
+            3: self._cell(ws, '', sm.data_font, sm.left, sm.white_fill),
+            4: self._cell(ws, 'SUBTOTAL', sm.total_font, sm.right, sm.total_fill, sm.thin_border),
+            5: self._cell(ws, total_valor, sm.total_font, sm.right, sm.total_fill, sm.thin_border, USD_FORMAT),
+        }
+        note = self.layout.unconverted_note(report_data.get('subtotales_moneda') or {})
+        if note:
+            rows[15] = self._spec_row(ws, note)
+        rows[16] = {
+            3: self._cell(ws, "TRM Aplicable: Según la propuesta, es aquella de emisión de la factura.",
+                          sm.info_font, self.wrap_left),
+        }
+        rows[18] = {
+            3: self._cell(ws, ("biu usually issues monthly invoices for the provision of the Services; "
+                               "the amounts indicated in US dollars shall be converted based on the official "
+                               "prevailing market rate as of the date of issuance of the invoice."),
+                          sm.italic_font, Alignment(horizontal='left', vertical='top', wrap_text=True)),
+        }
+        self._write_block(ws, rows, 1, 21, top=2, bottom=21, widths=FACTURACION_WIDTHS)
+
+    def _write_anexo_shard(self, ws, report_data: dict, data: pd.DataFrame, start: int, stop: int,
+                           multiple: bool, last: bool):
+        """
+        Una hoja del Anexo 1 con las filas [start, stop) del detalle.
+
+        Args:
+            ws: Hoja de solo escritura
+            report_data: Datos auxiliares del reporte
+            data: Filas de detalle completas
+            start: Primera fila (posición) de la partición
+            stop: Fin (exclusivo) de la partición
+            multiple: Si el Anexo tiene más de una hoja (agrega el subtotal de hoja)
+            last: Si es la última hoja (lleva el SUBTOTAL general y las monedas)
+        """
+        sm = self.style_manager
+        logo_fallback = self._setup_sheet(ws, ANEXO_WIDTHS)
+        ws.merged_cells.add('C6:F6')
+        # El encabezado de la tabla se repite al imprimir cada página
+        ws.print_title_rows = '8:8'
+
+        # Pie: subtotal de la hoja, SUBTOTAL general y subtotales por moneda
+        footer = []
+        if multiple:
+            footer.append(self.layout.subtotal_row("SUBTOTAL HOJA", cents_to_float(
+                self._shard_total_cents(report_data, data, start, stop))))
+        if last:
+            footer.append(self.layout.subtotal_row('SUBTOTAL', report_data['total_valor']))
+            footer.extend(self.layout.currency_rows(report_data.get('subtotales_moneda') or {}))
+        bottom = DETAIL_START_ROW + (stop - start) + len(footer)
+
+        rows = self._header_info(ws, report_data)
+        if logo_fallback is not None:
+            rows[3][6] = logo_fallback
+        rows[6] = {3: self._cell(ws, "HONORARIOS", sm.title_font, sm.center)}
+        rows[8] = self._spec_row(ws, self.layout.anexo_headers())
+        self._write_block(ws, rows, 1, DETAIL_START_ROW - 1, top=2, bottom=bottom, widths=ANEXO_WIDTHS)
+
+        self._write_detail_rows(ws, report_data, data, start, stop)
+
+        row = DETAIL_START_ROW + (stop - start)
+        for cells in footer:
+            ws.append(self._framed_row(ws, self._spec_row(ws, cells), row, top=2, bottom=bottom))
+            row += 1
+        ws.append(self._framed_row(ws, {}, bottom, top=2, bottom=bottom))
+
+    def _write_detail_rows(self, ws, report_data: dict, data: pd.DataFrame, start: int, stop: int):
+        """
+        Filas de detalle de una partición.
+
+        Las celdas con estilo se crean una sola vez y se reutilizan: en modo
+        write_only cada fila se serializa al agregarla. Lo mismo con el alto de
+        fila: uno por cada alto distinto, que solo se asocia a la fila mientras
+        se escribe.
+        """
+        side = self.frame_side
+        frame_left = self._cell(ws, border=Border(left=side))
+        frame_right = self._cell(ws, border=Border(right=side))
+        cells = {col: self._cell(ws, None, *style) for col, style in self.detail_styles.items()}
+        row = [None, frame_left, cells[3], cells[4], cells[5], cells[6], frame_right]
+        row_dims = ws.row_dimensions
+        dims_by_height = {}
+
+        for offset, nombres, tipos, valores in self._iter_columns(report_data, data, start, stop):
+            heights = wrapped_row_heights([(nombres, ANEXO_WIDTHS['D']), (tipos, ANEXO_WIDTHS['E'])]).tolist()
+            row_idx = DETAIL_START_ROW + offset - start
+            for i in range(len(valores)):
+                # FECHA: consecutivo que sigue de una hoja a la siguiente
+                cells[3].value = offset + i + 1
+                cells[4].value = nombres[i]
+                cells[5].value = tipos[i]
+                cells[6].value = valores[i]
+                dim = dims_by_height.get(heights[i])
+                if dim is None:
+                    dim = dims_by_height[heights[i]] = RowDimension(ws, ht=heights[i])
+                row_dims[row_idx] = dim
+                ws.append(row)
+                del row_dims[row_idx]
+                row_idx += 1
+
+    def _iter_columns(self, report_data: dict, data: pd.DataFrame, start: int, stop: int) -> Iterator:
+        """Columnas de detalle por bloques de CHUNK_ROWS: (posición inicial, nombres, tipos, valores)."""
+        usd_values = report_data.get('usd_values')
+        valor_col = report_data.get('valor_col')
+        if usd_values is not None:
+            valores = usd_values / 100
+        elif valor_col:
+            valores = pd.to_numeric(data[valor_col], errors='coerce').astype(float)
+        else:
+            valores = np.zeros(len(data))
+        # Los nulos quedan en blanco (como las filas sin TRM)
+        feed = RowFeed(data, [report_data['nombre_col'], report_data['tipo_doc_col'], valores],
+                       na_value=None, chunk_rows=CHUNK_ROWS)
+        for lo, (nombres, tipos, valores_chunk) in feed.column_chunks(start, stop):
+            yield lo, nombres, tipos, valores_chunk
+
+    def _shard_total_cents(self, report_data: dict, data: pd.DataFrame, start: int, stop: int) -> int:
+        """Total de la partición en centavos enteros."""
+        usd_values = report_data.get('usd_values')
+        if usd_values is not None:
+            return int(np.nansum(usd_values[start:stop]))
+        valor_col = report_data.get('valor_col')
+        if not valor_col:
+            return 0
+        return sum_cents(to_cents(data[valor_col].iloc[start:stop]))
@@ -0,0 +1,117 @@
+from typing import Dict, List, NamedTuple, Optional
+
+from openpyxl.styles import Alignment, Border, Font, PatternFill
+from utils.date_utils import fecha_es
+from utils.money_utils import cents_to_float
+from data.currency_converter import has_foreign_currency, subtotal_rows, unconverted_amounts
+from .excel_styles import ExcelStyleManager
+
+USD_FORMAT = '"USD" #,##0'
+
+# Encabezado de la tabla de detalle del Anexo 1 (fila 8, columnas C..F)
+ANEXO_HEADERS = ('FECHA', 'NOMBRE CONTRAPARTE', 'TIPO DE DOCUMENTO', 'TOTAL')
+
+class CellSpec(NamedTuple):
+    """Valor y estilos de una celda fija del reporte."""
+    value: object
+    font: Font
+    alignment: Alignment
+    fill: Optional[PatternFill] = None
+    border: Optional[Border] = None
+    number_format: Optional[str] = None
+
+# {columna: celda} de una fila
+RowSpec = Dict[int, CellSpec]
+
+class RavagoLayout:
+    """
+    Filas fijas del reporte de Ravago, compartidas por los tres escritores.
+
+    El libro del monolito, ExcelSheetBuilder y ExcelStreamWriter (modo
+    write_only) escriben el mismo encabezado, la misma fila de SUBTOTAL y los
+    mismos subtotales por moneda; aquí se describen una sola vez como
+    {columna: CellSpec} y cada escritor solo decide cómo volcarlas.
+    """
+
+    def __init__(self, style_manager: Optional[ExcelStyleManager] = None):
+        self.style_manager = style_manager or ExcelStyleManager()
+
+    def header_info(self, report_data: dict) -> Dict[int, RowSpec]:
+        """Filas 3-5 de ambas hojas: fecha de corte y funcionarios."""
+        sm = self.style_manager
+        return {
+            3: {3: CellSpec(f"Fecha de corte del reporte: {fecha_es(report_data['fecha_dt'])}", sm.info_font, sm.left)},
+            4: {3: CellSpec(f"Funcionario que reporta: {report_data['rep_name']}", sm.info_font, sm.left)},
+            5: {3: CellSpec(f"Funcionario revisor: {report_data['rev_name']}", sm.info_font, sm.left)},
+        }
+
+    def anexo_headers(self) -> RowSpec:
+        """Fila 8 del Anexo 1: encabezado de la tabla de detalle."""
+        sm = self.style_manager
+        return {
+            col: CellSpec(title, sm.header_font, sm.center, sm.header_fill, sm.thin_border)
+            for col, title in zip(range(3, 7), ANEXO_HEADERS)
+        }
+
+    def subtotal_row(self, label: str, value: float) -> RowSpec:
+        """Fila de subtotal: C y D en blanco sin bordes, etiqueta en E y monto en F."""
+        sm = self.style_manager
+        return {
+            3: CellSpec('', sm.data_font, sm.left, sm.white_fill),
+            4: CellSpec('', sm.data_font, sm.left, sm.white_fill),
+            5: CellSpec(label, sm.total_font, sm.right, sm.total_fill, sm.thin_border),
+            6: CellSpec(value, sm.total_font, sm.right, sm.total_fill, sm.thin_border, USD_FORMAT),
+        }
+
+    def unconverted_note(self, subtotales: dict) -> RowSpec:
+        """Fila 15 de Facturación: montos que el total en USD no incluye por falta de TRM (vacía si no hay)."""
+        pending = unconverted_amounts(subtotales)
+        if not pending:
+            return {}
+        sm = self.style_manager
+        return {3: CellSpec(f"No incluye {pending} sin convertir (sin TRM); ver Anexo 1.", sm.info_font, sm.left)}
+
+    def currency_rows(self, subtotales: dict) -> List[RowSpec]:
+        """
+        Una fila por moneda bajo el SUBTOTAL (vacía si no hay montos en otra moneda).
+
+        Si ningún registro de la moneda tiene TRM, el monto queda como el texto
+        de subtotal_rows y sin formato USD. Si quedan montos sin convertir, una
+        última fila los muestra en su moneda original, ya que el SUBTOTAL en
+        USD no los incluye.
+        """
+        if not has_foreign_currency(subtotales):
+            return []
+        sm = self.style_manager
+        rows = []
+        for moneda, registros, subtotal, subtotal_usd in subtotal_rows(subtotales)[0]:
+            entry = subtotales[moneda]
+            label = CellSpec(f"{moneda}: {subtotal} ({registros})", sm.data_font, sm.right,
+                             sm.white_fill, sm.thin_border)
+            if entry['sin_tasa'] == entry['registros']:
+                amount = CellSpec(subtotal_usd, sm.data_font, sm.right, sm.white_fill, sm.thin_border)
+            else:
+                amount = CellSpec(cents_to_float(entry['usd_cents']), sm.data_font, sm.right,
+                                  sm.white_fill, sm.thin_border, USD_FORMAT)
+            rows.append({5: label, 6: amount})
+        pending = unconverted_amounts(subtotales)
+        if pending:
+            rows.append({
+                5: CellSpec("Sin convertir (sin TRM)", sm.total_font, sm.right, sm.white_fill, sm.thin_border),
+                6: CellSpec(pending, sm.data_font, sm.right, sm.white_fill, sm.thin_border),
+            })
+        return rows
+
+def write_row(ws, row: int, cells: RowSpec):
+    """Escribe una fila de celdas fijas en una hoja normal (no write_only)."""
+    for col, spec in cells.items():
+        cell = ws.cell(row=row, column=col)
+        cell.value = spec.value
+        cell.font = spec.font
+        cell.alignment = spec.alignment
+        if spec.fill is not None:
+            cell.fill = spec.fill
+        if spec.border is not None:
+            cell.border = spec.border
+        if spec.number_format is not None:
+            cell.number_format = spec.number_format
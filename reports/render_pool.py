@@ -0,0 +1,179 @@
+import importlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+import pandas as pd
+from utils.perf_trace import span
+from utils.worker_pool import WorkerPool, get_worker_pool
+
+# Particiones más chicas se generan en el proceso: el envío cuesta más que el render
+MIN_ROWS_ENV = 'RENDER_POOL_MIN_ROWS'
+DEFAULT_MIN_ROWS = 2_000
+
+# Clave en los metadatos del archivo Arrow para DataFrame.attrs (esquema de columnas)
+ATTRS_METADATA_KEY = b'dataframe_attrs'
+
+def _handoff_dir() -> Path:
+    """Directorio de los archivos de intercambio: /dev/shm si existe (memoria), si no el temporal."""
+    shm = Path('/dev/shm')
+    base = shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+    return base / 'facturacion_render'
+
+def _json_attrs(attrs: Dict) -> Dict:
+    """Attrs que viajan al worker: los serializables en JSON (los diagnósticos de carga se quedan)."""
+    result = {}
+    for key, value in attrs.items():
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        result[key] = value
+    return result
+
+def write_partition(data: pd.DataFrame, path: Path):
+    """
+    Escribe la partición como archivo Arrow IPC para que el worker la lea por memory-map.
+
+    Args:
+        data: Partición filtrada
+        path: Archivo de destino
+
+    Raises:
+        pyarrow.ArrowException, TypeError, ValueError: Si alguna columna no se puede
+            representar en Arrow (por ejemplo tipos mezclados en una columna object)
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(data, preserve_index=True)
+    metadata = dict(table.schema.metadata or {})
+    metadata[ATTRS_METADATA_KEY] = json.dumps(_json_attrs(data.attrs)).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+    with pa.OSFile(str(path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def read_partition(path: str) -> pd.DataFrame:
+    """Lee una partición escrita con write_partition (memory-map, sin copiar el archivo a memoria)."""
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    data = table.to_pandas()
+    attrs = (table.schema.metadata or {}).get(ATTRS_METADATA_KEY)
+    if attrs:
+        data.attrs.update(json.loads(attrs))
+    return data
+
+_instances: Dict[str, object] = {}
+
+def resolve_target(target: str) -> Callable:
+    """
+    Función de render a partir de 'modulo:funcion' o 'modulo:Clase.metodo'.
+
+    Las clases se instancian una vez por proceso (los generadores no guardan
+    estado entre reportes).
+    """
+    module_name, _, qualname = target.partition(':')
+    obj = importlib.import_module(module_name)
+    path = []
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+        path.append(part)
+        if isinstance(obj, type):
+            key = f"{module_name}:{'.'.join(path)}"
+            if key not in _instances:
+                _instances[key] = obj()
+            obj = _instances[key]
+    return obj
+
+def _render_in_worker(target: str, path: str, args: tuple) -> bytes:
+    """Tarea del worker: lee la partición, genera el documento y devuelve sus bytes."""
+    buffer = resolve_target(target)(read_partition(path), *args)
+    return buffer.getvalue()
+
+class RenderPool:
+    """
+    Procesos que generan los documentos fuera del servidor de Streamlit.
+
+    Armar un Word o un Excel es Python puro que retiene el GIL: generado en el
+    hilo de una sesión, frena los reruns de todas las demás. El pool manda el
+    render a los procesos de WorkerPool, que nacen con python-docx, openpyxl
+    y los generadores importados (y con el logo cargado). La partición no se
+    serializa con pickle: se escribe como archivo Arrow en /dev/shm y el
+    worker lo abre por memory-map. Solo vuelven los bytes del documento.
+    """
+
+    def __init__(self, min_rows: Optional[int] = None, workers: Optional[WorkerPool] = None):
+        if min_rows is None:
+            min_rows = int(os.environ.get(MIN_ROWS_ENV, DEFAULT_MIN_ROWS))
+        self.min_rows = min_rows
+        self.workers = workers or get_worker_pool()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers.enabled
+
+    def should_offload(self, n_rows: int) -> bool:
+        """Si una partición de n_rows filas se genera en el pool."""
+        return self.enabled and n_rows >= self.min_rows
+
+    def start(self) -> bool:
+        """Arranca los workers en segundo plano (ver WorkerPool.start)."""
+        return self.workers.start()
+
+    def render(self, target: str, data: pd.DataFrame, args: Sequence = (),
+               local: Optional[Callable] = None) -> BytesIO:
+        """
+        Genera un documento, en el pool si la partición es grande.
+
+        Args:
+            target: Función de render importable desde el worker ('modulo:funcion' o
+                'modulo:Clase.metodo'); recibe la partición seguida de `args`
+            data: Partición filtrada
+            args: Resto de los argumentos (deben poder serializarse con pickle)
+            local: Función equivalente para generar en el proceso (por defecto `target`)
+
+        Returns:
+            Buffer con el documento generado
+        """
+        local = local or resolve_target(target)
+        if not self.should_offload(len(data)):
+            return local(data, *args)
+
+        directory = _handoff_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{uuid.uuid4().hex}.arrow"
+        try:
+            try:
+                with span("render_pool.handoff", rows=len(data)):
+                    write_partition(data, path)
+            except Exception:
+                # Columnas que Arrow no representa: se genera como antes
+                return local(data, *args)
+
+            try:
+                with span("render_pool.render", rows=len(data)):
+                    future = self.workers.submit(_render_in_worker, target, str(path), tuple(args))
+                    return BytesIO(future.result())
+            except BrokenProcessPool:
+                self.workers.reset()
+                return local(data, *args)
+        finally:
+            path.unlink(missing_ok=True)
+
+_pool: Optional[RenderPool] = None
+_pool_lock = threading.Lock()
+
+def get_render_pool() -> RenderPool:
+    """Obtiene el pool de render compartido por el proceso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+        return _pool
@@ -1,19 +1,41 @@
 from io import BytesIO
-from datetime import datetime
-from typing import Tuple
+from typing import Iterator, List, Optional, Tuple
 import pandas as pd
-import unicodedata
-from .word_report_generator import WordReportGenerator
-from .excel_report_generator import ExcelReportGenerator
+from utils.admission import BATCH, INTERACTIVE, estimate_render_bytes, get_memory_budget
+from utils.file_utils import build_report_filename
+from utils.perf_trace import traced
+from .render_pool import get_render_pool
 
 class ReportFactory:
     """Factory para crear diferentes tipos de reportes."""
     
     def __init__(self):
-        self.word_generator = WordReportGenerator()
-        self.excel_generator = ExcelReportGenerator()
+        # Los generadores (python-docx / openpyxl) se importan al primer uso
+        self._word_generator = None
+        self._excel_generator = None
+        # Las particiones grandes se generan en procesos aparte (ver render_pool)
+        self.render_pool = get_render_pool()
+        self.memory_budget = get_memory_budget()
     
-    def create_report(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict) -> Tuple[BytesIO, str]:
+    @property
+    def word_generator(self):
+        """Generador Word, importado y creado al primer uso."""
+        if self._word_generator is None:
+            from .word_report_generator import WordReportGenerator
+            self._word_generator = WordReportGenerator()
+        return self._word_generator
+    
+    @property
+    def excel_generator(self):
+        """Generador Excel, importado y creado al primer uso."""
+        if self._excel_generator is None:
+            from .excel_report_generator import ExcelReportGenerator
+            self._excel_generator = ExcelReportGenerator()
+        return self._excel_generator
+    
+    @traced()
+    def create_report(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict,
+                      summary: Optional[dict] = None, priority: int = INTERACTIVE) -> Tuple[BytesIO, str]:
         """
         Crea un reporte según el tipo de empresa.
         
@@ -23,37 +45,76 @@ class ReportFactory:
             anio: Año del reporte
             mes: Mes del reporte
             funcionarios: Información de funcionarios
+            summary: Resumen de la partición en el SummaryCube (opcional)
+            priority: INTERACTIVE (lo pidió alguien en pantalla) o BATCH
             
         Returns:
             Tuple con el buffer del archivo y el tipo MIME
+            
+        Raises:
+            AdmissionError: Si la generación no entra en el presupuesto de memoria
         """
-        if empresa == "Ravago Americas LLC":
-            buffer = self.excel_generator.create_ravago_report(data, anio, mes, funcionarios)
-            mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        is_excel = empresa == "Ravago Americas LLC"
+        if is_excel:
+            from .excel_stream_writer import resolve_shard_rows
+            # Con el Anexo en varias hojas el libro se escribe en streaming: ocupa mucho menos
+            kind = 'xlsx_stream' if resolve_shard_rows(len(data)) is not None else 'xlsx'
         else:
-            buffer = self.word_generator.generate_report(data, empresa, anio, mes, funcionarios)
-            mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            kind = 'docx'
+        estimate = estimate_render_bytes(len(data), kind)
+        with self.memory_budget.reserve(estimate, priority, f"el reporte de {empresa}"):
+            if is_excel:
+                buffer = self.render_pool.render(
+                    'reports.excel_report_generator:ExcelReportGenerator.create_ravago_report',
+                    data, (anio, mes, funcionarios, summary),
+                    local=lambda *args: self.excel_generator.create_ravago_report(*args)
+                )
+                mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            else:
+                buffer = self.render_pool.render(
+                    'reports.word_report_generator:WordReportGenerator.generate_report',
+                    data, (empresa, anio, mes, funcionarios, summary),
+                    local=lambda *args: self.word_generator.generate_report(*args)
+                )
+                mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         
         return buffer, mime_type
     
-    def build_report_filename(self, empresa: str, date: datetime = None) -> str:
+    def create_batch_reports(self, data: pd.DataFrame, partitions: List[Tuple], funcionarios: dict,
+                             summary_cube=None) -> Iterator[Tuple[Tuple, BytesIO, str]]:
         """
-        Construye el nombre del archivo de reporte.
+        Crea los reportes de varias particiones (empresa, año, mes).
+        
+        Es la entrada para generar en lote fuera de la app (scripts, benchmarks):
+        con DataManager.get_partitions_to_rebuild() regenera solo las particiones
+        nuevas o modificadas. Las particiones con empresa, año o mes vacíos se
+        omiten (la validación de carga ya las informa).
         
         Args:
-            empresa: Nombre de la empresa
-            date: Fecha para el nombre del archivo
+            data: Datos combinados
+            partitions: Lista de tuplas (empresa, año, mes) a generar
+            funcionarios: Información de funcionarios
+            summary_cube: SummaryCube de los datos (opcional)
             
         Returns:
-            Nombre del archivo sugerido
+            Iterador de tuplas (partición, buffer, tipo MIME)
         """
-        date = date or datetime.now()
-        date_tag = date.strftime("%y%m%d")  # YYMMDD
-        empresa_tag = self._slug_empresa(empresa)
-        return f"{date_tag}-LV-{empresa_tag}-Facturación honorarios.docx"
+        if data.empty or not partitions:
+            return
+        
+        # dropna=False como PartitionHasher y SummaryCube: las mismas particiones en los tres
+        groups = data.groupby(['EMPRESA', 'AÑO ASIGNACION', 'MES ASIGNACION'], sort=False, dropna=False).indices
+        for partition in partitions:
+            if any(pd.isna(key) for key in partition):
+                continue
+            positions = groups.get(partition)
+            if positions is None:
+                continue
+            empresa, anio, mes = partition
+            summary = summary_cube.get(empresa, anio, mes) if summary_cube else None
+            buffer, mime_type = self.create_report(data.iloc[positions], empresa, anio, mes, funcionarios, summary,
+                                                   priority=BATCH)
+            yield partition, buffer, mime_type
     
-    def _slug_empresa(self, nombre: str) -> str:
-        """Convierte el nombre de empresa a un slug válido para archivos."""
-        nfkd = unicodedata.normalize("NFKD", nombre)
-        ascii_only = nfkd.encode("ascii", "ignore").decode("ascii")
-        return "".join(ch for ch in ascii_only if ch.isalnum())
+    # Nombre sugerido del reporte: una sola implementación, en utils.file_utils
+    build_report_filename = staticmethod(build_report_filename)
@@ -7,17 +7,8 @@ import pandas as pd
 from datetime import datetime
 
 # Usar importaciones directas para evitar conflictos
-from utils import format_currency, get_document_count
-
-def get_representative_price(data: pd.DataFrame) -> float:
-    """Precio representativo para GWealth."""
-    if 'VALOR' not in data.columns: 
-        return 0.0
-    serie = pd.to_numeric(data['VALOR'], errors='coerce').dropna()
-    if serie.empty: 
-        return 0.0
-    moda = serie.mode()
-    return float(moda.iloc[0]) if not moda.empty else float(serie.iloc[0])
+from utils.file_utils import get_logo_stream
+from utils.perf_trace import span
 
 from .word_styles import WordStyleManager
 from .word_table_builder import WordTableBuilder
@@ -29,9 +20,11 @@ class WordReportGenerator:
         self.style_manager = WordStyleManager()
         self.table_builder = WordTableBuilder()
     
-    def generate_report(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict) -> BytesIO:
+    def generate_report(self, data: pd.DataFrame, empresa: str, anio: int, mes: str, funcionarios: dict,
+                        summary: dict = None) -> BytesIO:
         """
         Genera el documento Word completo.
+        Si se pasa `summary` (fila del SummaryCube) los totales se toman de ahí.
         """
         doc = Document()
         
@@ -43,13 +36,14 @@ class WordReportGenerator:
         
         # Agregar contenido
         self._add_header(doc, mes, anio, empresa, funcionarios)
-        self._add_main_table(doc, data, empresa)
-        self._add_summary_tables(doc, data, empresa, anio, mes)
+        self._add_main_table(doc, data, empresa, summary)
+        self._add_summary_tables(doc, data, empresa, anio, mes, summary)
         self._add_footer(doc)
         
         # Guardar en buffer
         buffer = BytesIO()
-        doc.save(buffer)
+        with span("docx.save", rows=len(data)):
+            doc.save(buffer)
         buffer.seek(0)
         
         return buffer
@@ -68,7 +62,7 @@ class WordReportGenerator:
         p_logo = doc.add_paragraph()
         p_logo.alignment = WD_ALIGN_PARAGRAPH.RIGHT
         try:
-            p_logo.add_run().add_picture('assets/biu_logo.png', width=Inches(1.5))
+            p_logo.add_run().add_picture(get_logo_stream(), width=Inches(1.5))
         except FileNotFoundError:
             run = p_logo.add_run("[Logo BIU]")
             run.bold = True
@@ -95,15 +89,17 @@ class WordReportGenerator:
         run.bold = True
         run.font.color.rgb = RGBColor(0, 51, 102)  # COLOR_PRIMARY
     
-    def _add_main_table(self, doc: Document, data: pd.DataFrame, empresa: str):
+    def _add_main_table(self, doc: Document, data: pd.DataFrame, empresa: str, summary: dict = None):
         """Agrega la tabla principal de datos."""
         doc.add_paragraph()
-        self.table_builder.add_main_table(doc, data, empresa)
+        self.table_builder.add_main_table(doc, data, empresa, summary)
+        self.table_builder.add_currency_subtotals_table(doc, data, summary)
     
-    def _add_summary_tables(self, doc: Document, data: pd.DataFrame, empresa: str, anio: int, mes: str):
+    def _add_summary_tables(self, doc: Document, data: pd.DataFrame, empresa: str, anio: int, mes: str,
+                            summary: dict = None):
         """Agrega las tablas de resumen específicas por empresa."""
         doc.add_paragraph()
-        self.table_builder.add_summary_tables(doc, data, empresa, anio, mes)
+        self.table_builder.add_summary_tables(doc, data, empresa, anio, mes, summary)
     
     def _add_footer(self, doc: Document):
         """Agrega el pie de página."""
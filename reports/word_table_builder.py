@@ -3,17 +3,14 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_ALIGN_VERTICAL
 import pandas as pd
-from utils import format_currency
-
-def get_representative_price(data: pd.DataFrame) -> float:
-    """Precio representativo para GWealth."""
-    if 'VALOR' not in data.columns: 
-        return 0.0
-    serie = pd.to_numeric(data['VALOR'], errors='coerce').dropna()
-    if serie.empty: 
-        return 0.0
-    moda = serie.mode()
-    return float(moda.iloc[0]) if not moda.empty else float(serie.iloc[0])
+from utils.formatting_utils import column_widths, format_valor_column, use_fixed_layout
+from utils.money_utils import (
+    IVA_BASIS_POINTS, apply_rate, format_amount, format_cents, mode_cents, sum_cents
+)
+from data.currency_converter import (
+    currency_subtotals, has_foreign_currency, subtotal_rows, usd_cents, with_unconverted
+)
+from data.row_feed import RowFeed
 
 from .word_table_styles import WordTableStyles
 
@@ -23,7 +20,7 @@ class WordTableBuilder:
     def __init__(self):
         self.table_styles = WordTableStyles()
     
-    def add_main_table(self, doc: Document, data: pd.DataFrame, empresa: str):
+    def add_main_table(self, doc: Document, data: pd.DataFrame, empresa: str, summary: dict = None):
         """Añade la tabla principal de datos al documento."""
         required_cols = ['MES ASIGNACION', 'AÑO ASIGNACION', 'NOMBRE', 'MONEDA', 'VALOR']
         available_cols = [col for col in required_cols if col in data.columns]
@@ -33,34 +30,37 @@ class WordTableBuilder:
             return
 
         df_main = data[available_cols].copy()
+        if 'VALOR' in available_cols:
+            # Toda la columna se formatea en una sola pasada
+            df_main['VALOR'] = format_valor_column(data).to_numpy()
         table = doc.add_table(rows=1, cols=len(available_cols))
-        table.autofit = True
+        if use_fixed_layout(len(df_main)):
+            # Tablas grandes: anchos calculados de los datos y encabezado repetido por página
+            section = doc.sections[-1]
+            self.table_styles.set_fixed_layout(table, column_widths(
+                df_main, section.page_width - section.left_margin - section.right_margin))
+            self.table_styles.repeat_header_row(table.rows[0])
+        else:
+            table.autofit = True
 
         # Encabezados
         for i, name in enumerate(available_cols):
             table.cell(0, i).text = name
 
         # Filas de datos
-        for _, row in df_main.iterrows():
+        for row in RowFeed(df_main, available_cols):
             cells = table.add_row().cells
-            for i, col_name in enumerate(available_cols):
-                value = row[col_name]
-                if col_name == 'VALOR':
-                    try:
-                        cells[i].text = f"{float(value):,.2f}"
-                    except Exception:
-                        cells[i].text = str(value)
-                else:
-                    cells[i].text = str(value)
+            for i, value in enumerate(row):
+                cells[i].text = str(value)
 
         # Fila Total
-        self._add_total_row(table, data, empresa, available_cols)
+        self._add_total_row(table, data, empresa, available_cols, summary)
         
         # Aplicar estilos
         self.table_styles.style_table(table)
         self.table_styles.set_table_borders(table)
 
-    def _add_total_row(self, table, data: pd.DataFrame, empresa: str, available_cols: list):
+    def _add_total_row(self, table, data: pd.DataFrame, empresa: str, available_cols: list, summary: dict = None):
         """Agrega la fila de total a la tabla principal."""
         if 'VALOR' not in available_cols:
             return
@@ -80,23 +80,57 @@ class WordTableBuilder:
             p.paragraph_format.space_before = Pt(0)
             p.paragraph_format.space_after = Pt(0)
 
-        # Valor total
+        # Valor total (centavos enteros, se formatea al final)
         if empresa == "Gwealth":
-            total_unique = get_representative_price(data)
-            table.cell(total_row_idx, val_idx).text = f"{total_unique:,.2f}"
+            total_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+            total_text = format_amount(total_cents)
         else:
-            table.cell(total_row_idx, val_idx).text = f"{data['VALOR'].sum():,.2f}"
+            total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+            subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+            total_text = with_unconverted(format_amount(total_cents), subtotals)
+        table.cell(total_row_idx, val_idx).text = total_text
+
+    def add_currency_subtotals_table(self, doc: Document, data: pd.DataFrame, summary: dict = None):
+        """
+        Añade los subtotales por moneda y el total convertido a USD.
+        Solo se agrega si hay montos en una moneda distinta de USD.
+        """
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
+        if not has_foreign_currency(subtotals):
+            return
+
+        rows, total_usd = subtotal_rows(subtotals)
+        doc.add_paragraph()
+        table = doc.add_table(rows=1, cols=4)
+        for i, name in enumerate(["Moneda", "Registros", "Subtotal", "Subtotal USD (TRM)"]):
+            table.cell(0, i).text = name
+        for values in rows:
+            cells = table.add_row().cells
+            for i, value in enumerate(values):
+                cells[i].text = value
+
+        table.add_row()
+        total_row_idx = len(table.rows) - 1
+        merged = self.table_styles.merge_row_cells(table, total_row_idx, 0, 2)
+        merged.text = "Total convertido a USD"
+        merged.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        table.cell(total_row_idx, 3).text = with_unconverted(format_cents(total_usd), subtotals)
+
+        self.table_styles.style_table(table)
+        self.table_styles.set_table_borders(table)
 
-    def add_summary_tables(self, doc: Document, data: pd.DataFrame, empresa: str, anio: int, mes: str):
+    def add_summary_tables(self, doc: Document, data: pd.DataFrame, empresa: str, anio: int, mes: str,
+                           summary: dict = None):
         """Añade las tablas de resumen específicas por empresa."""
         if empresa == "Altimetrik":
-            self._add_altimetrik_table(doc, data, anio, mes)
+            self._add_altimetrik_table(doc, data, anio, mes, summary)
         elif empresa == "Gwealth":
-            self._add_gwealth_table(doc, data, anio, mes)
+            self._add_gwealth_table(doc, data, anio, mes, summary)
 
-    def _add_altimetrik_table(self, doc: Document, data: pd.DataFrame, anio: int, mes: str):
+    def _add_altimetrik_table(self, doc: Document, data: pd.DataFrame, anio: int, mes: str, summary: dict = None):
         """Agrega tabla específica para Altimetrik."""
-        total_valor_sum = data['VALOR'].sum() if 'VALOR' in data.columns else 0.0
+        total_cents = summary['total_cents'] if summary else sum_cents(usd_cents(data))
+        subtotals = summary['subtotales_moneda'] if summary else currency_subtotals(data)
         
         table = doc.add_table(rows=2, cols=3)
         table.cell(0, 0).text = "Mes"
@@ -104,17 +138,17 @@ class WordTableBuilder:
         table.cell(0, 2).text = "Total"
         table.cell(1, 0).text = mes
         table.cell(1, 1).text = f"Consultas en listas recibidas en {mes} de {anio}"
-        table.cell(1, 2).text = format_currency(total_valor_sum)
+        table.cell(1, 2).text = with_unconverted(format_cents(total_cents), subtotals)
 
         self.table_styles.style_table(table, has_total_row=False)
         self.table_styles.fix_table_layout_3cols(table)
         self.table_styles.set_table_borders(table)
 
-    def _add_gwealth_table(self, doc: Document, data: pd.DataFrame, anio: int, mes: str):
+    def _add_gwealth_table(self, doc: Document, data: pd.DataFrame, anio: int, mes: str, summary: dict = None):
         """Agrega tabla específica para Gwealth."""
-        precio_unico = get_representative_price(data)
-        iva = precio_unico * 0.19
-        total_con_iva = precio_unico + iva
+        # IVA calculado en centavos enteros con redondeo half-up
+        precio_cents = summary['precio_unico_cents'] if summary else mode_cents(usd_cents(data))
+        total_con_iva_cents = precio_cents + apply_rate(precio_cents, IVA_BASIS_POINTS)
 
         table = doc.add_table(rows=4, cols=3)
         
@@ -126,16 +160,16 @@ class WordTableBuilder:
         # Fila de contenido
         table.cell(1, 0).text = mes
         table.cell(1, 1).text = f"Consultas en listas recibidas en {mes} de {anio}"
-        table.cell(1, 2).text = format_currency(precio_unico)
+        table.cell(1, 2).text = format_cents(precio_cents)
 
         # Filas de totales con fusión
-        self._add_gwealth_total_rows(table, precio_unico, total_con_iva)
+        self._add_gwealth_total_rows(table, precio_cents, total_con_iva_cents)
         
         # Aplicar estilos
         self.table_styles.style_gwealth_table(table)
 
-    def _add_gwealth_total_rows(self, table, precio_unico: float, total_con_iva: float):
-        """Agrega las filas de total para Gwealth."""
+    def _add_gwealth_total_rows(self, table, precio_cents: int, total_con_iva_cents: int):
+        """Agrega las filas de total para Gwealth (montos en centavos)."""
         # Fila TOTAL
         merged_total = self.table_styles.merge_row_cells(table, 2, 0, 1)
         merged_total.text = "TOTAL"
@@ -143,7 +177,7 @@ class WordTableBuilder:
             p.alignment = WD_ALIGN_PARAGRAPH.CENTER
             p.paragraph_format.space_before = Pt(0)
             p.paragraph_format.space_after = Pt(0)
-        table.cell(2, 2).text = format_currency(precio_unico)
+        table.cell(2, 2).text = format_cents(precio_cents)
 
         # Fila TOTAL CON IVA
         merged_total_iva = self.table_styles.merge_row_cells(table, 3, 0, 1)
@@ -152,4 +186,4 @@ class WordTableBuilder:
             p.alignment = WD_ALIGN_PARAGRAPH.CENTER
             p.paragraph_format.space_before = Pt(0)
             p.paragraph_format.space_after = Pt(0)
-        table.cell(3, 2).text = format_currency(total_con_iva)
+        table.cell(3, 2).text = format_cents(total_con_iva_cents)
@@ -103,6 +103,26 @@ class WordTableStyles:
             row.height = Inches(0.28)
             row.height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
     
+    def set_fixed_layout(self, table, widths):
+        """
+        Layout fijo con anchos explícitos en tblGrid: Word no re-mide las celdas al abrir.
+        Se llama antes de agregar filas, que toman su ancho de la grilla.
+        """
+        table.autofit = False
+        tblW = table._tbl.tblPr.find(qn('w:tblW'))
+        tblW.set(qn('w:type'), 'dxa')
+        tblW.set(qn('w:w'), str(sum(widths) // 635))  # EMU -> twips
+        for grid_col, width in zip(table._tbl.tblGrid.gridCol_lst, widths):
+            grid_col.w = width
+        for cell, width in zip(table.rows[0].cells, widths):
+            cell.width = width
+    
+    def repeat_header_row(self, row):
+        """Marca la fila como encabezado: Word la repite en cada página."""
+        tblHeader = OxmlElement('w:tblHeader')
+        tblHeader.set(qn('w:val'), 'true')
+        row._tr.get_or_add_trPr().append(tblHeader)
+    
     def set_table_borders(self, table, color="000000", size=8, val="single"):
         """Establece bordes para toda la tabla."""
         tbl = table._tbl
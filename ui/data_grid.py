@@ -0,0 +1,119 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from typing import Optional
+from data.data_grid import DataGrid
+
+PAGE_SIZES = [25, 50, 100, 200]
+MODE_SUMMARY = "Resumen por empresa/año/mes"
+MODE_DETAIL = "Detalle paginado"
+
+def _reset_page():
+    """Vuelve a la primera página cuando cambia la búsqueda, el orden o el tamaño."""
+    st.session_state.grid_page = 1
+
+def _row_positions(grid: DataGrid, df_filtered: pd.DataFrame, filter_key: tuple, partition: Optional[tuple],
+                   search_text: str, column: Optional[str], ascending: bool) -> np.ndarray:
+    """
+    Posiciones del detalle (partición, búsqueda y orden), reutilizadas mientras no cambie el criterio.
+
+    Se calculan una vez por (filtros, partición, búsqueda, columna, sentido)
+    sobre los datos cargados; cambiar de página solo corta otra página. Se
+    guarda solo el último criterio, y una carga nueva lo descarta.
+    """
+    # Se compara la referencia a los datos cargados (no su id), así no se confunden con otros
+    source = st.session_state.get("df_combined")
+    key = (filter_key, partition, search_text, column, ascending)
+    cached = st.session_state.get("grid_rows_cache")
+    if cached is None or cached['source'] is not source or cached['key'] != key:
+        positions = grid.row_positions(df_filtered, partition, search_text, column, ascending)
+        cached = {'source': source, 'key': key, 'positions': positions}
+        st.session_state.grid_rows_cache = cached
+    return cached['positions']
+
+def _drill_down(partitions):
+    """Pasa al detalle de la partición elegida en el resumen."""
+    # Se copia fuera de la clave del widget, que se descarta al ocultarlo
+    st.session_state.grid_detail_partition = partitions[st.session_state.grid_partition]
+    st.session_state.grid_mode = MODE_DETAIL
+    st.session_state.grid_page = 1
+
+@st.fragment
+def render_data_grid(df_filtered: pd.DataFrame, cube_rows: Optional[pd.DataFrame] = None,
+                     filter_key: Optional[tuple] = None):
+    """
+    Renderiza la tabla de datos filtrados sin enviar el DataFrame completo al navegador.
+
+    Por defecto muestra un resumen por empresa/año/mes; el detalle envía solo
+    una página, con búsqueda y orden resueltos en el servidor. Es un fragmento:
+    cambiar de página no re-ejecuta el resto de la aplicación.
+
+    Args:
+        df_filtered: Datos filtrados
+        cube_rows: Filas del SummaryCube para la misma selección; si se pasan,
+            el resumen no se recalcula sobre df_filtered
+        filter_key: Selección (empresa, año, mes) que produjo df_filtered; con ella
+            la búsqueda y el orden del detalle se reutilizan entre reruns (sin ella se
+            recalculan cada vez)
+    """
+    grid = DataGrid()
+
+    mode = st.radio("Vista", [MODE_SUMMARY, MODE_DETAIL], horizontal=True, key="grid_mode")
+
+    if cube_rows is not None:
+        summary = grid.summarize_cube(cube_rows)
+    else:
+        summary = grid.summarize(df_filtered)
+
+    if mode == MODE_SUMMARY:
+        st.dataframe(summary, hide_index=True)
+
+        partitions = [None] + list(zip(
+            summary['EMPRESA'], summary['AÑO ASIGNACION'], summary['MES ASIGNACION']
+        ))
+        st.selectbox("Ver detalle de", options=range(len(partitions)),
+                     format_func=lambda i: "Todas" if partitions[i] is None else " · ".join(map(str, partitions[i])),
+                     key="grid_partition", on_change=_drill_down, args=(partitions,))
+        return
+
+    # Partición elegida desde el resumen; se ignora si ya no está en los datos filtrados
+    partition = st.session_state.get("grid_detail_partition")
+    if partition is not None and partition in set(zip(
+        summary['EMPRESA'], summary['AÑO ASIGNACION'], summary['MES ASIGNACION']
+    )):
+        st.caption(f"Detalle de {partition[0]} · {partition[1]} · {partition[2]}")
+    else:
+        partition = None
+
+    col_search, col_sort, col_order, col_size = st.columns([3, 2, 1, 1])
+    with col_search:
+        search_text = st.text_input("Buscar", key="grid_search", on_change=_reset_page)
+    with col_sort:
+        sort_column = st.selectbox("Ordenar por", options=[None] + grid.visible_columns(df_filtered),
+                                   format_func=lambda c: "(original)" if c is None else c,
+                                   key="grid_sort", on_change=_reset_page)
+    with col_order:
+        ascending = st.selectbox("Orden", options=[True, False],
+                                 format_func=lambda a: "Asc" if a else "Desc",
+                                 key="grid_ascending", on_change=_reset_page)
+    with col_size:
+        page_size = st.selectbox("Filas", options=PAGE_SIZES, key="grid_page_size", on_change=_reset_page)
+
+    # Búsqueda y orden resueltos en el servidor, antes de paginar
+    if filter_key is None:
+        positions = grid.row_positions(df_filtered, partition, search_text, sort_column, ascending)
+    else:
+        positions = _row_positions(grid, df_filtered, filter_key, partition, search_text, sort_column, ascending)
+
+    total_rows = len(positions)
+    total_pages = grid.page_count(total_rows, page_size)
+    if st.session_state.get("grid_page", 1) > total_pages:
+        st.session_state.grid_page = total_pages
+    page_number = st.number_input("Página", min_value=1, max_value=total_pages, step=1, key="grid_page")
+
+    # Se envía solo la página solicitada
+    page_rows = df_filtered.iloc[positions[grid.page_slice(total_rows, page_number, page_size)]]
+    st.dataframe(page_rows[grid.visible_columns(page_rows)])
+
+    start = (page_number - 1) * page_size
+    st.caption(f"Filas {min(start + 1, total_rows)}–{start + len(page_rows)} de {total_rows}")
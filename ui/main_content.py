@@ -1,9 +1,16 @@
 import streamlit as st
+from datetime import date
 from typing import Dict, Any
 from data.data_manager import DataManager
 from reports.report_factory import ReportFactory
+from utils.admission import AdmissionError
+from utils.load_diagnostics import LoadDiagnostics
 from preview.preview_generator import PreviewGenerator
-from utils.file_utils import safe_filename, ensure_extension
+from utils.file_utils import build_report_filename, safe_filename, ensure_extension
+from ui.sidebar import get_funcionarios
+from ui.data_grid import render_data_grid
+from ui.perf_panel import render_perf_panel
+from utils import perf_trace
 
 def render_main_content(data_manager: DataManager, config: Dict[str, Any]):
     """
@@ -13,10 +20,21 @@ def render_main_content(data_manager: DataManager, config: Dict[str, Any]):
         data_manager: Gestor de datos
         config: Configuración de filtros y reporte
     """
+    try:
+        _render_content(data_manager, config)
+    finally:
+        # Cierra el rerun que abrió render_sidebar (con PERF_TRACE=1)
+        run = perf_trace.end_run()
+    render_perf_panel(run)
+
+def _render_content(data_manager: DataManager, config: Dict[str, Any]):
+    """Filtra los datos y dibuja la tabla, la previsualización y los controles."""
     if not data_manager.is_data_loaded():
         st.info("Esperando la carga de archivos Excel...")
         return
     
+    _render_load_diagnostics(data_manager.get_load_diagnostics())
+    
     # Filtrar datos
     df_filtered = data_manager.filter_data(
         config['empresa'], 
@@ -24,26 +42,42 @@ def render_main_content(data_manager: DataManager, config: Dict[str, Any]):
         config['mes']
     )
     
-    # Mostrar datos filtrados
-    _render_filtered_data(df_filtered)
+    # Mostrar datos filtrados; el resumen sale del cubo precalculado
+    cube_rows = data_manager.get_summary_cube().select(config['empresa'], config['anio'], config['mes'])
+    _render_filtered_data(df_filtered, cube_rows, (config['empresa'], config['anio'], config['mes']))
     
-    # Mostrar previsualización
-    _render_preview(df_filtered, config)
-    
-    # Mostrar controles de generación y descarga
+    # Previsualización y controles son fragmentos: sus widgets solo
+    # re-ejecutan su propia sección, reutilizando df_filtered ya calculado
+    _render_preview(data_manager, df_filtered, config)
     _render_report_controls(data_manager, df_filtered, config)
 
-def _render_filtered_data(df_filtered):
+def _render_load_diagnostics(diagnostics: LoadDiagnostics):
+    """Avisa de los problemas encontrados al cargar (lectura y validación), con la tabla de filas afectadas."""
+    if not len(diagnostics):
+        return
+    st.warning(f"Se encontraron {len(diagnostics)} problema(s) en los datos cargados; "
+               f"revise el diagnóstico antes de generar los reportes.")
+    with st.expander("Ver diagnóstico de datos"):
+        st.dataframe(diagnostics.summary(), hide_index=True)
+        st.dataframe(diagnostics.table(), hide_index=True)
+
+def _render_filtered_data(df_filtered, cube_rows=None, filter_key=None):
     """Renderiza la tabla de datos filtrados."""
     st.header("Vista Previa de Datos Filtrados")
     
     if not df_filtered.empty:
-        st.dataframe(df_filtered)
+        render_data_grid(df_filtered, cube_rows, filter_key)
     else:
         st.warning("No se encontraron datos con los filtros seleccionados.")
 
-def _render_preview(df_filtered, config):
-    """Renderiza la previsualización del reporte."""
+@st.fragment
+def _render_preview(data_manager: DataManager, df_filtered, config):
+    """
+    Renderiza la previsualización del reporte.
+    
+    Los cambios en los funcionarios no re-ejecutan esta sección; el botón
+    de actualizar la vuelve a dibujar con los valores actuales.
+    """
     st.header("Previsualización del Reporte")
     
     empresa = config['empresa']
@@ -51,23 +85,46 @@ def _render_preview(df_filtered, config):
     mes = config['mes']
     
     if empresa != "Todas" and anio != "Todos" and mes != "Todos" and not df_filtered.empty:
+        st.button("🔄 Actualizar previsualización", key="refresh_preview")
+        
         with st.spinner("Generando previsualización..."):
-            funcionarios = {
-                'reporta': config['func_reporta'], 
-                'revisor': config['func_revisor']
-            }
+            funcionarios = get_funcionarios(empresa)
             
-            preview_generator = PreviewGenerator()
-            preview_html = preview_generator.generate_preview_html(
-                df_filtered, empresa, anio, mes, funcionarios
-            )
+            # Reutilizar la previsualización si la partición no cambió
+            partition = (empresa, anio, mes)
+            partition_hash = data_manager.get_partition_hash(empresa, anio, mes)
+            params = (funcionarios['reporta'], funcionarios['revisor'])
+            cache = data_manager.get_partition_cache()
             
+            preview_html = cache.get('preview', partition, partition_hash, params)
+            if preview_html is None:
+                preview_generator = PreviewGenerator()
+                preview_html = preview_generator.generate_preview_html(
+                    df_filtered, empresa, anio, mes, funcionarios,
+                    summary=data_manager.get_partition_summary(empresa, anio, mes)
+                )
+                cache.put('preview', partition, partition_hash, preview_html, params)
+            
+            _warn_missing_rates(data_manager.get_partition_summary(empresa, anio, mes))
             st.components.v1.html(preview_html, height=650, scrolling=True)
     else:
         st.warning("Por favor, seleccione una Empresa, Año y Mes específicos para generar un reporte.")
 
+def _warn_missing_rates(summary):
+    """Avisa si hay registros en otra moneda sin TRM en la tabla de tasas."""
+    sin_tasa = sum(s['sin_tasa'] for s in (summary or {}).get('subtotales_moneda', {}).values())
+    if sin_tasa:
+        st.warning(f"{sin_tasa} registro(s) en otra moneda no tienen TRM en la tabla de tasas "
+                   f"(assets/trm_rates.csv) y no se incluyen en el total en USD.")
+
+@st.fragment
 def _render_report_controls(data_manager: DataManager, df_filtered, config):
-    """Renderiza los controles de generación y descarga de reportes."""
+    """
+    Renderiza los controles de generación y descarga de reportes.
+    
+    Es un fragmento: editar el nombre del archivo o descargar no vuelve
+    a filtrar ni a dibujar la previsualización.
+    """
     empresa = config['empresa']
     anio = config['anio']
     mes = config['mes']
@@ -93,29 +150,36 @@ def _render_report_controls(data_manager: DataManager, df_filtered, config):
 
 def _get_suggested_filename(empresa: str) -> str:
     """Obtiene el nombre de archivo sugerido según la empresa."""
-    report_factory = ReportFactory()
-    
     if empresa == "Ravago Americas LLC":
-        return report_factory.build_report_filename(empresa).replace(".docx", ".xlsx")
+        return build_report_filename(empresa).replace(".docx", ".xlsx")
     else:
-        return report_factory.build_report_filename(empresa)
+        return build_report_filename(empresa)
 
 def _generate_report(data_manager: DataManager, df_filtered, config, file_name_input: str, suggested_name: str):
     """Genera el reporte según la configuración."""
     empresa = config['empresa']
     anio = config['anio']
     mes = config['mes']
-    funcionarios = {
-        'reporta': config['func_reporta'], 
-        'revisor': config['func_revisor']
-    }
+    funcionarios = get_funcionarios(empresa)
+    
+    # El documento incluye la fecha de corte, por eso la fecha forma parte de la clave
+    partition = (empresa, anio, mes)
+    partition_hash = data_manager.get_partition_hash(empresa, anio, mes)
+    params = (funcionarios['reporta'], funcionarios['revisor'], date.today())
+    cache = data_manager.get_partition_cache()
     
     with st.spinner("Creando documento..."):
         try:
-            report_factory = ReportFactory()
-            buffer, mime_type = report_factory.create_report(
-                df_filtered, empresa, anio, mes, funcionarios
-            )
+            # La caché guarda el handle del archivo en disco, no sus bytes
+            handle = cache.get('report', partition, partition_hash, params)
+            if not data_manager.is_download_available(handle):
+                report_factory = ReportFactory()
+                buffer, mime_type = report_factory.create_report(
+                    df_filtered, empresa, anio, mes, funcionarios,
+                    summary=data_manager.get_partition_summary(empresa, anio, mes)
+                )
+                handle = data_manager.spool_download(buffer, mime_type)
+                cache.put('report', partition, partition_hash, handle, params)
             
             # Determinar nombre final del archivo
             ext = ".xlsx" if empresa == "Ravago Americas LLC" else ".docx"
@@ -123,10 +187,13 @@ def _generate_report(data_manager: DataManager, df_filtered, config, file_name_i
             final_name = ensure_extension(safe_filename(raw_name), ext)
             
             # Guardar datos para descarga
-            data_manager.set_download_data(buffer.getvalue(), final_name, mime_type)
+            data_manager.set_download_handle(handle, final_name)
             
             st.success(f"¡Reporte generado! Nombre: **{final_name}**")
             
+        except AdmissionError as e:
+            # Sin memoria para el reporte: el mensaje ya dice qué hacer
+            st.error(str(e))
         except Exception as e:
             st.error(f"Ocurrió un error al generar el reporte: {e}")
 
@@ -135,11 +202,12 @@ def _render_download_button(data_manager: DataManager):
     if not data_manager.has_download_data():
         return
     
-    bytes_data, filename, mime_type = data_manager.get_download_data()
+    read_file, filename, mime_type = data_manager.get_download_data()
     
+    # Datos diferidos: el archivo se lee del disco solo al pulsar el botón
     st.download_button(
         label=f"📥 Descargar {filename}",
-        data=bytes_data,
+        data=read_file,
         file_name=filename,
         mime=mime_type,
         key=f"download_{filename}"
@@ -0,0 +1,33 @@
+import streamlit as st
+from typing import Optional
+from utils.perf_trace import LOG_PATH, TraceRun
+
+def render_perf_panel(run: Optional[TraceRun]):
+    """
+    Muestra en la barra lateral el desglose de tiempos del último rerun.
+
+    Solo se dibuja con la instrumentación activa (PERF_TRACE=1).
+
+    Args:
+        run: Rerun cerrado con perf_trace.end_run() (None si está apagada)
+    """
+    if run is None:
+        return
+
+    with st.sidebar:
+        with st.expander(f"⏱️ Tiempos del último rerun ({run.total_ms:,.0f} ms)"):
+            records = run.breakdown()
+            # Con PERF_MEMORY=1 cada etapa trae además su pico de memoria
+            memory = any('peak_bytes' in r for r in records)
+            lines = ["| Etapa | ms | Filas |" + (" Pico MB |" if memory else ""),
+                     "|---|---:|---:|" + ("---:|" if memory else "")]
+            for record in records:
+                indent = "&nbsp;&nbsp;" * (record['depth'] - 1)
+                rows = record.get('rows_out', record.get('rows_in', record.get('rows', "")))
+                line = f"| {indent}{record['span']} | {record['duration_ms']:,.1f} | {rows} |"
+                if memory:
+                    peak = record.get('peak_bytes')
+                    line += f" {peak / 2**20:,.1f} |" if peak is not None else " |"
+                lines.append(line)
+            st.markdown("\n".join(lines), unsafe_allow_html=True)
+            st.caption(f"Log: {LOG_PATH}")
@@ -1,6 +1,8 @@
 import streamlit as st
 from typing import Dict, Any
 from data.data_manager import DataManager
+from reports.render_pool import get_render_pool
+from utils import perf_trace
 
 def render_sidebar(data_manager: DataManager) -> Dict[str, Any]:
     """
@@ -12,24 +14,29 @@ def render_sidebar(data_manager: DataManager) -> Dict[str, Any]:
     Returns:
         Diccionario con la configuración seleccionada
     """
+    # La barra lateral es lo primero del rerun; render_main_content lo cierra
+    perf_trace.begin_run("rerun")
+    
     with st.sidebar:
         # Sección 1: Cargar archivos
         st.header("1. Cargar Archivos")
         uploaded_files = st.file_uploader(
-            "Seleccione uno o más archivos Excel", 
-            type=["xlsx", "xls"], 
+            "Seleccione uno o más archivos Excel (o un .zip con varios)", 
+            type=["xlsx", "xls", "zip"], 
             accept_multiple_files=True
         )
         
         # Cargar archivos si se proporcionaron
         if uploaded_files:
             data_manager.load_files(uploaded_files)
+            # Con datos cargados se arrancan los workers de render en segundo plano
+            get_render_pool().start()
         
         # Sección 2: Filtros
         config = _render_filters(data_manager)
         
-        # Sección 3: Información del reporte
-        config.update(_render_report_info(config.get('empresa')))
+        # Sección 3: Información del reporte (se re-ejecuta por separado)
+        _render_report_info(config.get('empresa'))
         
         return config
 
@@ -79,21 +86,36 @@ def _render_filters(data_manager: DataManager) -> Dict[str, Any]:
         'mes': mes_sel
     }
 
-def _render_report_info(empresa: str) -> Dict[str, Any]:
-    """Renderiza la sección de información del reporte."""
+@st.fragment
+def _render_report_info(empresa: str):
+    """
+    Renderiza la sección de información del reporte.
+    
+    Es un fragmento: escribir en estos campos solo re-ejecuta esta sección.
+    Los valores quedan en el estado de sesión y se leen con get_funcionarios().
+    """
     st.header("3. Información del Reporte")
     
     if empresa == "Ravago Americas LLC":
         st.info("Para Ravago, los campos de funcionarios se llenarán manualmente en el Excel generado.")
-        return {
-            'func_reporta': "",
-            'func_revisor': ""
-        }
     else:
-        func_reporta = st.text_input("Funcionario que reporta", "")
-        func_revisor = st.text_input("Funcionario revisor", "")
+        st.text_input("Funcionario que reporta", key="func_reporta")
+        st.text_input("Funcionario revisor", key="func_revisor")
+
+def get_funcionarios(empresa: str) -> Dict[str, str]:
+    """
+    Obtiene los funcionarios ingresados en la barra lateral.
+    
+    Args:
+        empresa: Empresa seleccionada
         
-        return {
-            'func_reporta': func_reporta,
-            'func_revisor': func_revisor
-        }
+    Returns:
+        Diccionario con 'reporta' y 'revisor'
+    """
+    if empresa == "Ravago Americas LLC":
+        return {'reporta': "", 'revisor': ""}
+    
+    return {
+        'reporta': st.session_state.get('func_reporta', ""),
+        'revisor': st.session_state.get('func_revisor', "")
+    }
@@ -0,0 +1,285 @@
+import itertools
+import os
+import re
+import threading
+import time
+import zipfile
+from io import BytesIO
+from typing import Dict, List, Optional
+from .workbook_reader import expand_uploads
+
+# Presupuesto de memoria del proceso para datasets y trabajos (MB); por defecto una
+# fracción del límite del contenedor (cgroup) o de la memoria física
+BUDGET_ENV = 'MEMORY_BUDGET_MB'
+BUDGET_FRACTION = 0.6
+# Memoria supuesta si no se puede consultar la del equipo (sin cgroup, sysconf ni psutil)
+FALLBACK_MEMORY_BYTES = 4 * 1024 ** 3
+
+# Prioridades: lo que una persona espera en pantalla pasa antes que los lotes
+INTERACTIVE = 0
+BATCH = 1
+
+# Espera máxima en la cola antes de rechazar, por prioridad
+WAIT_SECONDS = {INTERACTIVE: 60, BATCH: 15 * 60}
+
+# Costos medidos con tracemalloc (pico durante la operación)
+PARSE_BYTES_PER_CELL = 100        # read_excel + concat + columnas derivadas
+FILE_EXPANSION = 20               # xlsx sin dimensión (o .xls): bytes del archivo x 20
+RENDER_BYTES_PER_ROW = {'docx': 2_500, 'xlsx': 3_500, 'xlsx_stream': 1_000}   # xlsx_stream: Anexo en varias hojas
+RENDER_BASE_BYTES = 4 * 1024 * 1024
+
+_MB = 1024 * 1024
+
+class AdmissionError(RuntimeError):
+    """El trabajo no se admitió: supera el presupuesto o no hubo memoria libre a tiempo."""
+
+def _cgroup_limit() -> Optional[int]:
+    """Límite de memoria del contenedor (cgroup v2 o v1), o None si no hay."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+def _physical_memory() -> Optional[int]:
+    """RAM del equipo: sysconf (Unix) o psutil si está instalado (Windows); None si no se puede saber."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return int(psutil.virtual_memory().total)
+
+def default_budget() -> int:
+    """
+    Presupuesto en bytes: MEMORY_BUDGET_MB, o BUDGET_FRACTION del límite del contenedor o de la RAM
+    (FALLBACK_MEMORY_BYTES si no se puede consultar ninguno).
+    """
+    if os.environ.get(BUDGET_ENV):
+        return int(float(os.environ[BUDGET_ENV]) * _MB)
+    limit = _cgroup_limit() or _physical_memory() or FALLBACK_MEMORY_BYTES
+    return int(limit * BUDGET_FRACTION)
+
+def _column_number(letters: str) -> int:
+    """'A' -> 1, 'AB' -> 28."""
+    number = 0
+    for char in letters:
+        number = number * 26 + ord(char) - ord('A') + 1
+    return number
+
+def sheet_dimensions(payload: bytes) -> Optional[tuple]:
+    """
+    Filas y columnas de la primera hoja de un xlsx, leídas de su etiqueta <dimension>.
+
+    Solo se descomprimen el workbook.xml y los primeros KB de la hoja, no las celdas.
+
+    Args:
+        payload: Bytes del archivo
+
+    Returns:
+        (filas, columnas), o None si no es un xlsx o la hoja no declara su dimensión
+    """
+    try:
+        with zipfile.ZipFile(BytesIO(payload)) as archive:
+            workbook = archive.read('xl/workbook.xml').decode('utf-8', 'ignore')
+            rels = archive.read('xl/_rels/workbook.xml.rels').decode('utf-8', 'ignore')
+            sheet = re.search(r'<(?:\w+:)?sheet\b[^>]*\br:id="([^"]+)"', workbook)
+            if sheet is None:
+                return None
+            target = re.search(rf'<Relationship\b[^>]*Id="{re.escape(sheet.group(1))}"[^>]*Target="([^"]+)"', rels) \
+                or re.search(rf'<Relationship\b[^>]*Target="([^"]+)"[^>]*Id="{re.escape(sheet.group(1))}"', rels)
+            if target is None:
+                return None
+            name = target.group(1).lstrip('/')
+            name = name if name.startswith('xl/') else f"xl/{name}"
+            with archive.open(name) as f:
+                head = f.read(4096).decode('utf-8', 'ignore')
+    except (zipfile.BadZipFile, KeyError, OSError):
+        return None
+
+    ref = re.search(r'<(?:\w+:)?dimension\b[^>]*ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"', head)
+    if ref is None or ref.group(3) is None:
+        return None
+    rows = int(ref.group(4)) - int(ref.group(2)) + 1
+    cols = _column_number(ref.group(3)) - _column_number(ref.group(1)) + 1
+    return rows, cols
+
+def estimate_upload_bytes(uploaded_files: List) -> int:
+    """
+    Memoria estimada para leer y combinar los archivos subidos.
+
+    Usa la dimensión declarada de la primera hoja de cada libro (filas x columnas)
+    y, si no está, el tamaño del libro por FILE_EXPANSION. Los libros de un .zip
+    no se descomprimen para estimar: cuentan por el tamaño que declara el zip
+    (x FILE_EXPANSION). Así un zip que se expande más de lo que admite el
+    presupuesto se rechaza en reserve() antes de descomprimir nada, y al leerlo
+    ningún miembro puede pasar de su tamaño declarado (ver workbook_reader).
+
+    Args:
+        uploaded_files: Archivos subidos
+
+    Returns:
+        Bytes estimados (pico)
+    """
+    total = 0
+    sources, _ = expand_uploads(uploaded_files)
+    for source in sources:
+        if source.size is not None:
+            total += source.size * FILE_EXPANSION
+            continue
+        try:
+            payload = source.read()
+        except Exception:
+            continue  # el error se informa al leer el libro
+        dims = sheet_dimensions(payload)
+        if dims is not None:
+            total += dims[0] * dims[1] * PARSE_BYTES_PER_CELL
+        else:
+            total += len(payload) * FILE_EXPANSION
+    return total
+
+def estimate_render_bytes(n_rows: int, kind: str) -> int:
+    """Memoria estimada para generar un documento ('docx', 'xlsx' o 'xlsx_stream') de n_rows filas."""
+    return RENDER_BASE_BYTES + n_rows * RENDER_BYTES_PER_ROW[kind]
+
+class Reservation:
+    """Memoria reservada en el presupuesto; se libera con release() o al salir del `with`."""
+
+    def __init__(self, budget: 'MemoryBudget', nbytes: int, label: str):
+        self.budget = budget
+        self.nbytes = nbytes
+        self.label = label
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.budget._release(self)
+
+    def __enter__(self) -> 'Reservation':
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class MemoryBudget:
+    """
+    Presupuesto global de memoria para cargas y generaciones.
+
+    Cada carga o generación reserva antes de empezar lo que estima que va a
+    ocupar; los datasets cargados mantienen su reserva mientras alguna sesión
+    los usa. Si no hay lugar el trabajo espera en una cola (primero los
+    interactivos, luego los lotes, cada uno en orden de llegada) y se rechaza
+    con un mensaje si no entra en WAIT_SECONDS o si por sí solo supera el
+    presupuesto. Así el contenedor se degrada con esperas y avisos en lugar de
+    terminar por falta de memoria.
+    """
+
+    def __init__(self, limit_bytes: Optional[int] = None):
+        self.limit = limit_bytes if limit_bytes is not None else default_budget()
+        self._used = 0
+        self._active: Dict[int, Reservation] = {}
+        self._waiting: List[tuple] = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    def reserve(self, nbytes: int, priority: int = INTERACTIVE, label: str = "el trabajo",
+                timeout: Optional[float] = None) -> Reservation:
+        """
+        Reserva memoria, esperando en la cola si no hay lugar.
+
+        Args:
+            nbytes: Bytes estimados
+            priority: INTERACTIVE o BATCH
+            label: Descripción del trabajo para los mensajes ('la carga de archivos')
+            timeout: Espera máxima en segundos (por defecto WAIT_SECONDS de la prioridad)
+
+        Returns:
+            La reserva (usable con `with`)
+
+        Raises:
+            AdmissionError: Si el trabajo supera el presupuesto o no hubo lugar a tiempo
+        """
+        if nbytes > self.limit:
+            raise AdmissionError(
+                f"No se puede procesar {label}: necesita unos {nbytes / _MB:,.0f} MB y el servidor "
+                f"admite hasta {self.limit / _MB:,.0f} MB. Divida los archivos o el período."
+            )
+
+        timeout = WAIT_SECONDS.get(priority, WAIT_SECONDS[BATCH]) if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        ticket = (priority, next(self._order))
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while not (min(self._waiting) == ticket and self._used + nbytes <= self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise AdmissionError(
+                            f"El servidor está ocupado: {label} necesita unos "
+                            f"{nbytes / _MB:,.0f} MB y hay {max(self.limit - self._used, 0) / _MB:,.0f} MB "
+                            f"libres. Intente de nuevo en unos minutos."
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+            return self._add(nbytes, label)
+
+    def hold(self, nbytes: int, label: str = "") -> Reservation:
+        """
+        Registra memoria que ya está ocupada (por ejemplo un dataset cargado), sin esperar.
+
+        Args:
+            nbytes: Bytes ocupados
+            label: Descripción
+
+        Returns:
+            La reserva; se libera cuando esa memoria se suelta
+        """
+        with self._cond:
+            return self._add(nbytes, label)
+
+    def _add(self, nbytes: int, label: str) -> Reservation:
+        reservation = Reservation(self, nbytes, label)
+        self._active[id(reservation)] = reservation
+        self._used += nbytes
+        return reservation
+
+    def _release(self, reservation: Reservation):
+        with self._cond:
+            if self._active.pop(id(reservation), None) is not None:
+                self._used -= reservation.nbytes
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        """Límite, memoria reservada, reservas activas y trabajos en cola."""
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'used': self._used,
+                'active': [(r.label, r.nbytes) for r in self._active.values()],
+                'waiting': len(self._waiting),
+            }
+
+_budget: Optional[MemoryBudget] = None
+_budget_lock = threading.Lock()
+
+def get_memory_budget() -> MemoryBudget:
+    """Obtiene el presupuesto de memoria compartido por el proceso."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = MemoryBudget()
+        return _budget
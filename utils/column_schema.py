@@ -0,0 +1,204 @@
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+from .load_diagnostics import LoadDiagnostics
+
+# Campos canónicos y sus alias, en orden de prioridad. Los campos se resuelven en
+# este orden: una columna llamada solo 'DOCUMENTO' es el número de documento
+FIELD_ALIASES: Dict[str, List[str]] = {
+    'valor': ['VALOR', 'TOTAL', 'IMPORTE', 'MONTO'],
+    'nombre': ['NOMBRE', 'NOMBRE CONTRAPARTE', 'CLIENTE'],
+    'documento': ['NO. CASO', 'NUMERO CASO', 'CASO', 'ID', 'NUMERO', 'DOCUMENTO'],
+    'tipo_documento': ['TIPO DE DOCUMENTO', 'TIPO DOCUMENTO', 'DOCUMENTO'],
+}
+
+# Clave en DataFrame.attrs; pandas la conserva al copiar y filtrar
+SCHEMA_ATTR = 'column_schema'
+
+# Nombre con el que queda la columna de valor al cargar (TOTAL, IMPORTE, MONTO...):
+# centavos, TRM, cubo de resumen y totales la leen con ese nombre
+VALOR_COLUMN = 'VALOR'
+
+# Esquema declarado de las columnas de entrada de nombre fijo:
+# texto (read_excel las lee así, sin inferir su tipo), enteros y fechas
+TEXT_DTYPES: Dict[str, str] = {'EMPRESA': 'str', 'MES ASIGNACION': 'str', 'MONEDA': 'str'}
+INTEGER_COLUMNS = ['AÑO ASIGNACION']
+DATE_COLUMNS = ['FECHA ASIGNACION', 'FECHA ENTREGA']
+
+# Formatos aceptados para fechas escritas como texto, en orden de prueba
+DATE_FORMATS = ['ISO8601', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S']
+
+# Fechas como número de serie de Excel (días desde 1899-12-30), hasta 9999-12-31
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+EXCEL_SERIAL_RANGE = (1, 2958465)
+
+def normalize_name(name) -> str:
+    """'No. Caso ' -> 'NO CASO': sin tildes, en mayúsculas y con un espacio entre palabras."""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return " ".join(re.split(r'[^0-9A-Z]+', text.upper())).strip()
+
+def _contains_words(column: str, alias: str) -> bool:
+    """Si las palabras del alias aparecen seguidas y completas en el nombre de la columna."""
+    return f" {alias} " in f" {column} "
+
+def resolve_schema(columns: Iterable) -> Dict[str, Optional[str]]:
+    """
+    Asigna cada campo canónico a una columna real.
+
+    Reglas, en orden:
+      1. Nombre igual a un alias (sin importar mayúsculas, tildes ni puntuación),
+         probando los alias de cada campo en su orden de prioridad.
+      2. Para los campos sin asignar, la primera columna que contenga el alias
+         como palabras completas ('ID' coincide con 'ID CLIENTE', no con 'IDENTIFICACION').
+    Una columna se asigna a un solo campo, así 'TIPO DE DOCUMENTO' no cuenta
+    como columna de documentos.
+
+    Args:
+        columns: Columnas del DataFrame
+
+    Returns:
+        {campo: columna o None}
+    """
+    columns = list(columns)
+    normalized = [normalize_name(col) for col in columns]
+    schema: Dict[str, Optional[str]] = dict.fromkeys(FIELD_ALIASES)
+    taken = set()
+
+    for exact in (True, False):
+        for field, aliases in FIELD_ALIASES.items():
+            if schema[field] is not None:
+                continue
+            for alias in map(normalize_name, aliases):
+                match = next((
+                    i for i, name in enumerate(normalized)
+                    if i not in taken and (name == alias if exact else _contains_words(name, alias))
+                ), None)
+                if match is not None:
+                    schema[field] = columns[match]
+                    taken.add(match)
+                    break
+    return schema
+
+def attach_schema(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    """
+    Resuelve el esquema una vez al cargar y lo guarda con los datos (df.attrs).
+
+    La columna de valor se renombra a VALOR_COLUMN (en el mismo DataFrame), así
+    un archivo con TOTAL, IMPORTE o MONTO pasa por el mismo flujo de dinero.
+
+    Args:
+        df: DataFrame recién cargado
+
+    Returns:
+        El esquema resuelto
+    """
+    schema = resolve_schema(df.columns)
+    valor = schema['valor']
+    if valor is not None and valor != VALOR_COLUMN:
+        df.rename(columns={valor: VALOR_COLUMN}, inplace=True)
+        schema['valor'] = VALOR_COLUMN
+    df.attrs[SCHEMA_ATTR] = schema
+    return schema
+
+def get_schema(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    """
+    Esquema guardado al cargar; si el DataFrame no pasó por la carga (o ya no
+    tiene esas columnas) se resuelve en el momento.
+
+    Args:
+        df: DataFrame (o un filtro del cargado)
+
+    Returns:
+        {campo: columna o None}
+    """
+    schema = df.attrs.get(SCHEMA_ATTR)
+    if schema is not None and all(col is None or col in df.columns for col in schema.values()):
+        return schema
+    return resolve_schema(df.columns)
+
+def get_column(df: pd.DataFrame, field: str) -> Optional[str]:
+    """Columna real de un campo canónico ('valor', 'nombre', 'tipo_documento', 'documento')."""
+    return get_schema(df)[field]
+
+def parse_dates(values: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """
+    Convierte una columna de fechas por bloques, sin inferir el formato fila por fila.
+
+    Los números (y el texto numérico) se toman como serie de Excel; el resto
+    (fechas ya leídas por openpyxl y texto) se prueba con cada formato de
+    DATE_FORMATS sobre las filas que siguen sin convertir.
+
+    Args:
+        values: Columna tal como la entrega read_excel
+
+    Returns:
+        (Serie datetime64 con NaT donde no hay fecha, máscara de los valores presentes que no se pudieron leer)
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, np.zeros(len(values), dtype=bool)
+
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[us]')
+    present = values.notna().to_numpy()
+
+    numeric = pd.to_numeric(values, errors='coerce')
+    serial = numeric.between(*EXCEL_SERIAL_RANGE).to_numpy()
+    if serial.any():
+        days = pd.to_timedelta(numeric[serial].to_numpy(), unit='D')
+        result[serial] = (EXCEL_EPOCH + days).to_numpy().astype('datetime64[us]')
+    # Números fuera del rango de fechas de Excel
+    out_of_range = present & numeric.notna().to_numpy() & ~serial
+
+    # Las fechas ya leídas pasan a texto ISO; las que traen zona horaria quedan en UTC
+    pending = np.flatnonzero(present & numeric.isna().to_numpy())
+    text = pd.Series(values.to_numpy()[pending]).astype(str).str.strip()
+    left = np.ones(len(pending), dtype=bool)
+    for fmt in DATE_FORMATS:
+        if not left.any():
+            break
+        positions = np.flatnonzero(left)
+        try:
+            parsed = pd.to_datetime(text.iloc[positions], format=fmt, errors='coerce', utc=True)
+        except (ValueError, TypeError):
+            continue
+        ok = parsed.notna().to_numpy()
+        result[pending[positions[ok]]] = parsed.dt.tz_convert(None).to_numpy()[ok].astype('datetime64[us]')
+        left[positions[ok]] = False
+
+    failed = out_of_range
+    failed[pending[left]] = True
+    return pd.Series(result, index=values.index, name=values.name), failed
+
+def apply_input_schema(df: pd.DataFrame, source: str, diagnostics: LoadDiagnostics) -> pd.DataFrame:
+    """
+    Aplica los tipos declarados a un archivo recién leído (en el mismo DataFrame).
+
+    Los valores que no se pueden convertir quedan vacíos y se registran en
+    `diagnostics` con su archivo y fila, en lugar de convertirse en silencio.
+
+    Args:
+        df: DataFrame de un archivo (antes de combinarlo con los demás)
+        source: Nombre del archivo para los diagnósticos
+        diagnostics: Tabla donde se registran los valores que no se pudieron leer
+
+    Returns:
+        El mismo DataFrame
+    """
+    for col in INTEGER_COLUMNS:
+        if col not in df.columns or pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        numeric = pd.to_numeric(df[col], errors='coerce')
+        failed = (df[col].notna() & numeric.isna()).to_numpy()
+        diagnostics.add(source, np.flatnonzero(failed), col, df[col].to_numpy()[failed], "no es un número")
+        if numeric.notna().all() and (numeric % 1 == 0).all():
+            numeric = numeric.astype('int64')
+        df[col] = numeric
+
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        parsed, failed = parse_dates(df[col])
+        diagnostics.add(source, np.flatnonzero(failed), col, df[col].to_numpy()[failed], "fecha no reconocida")
+        df[col] = parsed
+    return df
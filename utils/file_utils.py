@@ -1,4 +1,7 @@
 import unicodedata
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
 
 def safe_filename(name: str) -> str:
     """
@@ -24,3 +27,43 @@ def ensure_extension(name: str, ext: str) -> str:
     """
     ext = ext if ext.startswith(".") else f".{ext}"
     return name if name.lower().endswith(ext.lower()) else f"{name}{ext}"
+
+def build_report_filename(empresa: str, date: datetime = None) -> str:
+    """
+    Construye el nombre sugerido del reporte (sin importar las librerías de documentos).
+    
+    Args:
+        empresa: Nombre de la empresa
+        date: Fecha para el nombre del archivo
+        
+    Returns:
+        Nombre con el formato YYMMDD-LV-<Empresa>-Facturación honorarios.docx
+    """
+    date = date or datetime.now()
+    nfkd = unicodedata.normalize("NFKD", empresa)
+    empresa_tag = "".join(ch for ch in nfkd.encode("ascii", "ignore").decode("ascii") if ch.isalnum())
+    return f"{date.strftime('%y%m%d')}-LV-{empresa_tag}-Facturación honorarios.docx"
+
+# Ruta absoluta para no depender del directorio de trabajo
+LOGO_PATH = Path(__file__).resolve().parent.parent / 'assets' / 'biu_logo.png'
+
+_logo_bytes = None
+
+def get_logo_bytes() -> bytes:
+    """
+    Obtiene el logo BIU, leyéndolo del disco solo la primera vez.
+    
+    Returns:
+        Contenido del archivo PNG
+        
+    Raises:
+        FileNotFoundError: Si el logo no existe
+    """
+    global _logo_bytes
+    if _logo_bytes is None:
+        _logo_bytes = LOGO_PATH.read_bytes()
+    return _logo_bytes
+
+def get_logo_stream() -> BytesIO:
+    """Retorna el logo precargado como un stream nuevo (python-docx y openpyxl lo consumen)."""
+    return BytesIO(get_logo_bytes())
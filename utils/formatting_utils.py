@@ -1,15 +1,203 @@
-def format_currency(value, currency="USD"):
+import os
+import numpy as np
+import pandas as pd
+from .money_utils import CENTAVOS_COLUMN, to_cents
+
+# Texto de 3 dígitos ("000".."999") por valor, para armar los números por grupos de miles
+_DIGITS3 = np.array([list(f"{i:03d}".encode()) for i in range(1000)], dtype=np.uint8)
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
+
+# Tabla principal de Word: desde estas filas se usa layout fijo (Word no re-mide cada celda)
+FIXED_LAYOUT_MIN_ROWS = 200
+# 'fixed' o 'autofit' fuerzan el modo; vacío lo decide por cantidad de filas
+TABLE_LAYOUT_ENV = 'WORD_TABLE_LAYOUT'
+
+def _format_cents_array(cents: np.ndarray) -> np.ndarray:
     """
-    Formatea un número como moneda.
-    
+    Formatea centavos int64 como '-1,234.56' sin recorrer fila por fila.
+
+    Cada número se arma en una matriz de bytes (una fila por valor, alineada
+    a la derecha) copiando grupos de 3 dígitos desde una tabla; luego se
+    interpreta cada fila como una cadena y se quitan los espacios de la izquierda.
+    Usa np.char (no np.strings) para funcionar también con NumPy < 2.3.
+    """
+    magnitude = np.abs(cents)
+    units, minor = np.divmod(magnitude, 100)
+    n_digits = np.maximum(1, np.searchsorted(_POW10, units, side='right'))
+    n_groups = int((n_digits.max() + 2) // 3)
+    width = 1 + 4 * n_groups + 3  # signo + grupos 'ddd,' + '.dd'
+
+    chars = np.empty((len(cents), width), dtype=np.uint8)
+    chars[:, width - 3] = ord('.')
+    chars[:, width - 2:] = _DIGITS3[minor][:, 1:]
+    rest, end = units, width - 3
+    for g in range(n_groups):
+        rest, group = np.divmod(rest, 1000)
+        chars[:, end - 3:end] = _DIGITS3[group]
+        if g < n_groups - 1:
+            chars[:, end - 4] = ord(',')
+        end -= 4
+
+    # Cada valor empieza donde terminan sus ceros sobrantes (un carácter antes si es negativo)
+    left = width - (3 + n_digits + (n_digits - 1) // 3)
+    negative = cents < 0
+    left[negative] -= 1
+    chars[negative, left[negative]] = ord('-')
+    # Los ceros sobrantes pasan a espacios y se recortan
+    chars[np.arange(width) < left[:, None]] = ord(' ')
+
+    return np.char.lstrip(chars.view(f'S{width}').ravel()).astype(str)
+
+def format_cents_column(cents: pd.Series, currency: str = None, na_rep: str = "") -> pd.Series:
+    """
+    Formatea una columna de centavos enteros en una sola pasada vectorizada.
+
     Args:
-        value: Valor numérico
+        cents: Serie de centavos (Int64 nullable o int64)
+        currency: Prefijo de moneda opcional (por ejemplo "USD")
+        na_rep: Texto para valores nulos
+
+    Returns:
+        Serie de texto como '1,234.56' o 'USD 1,234.56'
+    """
+    cents = pd.Series(cents)
+    valid = cents.notna().to_numpy()
+    result = np.full(len(cents), na_rep, dtype=object)
+    if valid.any():
+        text = _format_cents_array(cents.to_numpy(dtype='float64', na_value=0)[valid].astype('int64'))
+        if currency:
+            text = np.char.add(f"{currency} ", text)
+        result[valid] = text
+    return pd.Series(result, index=cents.index, dtype=object)
+
+def format_number_column(values, na_rep: str = "", cents: pd.Series = None) -> pd.Series:
+    """
+    Formatea una columna de montos con 2 decimales y separador de miles.
+
+    Reemplaza el f"{float(value):,.2f}" por celda: los valores no numéricos
+    se dejan como texto y los nulos se muestran como `na_rep`.
+
+    Args:
+        values: Serie (o lista) de montos
+        na_rep: Texto para valores nulos
+        cents: Centavos ya calculados para `values` (opcional, evita volver a convertir)
+
+    Returns:
+        Serie de texto alineada con `values`
+    """
+    values = pd.Series(values)
+    cents = to_cents(values) if cents is None else cents
+    formatted = format_cents_column(cents, na_rep=na_rep)
+    non_numeric = cents.isna() & values.notna()
+    if non_numeric.any():
+        formatted[non_numeric] = values[non_numeric].astype(str)
+    return formatted
+
+def format_currency_column(values, currency: str = "USD", cents: pd.Series = None) -> pd.Series:
+    """
+    Formatea una columna de montos como moneda.
+
+    Args:
+        values: Serie (o lista) de montos
         currency: Código de moneda
-        
+        cents: Centavos ya calculados para `values` (opcional, evita volver a convertir)
+
+    Returns:
+        Serie de texto como 'USD 1,234.56'; nulos y no numéricos como 'USD 0.00'
+    """
+    cents = to_cents(values) if cents is None else cents
+    return format_cents_column(cents, currency=currency, na_rep=f"{currency} 0.00")
+
+def format_valor_column(data: pd.DataFrame, currency: str = None) -> pd.Series:
+    """
+    Formatea la columna VALOR de un DataFrame para las filas de los reportes.
+
+    Usa VALOR_CENTAVOS si ya se calculó al cargar los datos.
+
+    Args:
+        data: DataFrame con los datos
+        currency: Prefijo de moneda opcional; sin él, los no numéricos se dejan como texto
+
+    Returns:
+        Serie de texto alineada con `data` ('0.00' en todas las filas si no hay VALOR)
+    """
+    if 'VALOR' not in data.columns:
+        zero = f"{currency} 0.00" if currency else "0.00"
+        return pd.Series(zero, index=data.index, dtype=object)
+
+    cents = data[CENTAVOS_COLUMN] if CENTAVOS_COLUMN in data.columns else None
+    if currency:
+        return format_currency_column(data['VALOR'], currency, cents=cents)
+    return format_number_column(data['VALOR'], cents=cents)
+
+def use_fixed_layout(n_rows: int) -> bool:
+    """
+    Indica si la tabla principal de Word se arma con layout fijo.
+
+    Args:
+        n_rows: Filas de datos de la tabla
+
+    Returns:
+        True si WORD_TABLE_LAYOUT=fixed, o si no está definido y hay FIXED_LAYOUT_MIN_ROWS filas o más
+    """
+    mode = os.environ.get(TABLE_LAYOUT_ENV, "").strip().lower()
+    if mode in ("fixed", "autofit"):
+        return mode == "fixed"
+    return n_rows >= FIXED_LAYOUT_MIN_ROWS
+
+def column_widths(table_data: pd.DataFrame, available_width: int, min_chars: int = 4,
+                  max_chars: int = 30, padding_chars: int = 2) -> list:
+    """
+    Anchos de columna proporcionales al texto más largo de cada columna.
+
+    Cada columna pesa lo que su valor más largo (o la palabra más larga de su
+    encabezado, que va en negrita y sí puede partirse en líneas), acotado entre
+    `min_chars` y `max_chars` para que un NOMBRE muy largo no deje sin espacio
+    al resto, más un margen fijo por los bordes internos de la celda.
+
+    Args:
+        table_data: Valores tal como se escriben en la tabla (los encabezados son las columnas)
+        available_width: Ancho total a repartir (EMU)
+        min_chars: Peso mínimo por columna
+        max_chars: Peso máximo por columna
+        padding_chars: Margen que se suma a cada columna
+
+    Returns:
+        Lista de anchos enteros (EMU) que suman exactamente `available_width`
+    """
+    # La negrita del encabezado ocupa cerca de un 20% más
+    header = 1.2 * np.array([max(len(word) for word in str(col).split() or [""]) for col in table_data.columns])
+    longest = np.array([
+        table_data[col].astype(str).str.len().max() if len(table_data) else 0
+        for col in table_data.columns
+    ], dtype='float64')
+    weights = np.clip(np.fmax(header, np.nan_to_num(longest)), min_chars, max_chars) + padding_chars
+    widths = np.floor(weights / weights.sum() * available_width).astype('int64')
+    widths[-1] += available_width - widths.sum()
+    return widths.tolist()
+
+def wrapped_row_heights(columns, line_height: float = 15.0) -> np.ndarray:
+    """
+    Alto de fila (puntos) para celdas con ajuste de texto, estimado sin medir celda por celda.
+
+    Cada celda ocupa ceil(largo / caracteres por línea) líneas según el ancho de
+    su columna en Excel; la fila toma la celda con más líneas. Se dejan dos
+    caracteres de margen por el relleno de la celda y porque el texto se corta
+    por palabras.
+
+    Args:
+        columns: Lista de (valores, ancho de columna en caracteres), todas del mismo largo
+        line_height: Alto de una línea (15 pt para Calibri 11)
+
     Returns:
-        Cadena formateada como moneda
+        Arreglo float64 con el alto de cada fila
     """
-    try:
-        return f"{currency} {float(value):,.2f}"
-    except (ValueError, TypeError):
-        return f"{currency} 0.00"
+    lines = None
+    for values, width in columns:
+        per_line = max(int(width) - 2, 1)
+        lengths = pd.Series(values, dtype=object).fillna("").astype(str).str.len().to_numpy()
+        needed = np.maximum(-(-lengths // per_line), 1)
+        lines = needed if lines is None else np.maximum(lines, needed)
+    if lines is None:
+        return np.empty(0)
+    return lines * float(line_height)
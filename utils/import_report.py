@@ -0,0 +1,97 @@
+"""
+Reporte del costo de importación de los módulos de la aplicación.
+
+Uso:
+    python -m utils.import_report [modulo ...] [--top N]
+
+Cada módulo se importa en un intérprete nuevo con `-X importtime`, de modo
+que el costo reportado es el de un arranque en frío.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = [
+    'streamlit',
+    'pandas',
+    'openpyxl',
+    'docx',
+    'preview_generator_html',
+    'report_generator',
+    'excel_generator_ravago',
+    'app',
+]
+
+def measure_import(module: str) -> List[Dict]:
+    """
+    Importa un módulo en un proceso nuevo y recoge los tiempos de `-X importtime`.
+
+    Args:
+        module: Nombre del módulo a importar
+
+    Returns:
+        Lista de {'module', 'depth', 'self_ms', 'cumulative_ms'} en el orden de
+        `-X importtime` (cada módulo aparece después de sus dependencias)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}: {result.stderr.strip().splitlines()[-1]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name[1:]  # espacio del separador; el resto de la sangría es la profundidad
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+        })
+    return rows
+
+def _top_level_cost(rows: List[Dict], module: str) -> float:
+    """Costo acumulado del módulo solicitado."""
+    return next((r['cumulative_ms'] for r in rows if r['depth'] == 0 and r['module'] == module), 0.0)
+
+def _direct_dependencies(rows: List[Dict], module: str) -> List[Dict]:
+    """Módulos importados directamente por `module` (profundidad 1 justo antes de él)."""
+    end = next((i for i, r in enumerate(rows) if r['depth'] == 0 and r['module'] == module), None)
+    if end is None:
+        return []
+    deps = []
+    for row in reversed(rows[:end]):
+        if row['depth'] == 0:
+            break
+        if row['depth'] == 1:
+            deps.append(row)
+    return deps
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Costo de importación en frío por módulo.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=5, help="Dependencias más costosas a listar por módulo")
+    args = parser.parse_args(argv)
+
+    print(f"{'Módulo':<28}{'Total (ms)':>12}")
+    for module in args.modules:
+        try:
+            rows = measure_import(module)
+        except RuntimeError as e:
+            print(f"{module:<28}{'error':>12}  {e}")
+            continue
+
+        print(f"{module:<28}{_top_level_cost(rows, module):>12.1f}")
+        for row in sorted(_direct_dependencies(rows, module), key=lambda r: r['cumulative_ms'], reverse=True)[:args.top]:
+            print(f"    {row['module']:<24}{row['cumulative_ms']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
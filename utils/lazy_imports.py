@@ -0,0 +1,78 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import List, Optional
+from .file_utils import get_logo_bytes
+
+# Módulos pesados que conviene tener importados antes de la primera generación
+WARMUP_MODULES = [
+    'pandas',
+    'openpyxl',
+    'docx',
+    'preview_generator_html',
+    'reports.report_factory',
+    'reports.word_report_generator',
+    'reports.excel_report_generator',
+]
+
+_warmup_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+
+class LazyModule:
+    """
+    Módulo que se importa en el primer acceso a uno de sus atributos.
+
+    Permite declarar `pd = LazyModule("pandas")` a nivel de módulo sin pagar
+    el costo de la importación hasta que realmente se usa.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "cargado" if self._module is not None else "sin cargar"
+        return f"<LazyModule {self._name} ({state})>"
+
+def _warmup(modules: List[str]):
+    """Importa los módulos y precarga el logo; los errores se ignoran (se verán al usarlos)."""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    try:
+        get_logo_bytes()
+    except OSError:
+        pass
+
+def start_warmup(modules: Optional[List[str]] = None) -> bool:
+    """
+    Inicia, una sola vez por proceso, un hilo que precarga las librerías pesadas.
+
+    Debe llamarse después de dibujar los primeros widgets para no retrasarlos.
+
+    Args:
+        modules: Módulos a importar (por defecto WARMUP_MODULES)
+
+    Returns:
+        True si el hilo se inició en esta llamada
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is not None:
+            return False
+        _warmup_thread = threading.Thread(
+            target=_warmup, args=(modules or WARMUP_MODULES,),
+            name="import-warmup", daemon=True
+        )
+        _warmup_thread.start()
+        return True
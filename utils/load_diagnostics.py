@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+# Clave en DataFrame.attrs con los problemas detectados al cargar
+DIAGNOSTICS_ATTR = 'load_diagnostics'
+
+# Filas de ejemplo que se guardan por problema (el conteo siempre es completo)
+MAX_EXAMPLES = 1000
+
+# Fila de Excel de la primera fila de datos (la 1 es el encabezado)
+FIRST_DATA_ROW = 2
+
+class LoadDiagnostics:
+    """
+    Tabla de filas con problemas detectadas al cargar (valores que no se pudieron
+    leer y los que no pasan la validación).
+
+    Se guarda en df.attrs. pandas copia los attrs en cada operación, por eso la
+    tabla no se copia: todas las copias del DataFrame comparten este objeto.
+
+    También guarda los archivos que no se pudieron leer (file_errors): una carga
+    con errores de lectura está incompleta y no se comparte entre sesiones.
+    """
+
+    COLUMNS = ['archivo', 'fila', 'columna', 'valor', 'problema']
+
+    def __init__(self):
+        self._examples: List[pd.DataFrame] = []
+        self._counts: List[Dict] = []
+        self._sources: List[str] = []
+        self._offsets: List[int] = [0]
+        self.file_errors: List[Tuple[str, str]] = []
+
+    def add_file_error(self, archivo: str, error):
+        """Registra un archivo que no se pudo leer."""
+        self.file_errors.append((archivo, str(error)))
+
+    def add_source(self, archivo: str, n_rows: int):
+        """Registra un archivo en el orden en que se combina (ver add_rows)."""
+        self._sources.append(archivo)
+        self._offsets.append(self._offsets[-1] + n_rows)
+
+    def add(self, archivo: str, positions: np.ndarray, columna: str, values, problema: str):
+        """
+        Registra las filas de un archivo con el mismo problema en una columna.
+
+        Args:
+            archivo: Nombre del archivo (o 'zip/miembro')
+            positions: Posiciones de las filas dentro del archivo (0 = primera fila de datos)
+            columna: Columna afectada
+            values: Valores originales de esas filas, alineados con `positions`
+            problema: Descripción ('fecha no reconocida', ...)
+        """
+        if len(positions) == 0:
+            return
+        self._counts.append({'archivo': archivo, 'columna': columna, 'problema': problema,
+                             'filas': len(positions)})
+        keep = slice(0, MAX_EXAMPLES)
+        examples = pd.Series(np.asarray(values)[keep], dtype=object)
+        self._examples.append(pd.DataFrame({
+            'archivo': archivo,
+            'fila': np.asarray(positions)[keep] + FIRST_DATA_ROW,
+            'columna': columna,
+            'valor': examples.astype(str).where(examples.notna(), ''),
+            'problema': problema,
+        }, columns=self.COLUMNS))
+
+    def add_rows(self, positions: np.ndarray, columna: str, values, problema: str):
+        """
+        Registra filas del DataFrame combinado; cada una se atribuye a su archivo y fila.
+
+        Args:
+            positions: Posiciones ordenadas en el DataFrame combinado
+            columna: Columna afectada
+            values: Valores de esas filas, alineados con `positions`
+            problema: Descripción del problema
+        """
+        positions = np.asarray(positions)
+        values = np.asarray(values)
+        bounds = np.searchsorted(positions, self._offsets)
+        for i, archivo in enumerate(self._sources):
+            start, end = bounds[i], bounds[i + 1]
+            self.add(archivo, positions[start:end] - self._offsets[i], columna, values[start:end], problema)
+
+    def __len__(self) -> int:
+        """Filas con problemas (cada problema cuenta por separado)."""
+        return sum(c['filas'] for c in self._counts)
+
+    def table(self) -> pd.DataFrame:
+        """Filas de ejemplo de cada problema (hasta MAX_EXAMPLES por problema)."""
+        if not self._examples:
+            return pd.DataFrame(columns=self.COLUMNS)
+        return pd.concat(self._examples, ignore_index=True)
+
+    def summary(self) -> pd.DataFrame:
+        """Un renglón por (archivo, columna, problema) con el total de filas."""
+        return pd.DataFrame(self._counts, columns=['archivo', 'columna', 'problema', 'filas'])
+
+    def __deepcopy__(self, memo) -> 'LoadDiagnostics':
+        return self
+
+def attach_diagnostics(df: pd.DataFrame, diagnostics: LoadDiagnostics):
+    """Guarda los problemas de la carga con los datos (df.attrs)."""
+    df.attrs[DIAGNOSTICS_ATTR] = diagnostics
+
+def get_diagnostics(df: pd.DataFrame) -> LoadDiagnostics:
+    """Problemas detectados al cargar el DataFrame (vacío si no pasó por la carga)."""
+    # Sin `or`: una tabla sin filas con problemas es falsa (__len__) pero puede tener file_errors
+    diagnostics = df.attrs.get(DIAGNOSTICS_ATTR)
+    return diagnostics if diagnostics is not None else LoadDiagnostics()
@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Se activa con PERF_MEMORY=1 (implica PERF_TRACE); el último rerun se guarda en PERF_MEMORY_REPORT
+MEMORY_ENV = 'PERF_MEMORY'
+REPORT_PATH = Path(os.environ.get('PERF_MEMORY_REPORT', Path(tempfile.gettempdir()) / "facturacion_memory.json"))
+
+# Frames por traza: 1 alcanza para agrupar por línea y mantiene bajo el costo
+TRACE_FRAMES = int(os.environ.get('PERF_MEMORY_FRAMES', "1"))
+# Sitios de asignación por etapa; con 0 no se toman fotos (solo pico y retenido)
+TOP_SITES = int(os.environ.get('PERF_MEMORY_TOP', "5"))
+
+_active = False
+_local = threading.local()
+_report_lock = threading.Lock()
+
+# Las asignaciones del propio perfilador no cuentan como sitios
+_IGNORED = (tracemalloc.__file__, __file__)
+
+def is_active() -> bool:
+    """Indica si el modo de memoria está activo."""
+    return _active
+
+def enable(frames: int = TRACE_FRAMES):
+    """Empieza a trazar asignaciones con tracemalloc."""
+    global _active
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _active = True
+
+def disable():
+    """Detiene el trazado de asignaciones."""
+    global _active
+    _active = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def _stack() -> List['MemoryProbe']:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, path) for path in _IGNORED]
+    )
+
+class MemoryProbe:
+    """
+    Pico y memoria retenida de un bloque, medidos con tracemalloc.
+
+    tracemalloc tiene un único pico por proceso: al abrir un bloque anidado
+    se guarda el pico del bloque padre antes de reiniciarlo y, al cerrarlo,
+    se le devuelve el pico del hijo. Las asignaciones de otros hilos cuentan
+    igual, así que los números son del proceso completo.
+
+    Las fotos para los sitios de asignación cuestan segundos con muchas
+    trazas vivas, por eso solo las toma el bloque más externo de cada etapa.
+    """
+
+    def __init__(self):
+        stack = _stack()
+        # La foto inicial se toma antes de la línea base para que su propio
+        # tamaño no aparezca como consumo del bloque
+        self._before = _snapshot() if not stack and TOP_SITES > 0 else None
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]._peak = max(stack[-1]._peak, peak)
+        tracemalloc.reset_peak()
+        self._start = current
+        self._peak = current
+        stack.append(self)
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Cierra el bloque.
+
+        Returns:
+            {'peak_bytes', 'retained_bytes', 'top_sites'}, relativos al inicio del bloque
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self._peak = max(self._peak, peak)
+        if stack:
+            stack[-1]._peak = max(stack[-1]._peak, self._peak)
+        return {
+            'peak_bytes': self._peak - self._start,
+            'retained_bytes': current - self._start,
+            'top_sites': top_sites(self._before, _snapshot()) if self._before is not None else [],
+        }
+
+def top_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int = TOP_SITES) -> List[Dict[str, Any]]:
+    """
+    Líneas que más memoria asignaron entre dos fotos (lo que sigue vivo al final).
+
+    Returns:
+        Lista de {'site', 'size_bytes', 'count'} ordenada por tamaño
+    """
+    sites = []
+    for stat in after.compare_to(before, 'lineno')[:limit]:
+        if stat.size_diff <= 0:
+            break
+        frame = stat.traceback[0]
+        sites.append({
+            'site': f"{frame.filename}:{frame.lineno}",
+            'size_bytes': stat.size_diff,
+            'count': stat.count_diff,
+        })
+    return sites
+
+def stage_summary(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Resumen de memoria por etapa a partir de los registros de un rerun (perf_trace).
+
+    Es el mismo formato que usa el benchmark en su JSON.
+
+    Args:
+        records: TraceRun.breakdown() o líneas del log de un mismo rerun
+
+    Returns:
+        {etapa: {'peak_bytes', 'retained_bytes', 'top_sites'}}; las etapas repetidas conservan el mayor pico
+    """
+    stages: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        if 'peak_bytes' not in record:
+            continue
+        entry = {key: record[key] for key in ('peak_bytes', 'retained_bytes', 'top_sites')}
+        previous = stages.get(record['span'])
+        if previous is None or entry['peak_bytes'] > previous['peak_bytes']:
+            stages[record['span']] = entry
+    return stages
+
+def write_report(records: List[Dict[str, Any]], path: Optional[Path] = None) -> Optional[Path]:
+    """Guarda el resumen de memoria de un rerun como JSON; un error de escritura no interrumpe la app."""
+    path = Path(path or REPORT_PATH)
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'traced_bytes': tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+        'stages': stage_summary(records),
+    }
+    try:
+        with _report_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    except OSError:
+        return None
+    return path
+
+if os.environ.get(MEMORY_ENV, "0").strip().lower() not in ("", "0", "false", "no"):
+    enable()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Columna con VALOR en centavos (enteros), calculada una vez al cargar los datos
+CENTAVOS_COLUMN = 'VALOR_CENTAVOS'
+
+# IVA en puntos básicos (19 %) para operar solo con enteros
+IVA_BASIS_POINTS = 1900
+
+def to_cents(values) -> pd.Series:
+    """
+    Convierte montos a centavos enteros de forma vectorizada.
+
+    Excel entrega los montos como float: valor * 100 queda a una fracción mínima
+    del valor decimal escrito, por eso se ajusta a 6 decimales antes de redondear
+    al centavo con medios alejándose de cero (1.005 -> 101, como lo muestra Excel).
+
+    Args:
+        values: Serie (o lista) de montos
+
+    Returns:
+        Serie Int64 (nullable) con los montos en centavos; los no numéricos quedan como <NA>
+    """
+    numeric = pd.to_numeric(pd.Series(values), errors='coerce').astype('float64')
+    raw = numeric.to_numpy() * 100
+    # Con montos muy grandes el float ya no tiene 6 decimales que ajustar
+    scaled = np.where(np.abs(raw) < 1e9, np.round(raw, 6), raw)
+    cents = np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)
+    return pd.Series(cents, index=numeric.index).astype('Int64')
+
+def valor_cents(data: pd.DataFrame) -> pd.Series:
+    """
+    Obtiene VALOR en centavos, usando la columna precalculada si existe.
+
+    Args:
+        data: DataFrame con los datos
+
+    Returns:
+        Serie Int64 con VALOR en centavos (vacía si no hay columna VALOR)
+    """
+    if CENTAVOS_COLUMN in data.columns:
+        return data[CENTAVOS_COLUMN]
+    if 'VALOR' not in data.columns:
+        return pd.Series(dtype='Int64')
+    return to_cents(data['VALOR'])
+
+def add_cents_column(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega (en el mismo DataFrame) la columna VALOR_CENTAVOS si hay columna VALOR."""
+    if 'VALOR' in df.columns:
+        df[CENTAVOS_COLUMN] = to_cents(df['VALOR'])
+    return df
+
+def sum_cents(cents: pd.Series) -> int:
+    """Suma exacta de centavos ignorando nulos."""
+    return int(cents.sum(skipna=True)) if len(cents) else 0
+
+def mode_cents(cents: pd.Series) -> int:
+    """
+    Moda de los centavos (precio único de GWealth).
+
+    En empate gana el menor valor, igual que Series.mode().iloc[0].
+
+    Returns:
+        Moda en centavos, o 0 si no hay valores
+    """
+    cents = cents.dropna()
+    if cents.empty:
+        return 0
+    return int(cents.mode().iloc[0])
+
+def apply_rate(cents: int, basis_points: int) -> int:
+    """
+    Aplica una tasa en puntos básicos a un monto en centavos.
+
+    Redondea al centavo más cercano con medios alejándose de cero
+    (ROUND_HALF_UP), sin pasar por float.
+    """
+    product = abs(cents) * basis_points
+    rounded = (product + 5000) // 10000
+    return rounded if cents >= 0 else -rounded
+
+def cents_to_float(cents: int) -> float:
+    """Convierte centavos a float solo para celdas numéricas (Excel)."""
+    return cents / 100
+
+def format_amount(cents: int) -> str:
+    """Formatea centavos como '1,234.56' con aritmética entera."""
+    sign = "-" if cents < 0 else ""
+    units, minor = divmod(abs(int(cents)), 100)
+    return f"{sign}{units:,}.{minor:02d}"
+
+def format_cents(cents: int, currency: str = "USD") -> str:
+    """Formatea centavos como moneda, por ejemplo 'USD 1,234.56'."""
+    return f"{currency} {format_amount(cents)}"
@@ -0,0 +1,214 @@
+import contextvars
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from . import mem_profile
+
+# Se activa con PERF_TRACE=1; el log JSON-lines va a PERF_TRACE_LOG
+TRACE_ENV = 'PERF_TRACE'
+LOG_PATH = Path(os.environ.get('PERF_TRACE_LOG', Path(tempfile.gettempdir()) / "facturacion_perf.jsonl"))
+
+# El modo de memoria (PERF_MEMORY=1) necesita los spans, así que también los activa
+_enabled = (os.environ.get(TRACE_ENV, "0").strip().lower() not in ("", "0", "false", "no")
+            or mem_profile.is_active())
+_current_run: contextvars.ContextVar[Optional['TraceRun']] = contextvars.ContextVar('perf_trace_run', default=None)
+_log_lock = threading.Lock()
+
+def is_enabled() -> bool:
+    """Indica si la instrumentación está activa."""
+    return _enabled
+
+def set_enabled(enabled: bool):
+    """Activa o desactiva la instrumentación en el proceso."""
+    global _enabled
+    _enabled = bool(enabled)
+
+def _row_count(obj) -> Optional[int]:
+    """Filas de un DataFrame (o de cualquier objeto con .shape), sin importar pandas."""
+    shape = getattr(obj, 'shape', None)
+    return int(shape[0]) if shape else None
+
+class Span:
+    """
+    Intervalo medido con perf_counter; los atributos (por ejemplo filas) se agregan con set().
+
+    Con el modo de memoria activo también registra peak_bytes, retained_bytes y
+    top_sites (las fotos de tracemalloc quedan fuera del tiempo del propio span).
+    """
+
+    def __init__(self, name: str, run: Optional['TraceRun'], attrs: Dict[str, Any]):
+        self.name = name
+        self.run = run
+        self.attrs = attrs
+        self.depth = 0
+        self.offset_ms = 0.0
+        self.duration_ms = 0.0
+        self._start = 0.0
+        self._memory: Optional[mem_profile.MemoryProbe] = None
+
+    def set(self, **attrs) -> 'Span':
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self) -> 'Span':
+        if self.run is not None:
+            self.depth = self.run._depth
+            self.run._depth += 1
+        if mem_profile.is_active():
+            self._memory = mem_profile.MemoryProbe()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        self.duration_ms = (end - self._start) * 1000
+        if self._memory is not None:
+            self.attrs.update(self._memory.stop())
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        if self.run is not None:
+            self.run._depth -= 1
+            self.offset_ms = (self._start - self.run.started) * 1000
+            self.run.spans.append(self)
+        else:
+            # Fuera de un rerun (por ejemplo en un fragmento) se registra sola
+            _write_records([self.to_record(None)])
+        return False
+
+    def to_record(self, run_id: Optional[str]) -> Dict[str, Any]:
+        return {
+            'run': run_id, 'span': self.name, 'depth': self.depth,
+            'offset_ms': round(self.offset_ms, 3), 'duration_ms': round(self.duration_ms, 3),
+            **self.attrs,
+        }
+
+class _NullSpan:
+    """Span vacío que se entrega cuando la instrumentación está apagada."""
+
+    def set(self, **attrs) -> '_NullSpan':
+        return self
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class TraceRun:
+    """Spans de un rerun de la aplicación, en orden de finalización."""
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.timestamp = datetime.now().isoformat(timespec='milliseconds')
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.spans: List[Span] = []
+        self._depth = 1
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """Spans ordenados por inicio (para mostrar), cada uno como diccionario."""
+        return [span.to_record(self.id) for span in sorted(self.spans, key=lambda s: (s.offset_ms, s.depth))]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Líneas del log: una por el rerun completo y una por cada span."""
+        head = {
+            'run': self.id, 'span': self.name, 'depth': 0, 'offset_ms': 0.0,
+            'duration_ms': round(self.total_ms, 3), 'timestamp': self.timestamp, **self.attrs,
+        }
+        return [head] + self.breakdown()
+
+def span(name: str, **attrs):
+    """
+    Mide un bloque `with`. Con la instrumentación apagada retorna un span vacío compartido.
+
+    Args:
+        name: Nombre de la etapa
+        **attrs: Atributos del span (por ejemplo rows=len(df))
+
+    Returns:
+        Context manager con método set(**attrs)
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, _current_run.get(), attrs)
+
+def traced(name: Optional[str] = None):
+    """
+    Decorador que mide cada llamada como un span.
+
+    Agrega 'rows_in' (filas del primer argumento con .shape) y 'rows_out'
+    (filas del resultado, si es un DataFrame).
+
+    Args:
+        name: Nombre del span (por defecto el __qualname__ de la función)
+    """
+    def decorator(fn: Callable) -> Callable:
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            rows_in = next((n for n in map(_row_count, args) if n is not None), None)
+            attrs = {'rows_in': rows_in} if rows_in is not None else {}
+            with Span(label, _current_run.get(), attrs) as current:
+                result = fn(*args, **kwargs)
+                rows_out = _row_count(result)
+                if rows_out is not None:
+                    current.set(rows_out=rows_out)
+                return result
+        return wrapper
+    return decorator
+
+def begin_run(name: str = "rerun", **attrs) -> Optional[TraceRun]:
+    """Empieza a juntar los spans de un rerun (None si la instrumentación está apagada)."""
+    if not _enabled:
+        return None
+    run = TraceRun(name, attrs)
+    _current_run.set(run)
+    return run
+
+def end_run() -> Optional[TraceRun]:
+    """Cierra el rerun actual, lo escribe en el log y lo retorna."""
+    run = _current_run.get()
+    if run is None:
+        return None
+    _current_run.set(None)
+    run.total_ms = (time.perf_counter() - run.started) * 1000
+    _write_records(run.to_records())
+    if mem_profile.is_active():
+        mem_profile.write_report(run.breakdown())
+    return run
+
+@contextmanager
+def trace_run(name: str = "rerun", **attrs):
+    """Versión `with` de begin_run/end_run."""
+    run = begin_run(name, **attrs)
+    try:
+        yield run
+    finally:
+        if run is not None:
+            end_run()
+
+def _write_records(records: List[Dict[str, Any]]):
+    """Agrega registros al log JSON-lines; un error de escritura no interrumpe la app."""
+    try:
+        lines = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+        with _log_lock:
+            LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(LOG_PATH, 'a', encoding='utf-8') as f:
+                f.write(lines)
+    except OSError:
+        pass
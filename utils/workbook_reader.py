@@ -0,0 +1,179 @@
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Callable, List, NamedTuple, Optional, Tuple
+import pandas as pd
+from .column_schema import TEXT_DTYPES
+from .perf_trace import span
+from .worker_pool import WorkerPool, get_worker_pool
+
+# Extensiones que se leen dentro de un .zip
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xls')
+
+class WorkbookSource(NamedTuple):
+    """Un libro a leer: un archivo subido o un miembro de un .zip subido."""
+    name: str                   # 'enero.xlsx' o 'trimestre.zip/enero.xlsx'
+    read: Callable[[], bytes]   # bytes del libro (un miembro se descomprime al llamarla)
+    size: Optional[int] = None  # tamaño declarado en el zip (sin descomprimir); None si es un archivo suelto
+
+def _is_workbook_member(info: zipfile.ZipInfo) -> bool:
+    """Libros dentro del zip, sin carpetas, metadatos de macOS ni temporales de Office ('~$...')."""
+    base = info.filename.rsplit('/', 1)[-1]
+    return (
+        not info.is_dir()
+        and not info.filename.startswith('__MACOSX/')
+        and not base.startswith(('~$', '.'))
+        and base.lower().endswith(WORKBOOK_EXTENSIONS)
+    )
+
+def _member_reader(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Callable[[], bytes]:
+    """Lee un miembro en memoria (sin extraerlo a disco), sin pasar del tamaño que declara."""
+    def _read() -> bytes:
+        with archive.open(info) as member:
+            payload = member.read(info.file_size + 1)
+        if len(payload) > info.file_size:
+            raise ValueError("el tamaño descomprimido no coincide con el declarado en el ZIP")
+        return payload
+    return _read
+
+def _upload_reader(file) -> Callable[[], bytes]:
+    """
+    Lee un archivo subido completo sin mover su posición.
+
+    El mismo archivo se lee al estimar la memoria y otra vez al cargarlo: un stream
+    (un archivo abierto) se lee desde el inicio y se deja donde estaba.
+    """
+    if hasattr(file, 'getvalue'):
+        return file.getvalue
+
+    def _read() -> bytes:
+        position = file.tell()
+        file.seek(0)
+        try:
+            return file.read()
+        finally:
+            file.seek(position)
+    return _read
+
+def expand_uploads(uploaded_files: List) -> Tuple[List[WorkbookSource], List[Tuple[str, Exception]]]:
+    """
+    Lista los libros de los archivos subidos, abriendo los .zip.
+
+    Los .zip se leen desde el buffer del archivo subido: nada se extrae a disco
+    y cada miembro se descomprime recién cuando se va a leer.
+
+    Args:
+        uploaded_files: Archivos subidos (.xlsx, .xls o .zip con varios de ellos)
+
+    Returns:
+        ([libros en el orden de subida y del zip], [(nombre, error) de los .zip que no se pudieron abrir])
+    """
+    sources: List[WorkbookSource] = []
+    errors: List[Tuple[str, Exception]] = []
+    for file in uploaded_files:
+        name = getattr(file, 'name', '')
+        if not name.lower().endswith('.zip'):
+            sources.append(WorkbookSource(name, _upload_reader(file)))
+            continue
+        try:
+            archive = zipfile.ZipFile(file)
+        except (zipfile.BadZipFile, OSError) as e:
+            errors.append((name, e))
+            continue
+        members = [info for info in archive.infolist() if _is_workbook_member(info)]
+        if not members:
+            errors.append((name, ValueError("el ZIP no contiene archivos .xlsx ni .xls")))
+        for info in members:
+            sources.append(WorkbookSource(f"{name}/{info.filename}", _member_reader(archive, info), info.file_size))
+    return sources, errors
+
+def parse_workbook(payload: bytes) -> pd.DataFrame:
+    """Lee la primera hoja de un libro (también es la tarea de los workers); las columnas de texto no se infieren."""
+    return pd.read_excel(BytesIO(payload), engine='openpyxl', dtype=TEXT_DTYPES)
+
+def _read_sequential(sources: List[WorkbookSource]) -> List[Tuple[str, object]]:
+    """Lee los libros uno tras otro en este proceso."""
+    results = []
+    for source in sources:
+        try:
+            with span("read_excel", file=source.name) as stage:
+                df = parse_workbook(source.read())
+                stage.set(rows=len(df))
+            results.append((source.name, df))
+        except Exception as e:
+            results.append((source.name, e))
+    return results
+
+def _parse_result(future):
+    """DataFrame leído o el error del libro; un pool roto se propaga para leer en el proceso."""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        raise
+    except Exception as e:
+        return e
+
+def _read_parallel(sources: List[WorkbookSource], pool: WorkerPool) -> List[Tuple[str, object]]:
+    """
+    Lee los libros en los workers; solo viajan los bytes de cada libro y el DataFrame leído.
+
+    Cada libro se lee (o se descomprime del zip) justo antes de enviarlo y no hay
+    más de pool.workers en vuelo, así los bytes en memoria no pasan de esos libros.
+    """
+    with span("read_excel.parallel", files=len(sources), workers=pool.workers) as stage:
+        results: List[Optional[Tuple[str, object]]] = [None] * len(sources)
+        in_flight = {}
+        for i, source in enumerate(sources):
+            if len(in_flight) >= pool.workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    j = in_flight.pop(future)
+                    results[j] = (sources[j].name, _parse_result(future))
+            try:
+                in_flight[pool.submit(parse_workbook, source.read())] = i
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                results[i] = (source.name, e)
+
+        for future, j in in_flight.items():
+            results[j] = (sources[j].name, _parse_result(future))
+        stage.set(rows=sum(len(r) for _, r in results if isinstance(r, pd.DataFrame)))
+    return results
+
+def read_workbooks(uploaded_files: List, pool: Optional[WorkerPool] = None
+                   ) -> Tuple[List[Tuple[str, pd.DataFrame]], List[Tuple[str, Exception]]]:
+    """
+    Lee los archivos subidos (y los libros dentro de los .zip).
+
+    Con varios libros y los workers activos (RENDER_WORKERS) se leen en paralelo,
+    cada uno en un proceso; si no, uno tras otro. Un libro que falla no detiene
+    a los demás: su error se devuelve con su nombre para mostrarlo.
+
+    Args:
+        uploaded_files: Archivos subidos
+        pool: Workers (por defecto los del proceso)
+
+    Returns:
+        ([(nombre, DataFrame)] en el orden de subida, [(nombre, error)])
+    """
+    pool = pool or get_worker_pool()
+    sources, errors = expand_uploads(uploaded_files)
+
+    results = None
+    if pool.enabled and len(sources) > 1:
+        try:
+            results = _read_parallel(sources, pool)
+        except BrokenProcessPool:
+            pool.reset()
+    if results is None:
+        results = _read_sequential(sources)
+
+    frames = []
+    for name, result in results:
+        if isinstance(result, Exception):
+            errors.append((name, result))
+        else:
+            frames.append((name, result))
+    return frames, errors
@@ -0,0 +1,136 @@
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+from .file_utils import get_logo_bytes
+from .lazy_imports import WARMUP_MODULES
+
+# Procesos de trabajo (0 = todo en el proceso del servidor, como antes)
+WORKERS_ENV = 'RENDER_WORKERS'
+DEFAULT_WORKERS = 2
+
+# Módulos que el forkserver importa una vez; cada worker nace con ellos cargados
+# (con spawn, donde no hay forkserver, cada worker los importa al iniciar)
+PRELOAD_MODULES = WARMUP_MODULES + [
+    'pyarrow',
+    'utils.workbook_reader',
+]
+
+def _init_worker():
+    """Inicializador de cada worker: módulos y logo en memoria antes del primer reporte."""
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)  # ya importados si el worker viene del forkserver
+        except ImportError:
+            pass
+    try:
+        get_logo_bytes()
+    except OSError:
+        pass
+
+def _mp_context():
+    """Contexto de los workers: forkserver donde existe (Linux, macOS), spawn donde no (Windows)."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        return context
+    return multiprocessing.get_context('spawn')
+
+def _ping() -> int:
+    return os.getpid()
+
+class WorkerPool:
+    """
+    Procesos para el trabajo de CPU en Python puro (leer libros, generar documentos).
+
+    Ese trabajo retiene el GIL: hecho en el hilo de una sesión frena los reruns
+    de todas las demás, y varios archivos no se procesan en paralelo. Los
+    workers nacen de un forkserver que ya importó pandas, openpyxl, python-docx
+    y los generadores, así la primera tarea no paga las importaciones. Si la
+    plataforma no puede crear los procesos, el pool se desactiva y el trabajo
+    se hace en el proceso del servidor.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        if workers is None:
+            workers = int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS))
+        self.workers = max(0, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def executor(self) -> ProcessPoolExecutor:
+        """Executor de los workers (se crea en el primer uso)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=_mp_context(), initializer=_init_worker
+                )
+            return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Envía una tarea (función importable y argumentos serializables con pickle).
+
+        Raises:
+            BrokenProcessPool: Si un worker murió, o si no se pueden crear procesos
+                (sin multiprocessing utilizable); en ese caso el pool queda desactivado
+        """
+        try:
+            return self.executor().submit(fn, *args)
+        except (OSError, ValueError, NotImplementedError, ImportError) as e:
+            self.workers = 0
+            self.reset()
+            raise BrokenProcessPool(f"no se pudieron crear los workers: {e}") from e
+
+    def reset(self):
+        """Descarta un pool roto (un worker murió); la próxima tarea crea otro."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def start(self) -> bool:
+        """
+        Arranca el forkserver y los workers en segundo plano, una vez por proceso.
+
+        Returns:
+            True si el arranque se inició en esta llamada
+        """
+        with self._lock:
+            if not self.enabled or self._started:
+                return False
+            self._started = True
+
+        def _spawn():
+            try:
+                for future in [self.submit(_ping) for _ in range(self.workers)]:
+                    future.result()
+            except Exception:
+                self.reset()  # se reintenta (o se trabaja en el proceso) en la primera tarea
+
+        threading.Thread(target=_spawn, name="worker-pool-start", daemon=True).start()
+        return True
+
+    def shutdown(self):
+        """Detiene los workers."""
+        self.reset()
+        self._started = False
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool() -> WorkerPool:
+    """Obtiene el pool de workers compartido por el proceso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool